@@ -11,16 +11,11 @@ import json
 import re
 import queue
 import shutil
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
 from flask import jsonify, request
 from telethon import TelegramClient
 from telethon.sessions import StringSession
-from telethon.tl.types import (
-    MessageMediaDocument,
-    DocumentAttributeVideo,
-    DocumentAttributeFilename,
-)
 
 # ==================== 日志系统 ====================
 import logging
@@ -53,6 +48,9 @@ from config import (
     API_HASH,
     DEBUG_API_ENABLED,
     DOWNLOAD_DIR,
+    MAX_CACHED_MESSAGES,
+    MAX_CONCURRENT_DOWNLOADS,
+    MAX_DOWNLOADS_PER_DC,
     OPEN_FOLDER_ENABLED,
     PUBLIC_BASE_URL,
     PROXY_CONFIG,
@@ -86,8 +84,9 @@ from src.download.paths import (
 from src.download.manager import DownloadManager
 from src.download.resume import ResumeStore
 from src.download.scheduler import DownloadScheduler
+from src.download.dispatcher import DownloadDispatcher
 from src.download.worker_pool import DownloadWorkerPool
-from src.download.status import build_download_status_payload
+from src.download.status import StatusChangeNotifier, build_download_status_payload
 from src.download.transitions import TERMINAL_STATES, can_transition
 from src.download.task_actions import (
     clear_tasks_by_scope,
@@ -101,11 +100,10 @@ from src.download.telegram_downloader import TelegramDirectDownloader
 from src.download.watchdog import DownloadWatchdog
 from src.download.worker import DownloadWorker
 from src.files import (
+    DownloadFileListCache,
     cleanup_thumbnail_cache as cleanup_thumbnail_cache_under,
     delete_download_file,
-    iter_file_chunks,
     list_download_files,
-    local_stream_range,
     prepare_open_folder,
     rename_download_file,
     resolve_download_path as resolve_download_path_under,
@@ -127,23 +125,43 @@ from src.system import (
     validate_runtime_config,
 )
 from src.telegram import (
+    EntityRateLimiter,
     TelegramDebugService,
     TelegramHealthChecker,
     TelegramVideoService,
+    deprioritize_current_thread,
+    restore_default_priority,
     run_main_telegram_client,
     run_relay_telegram_client,
 )
 from src.telegram.runtime import TelegramRuntime
+from src.telegram.video_info import (
+    format_size,
+    lookup_video_info,
+    make_excerpt,
+    message_text,
+)
 
 
 from telethon.sessions import StringSession
 
-tg_loop = asyncio.new_event_loop()
+try:
+    # 可选加速：装了 uvloop 时 Telegram 事件循环用它（回调/IO 调度开销更低），否则用标准 asyncio
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+def _new_event_loop():
+    return uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+
+
+tg_loop = _new_event_loop()
 tg_client = TelegramClient(SESSION_NAME, API_ID, API_HASH, loop=tg_loop, proxy=build_telethon_proxy_config(PROXY_CONFIG))
 # Relay client will be initialized with a StringSession to avoid database file lock conflicts
-relay_loop = asyncio.new_event_loop()
+relay_loop = _new_event_loop()
 relay_tg_client = TelegramClient(StringSession(), API_ID, API_HASH, loop=relay_loop, proxy=build_telethon_proxy_config(PROXY_CONFIG))
-tg_runtime = TelegramRuntime(tg_client, tg_loop)
+tg_runtime = TelegramRuntime(tg_client, tg_loop, max_message_cache_size=MAX_CACHED_MESSAGES)
 relay_runtime = TelegramRuntime(relay_tg_client, relay_loop)
 
 # 优雅退出：周期后台循环轮询该事件，收到即退出（配合 shutdown_runtime 编排）
@@ -157,11 +175,15 @@ relay_connected = False
 relay_connect_error = ""
 
 # 下载状态: task_id(entity_id:msg_id) -> {filename, progress, status, downloaded, total, error, speed, entity_id, msg_id, dialog_name, downloaded_bytes, total_bytes, speed_bps, queue_position}
+# 写时复制：每次更新都换入新 dict，已存入的状态 dict 不再原地修改，
+# 因此只读快照复制外层 dict 即可，无需逐任务深拷贝
 download_status = {}
 # 下载取消标记: task_id -> True
 download_cancel = {}
 # 终止态集合 TERMINAL_STATES 与状态迁移校验 can_transition 由 src.download.transitions 提供
 status_lock = threading.RLock()
+# 状态变更通知：每次写 download_status 后 bump，供 /api/progress SSE 事件驱动推送
+status_notifier = StatusChangeNotifier()
 cache_lock = threading.RLock()
 TDL_MAX_EOF_RETRIES = 15
 TDL_RESTART_RESET_MIN_BYTES = 64 * 1024 * 1024
@@ -179,7 +201,7 @@ tdl_runtime = TdlRuntime(
 
 def _watchdog_tasks_snapshot():
     with status_lock:
-        return [(task_id, dict(task)) for task_id, task in download_status.items()]
+        return list(download_status.items())
 
 
 def _restart_stalled_download(task_id, task):
@@ -246,6 +268,8 @@ def init_tg_health_checker():
             log_warning=log_warning,
             log_error=log_error,
             reconnect_lock=tg_runtime.client_reconnect_lock,
+            # 检查线程常由 tg-loop 创建，会继承其 SCHED_BATCH
+            thread_initializer=restore_default_priority,
         )
         tg_health_checker.start()
 
@@ -299,9 +323,9 @@ def resolve_current_download_path(*parts, must_exist=False):
 
 
 def copy_task_state(task_id):
-    with status_lock:
-        state = download_status.get(task_id)
-        return dict(state) if state else None
+    # 写方只整体替换槽位、从不原地修改已发布的 dict，单次 get 即一致快照，无需持锁
+    state = download_status.get(task_id)
+    return dict(state) if state else None
 
 
 def _copy_task_state(task_id):
@@ -364,7 +388,7 @@ def run_task_database_backup_loop():
 
 def _query_task_history(status="", query="", page=1, per_page=30):
     with status_lock:
-        live_items = [(task_id, dict(state)) for task_id, state in download_status.items()]
+        live_items = list(download_status.items())
     return task_persistence.query_history(live_items, status, query, page, per_page)
 
 
@@ -388,6 +412,7 @@ def set_task_state(task_id, state):
         state["updated_at"] = time.time()
         download_status[task_id] = state
         _persist_task_state(task_id, state)
+        status_notifier.notify(task_id)
         return dict(state)
 
 
@@ -452,9 +477,10 @@ def update_task_state(task_id, **updates):
         if new_status is not None and not can_transition(state.get("status"), new_status, allow_revive=False):
             log_warning(f"[state] 拒绝非法状态迁移 {task_id}: {state.get('status')} -> {new_status}")
             return None
-        state.update(updates)
-        state["updated_at"] = time.time()
+        state = {**state, **updates, "updated_at": time.time()}
+        download_status[task_id] = state
         _persist_task_state(task_id, state)
+        status_notifier.notify(task_id)
         return dict(state)
 
 
@@ -466,6 +492,8 @@ def drop_task_state(task_id):
     with status_lock:
         state = download_status.pop(task_id, None)
         _delete_persisted_task_state(task_id)
+        if state is not None:
+            status_notifier.notify(task_id)
         return state
 
 
@@ -505,11 +533,14 @@ def _calc_download_timeout(file_size_bytes):
 
 # ==================== 下载队列系统 ====================
 # `tdl` shares a single Bolt DB under `TDL_STORAGE_PATH`; concurrent runs fail with
-# "Current database is used by another process".
-MAX_CONCURRENT_DOWNLOADS = 1
-download_scheduler = DownloadScheduler(max_concurrent=MAX_CONCURRENT_DOWNLOADS)
-# tdl 单实例 Bolt DB 资源锁：把 max_concurrent=1 的隐含串行约束显式化，
-# 即使将来放宽并发，tdl 子进程仍被串行化，避免 Bolt DB 争用。
+# "Current database is used by another process". MAX_CONCURRENT_DOWNLOADS (config,
+# default 1) therefore only parallelises Telegram direct downloads: each worker thread
+# drives its own iter_download coroutine on tg_loop, while tdl runs stay serialized
+# by tdl_resource_lock below.
+download_scheduler = DownloadScheduler(
+    max_concurrent=MAX_CONCURRENT_DOWNLOADS, max_per_dc=MAX_DOWNLOADS_PER_DC
+)
+# tdl 单实例 Bolt DB 资源锁：并发槽位大于 1 时 tdl 子进程仍被串行化，避免 Bolt DB 争用。
 tdl_resource_lock = threading.Lock()
 TASK_STALL_TIMEOUT = 600
 TELEGRAM_CHUNK_TIMEOUT = 60
@@ -535,6 +566,8 @@ def _recover_stalled_tasks(force=False, timeout=TASK_STALL_TIMEOUT):
                     continue
                 if state.get("speed_bps") not in (None, 0, 0.0):
                     continue
+                if state.get("waiting_resource"):
+                    continue
 
                 updated_at = float(state.get("updated_at") or 0)
                 if not force and (not updated_at or now - updated_at < timeout):
@@ -594,21 +627,18 @@ def _update_queue_positions_locked():
             state = download_status.get(tid)
             if not state:
                 return
-            state["queue_position"] = idx
-            state["queue_size"] = queue_length
+            state = {**state, "queue_position": idx, "queue_size": queue_length, "updated_at": time.time()}
             if state.get("status") not in TERMINAL_STATES and state.get("status") != "downloading":
                 state["status"] = "queued"
-            state["updated_at"] = time.time()
+            download_status[tid] = state
             _persist_task_state(tid, state)
+            status_notifier.notify(tid)
 
     download_scheduler.update_positions(update_task)
 
 RESUME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".resume")
 resume_store = ResumeStore(RESUME_DIR, progress_path_func=resolve_tdl_progress_path)
 
-def _get_resume_file(task_id):
-    return resume_store.path_for(task_id)
-
 def save_resume_info(task_id, info):
     resume_store.save(task_id, info)
 
@@ -665,11 +695,8 @@ def get_queue_status():
     return download_scheduler.get_status()
 
 def process_queue():
-    while True:
-        task = get_next_from_queue()
-        if not task: break
-        download_worker_pool.submit([task], task.get("dialog_name", "unknown"))
-        time.sleep(1)
+    # 仅唤醒常驻调度线程；派发在 download_dispatcher 线程内完成
+    download_dispatcher.wake()
 
 
 def _resume_task(task_id, dialog_name=None, auto=False):
@@ -929,72 +956,21 @@ def relay_run_async(coro_factory, timeout=600, allow_reconnect=True):
         _sync_relay_runtime_state()
 
 
-def message_text(message):
-    raw = getattr(message, "message", None) or getattr(message, "text", None) or ""
-    raw = re.sub(r"\s+", " ", raw).strip()
-    return raw
-
-
 def _message_text(message):
     return message_text(message)
 
 
-def make_excerpt(text, limit=180):
-    if not text:
-        return ""
-    if len(text) <= limit:
-        return text
-    return text[: max(0, limit - 1)].rstrip() + "…"
-
-
 def _make_excerpt(text, limit=180):
     return make_excerpt(text, limit)
 
 
 def get_video_info(message):
-    if not message.media or not isinstance(message.media, MessageMediaDocument):
-        return None
-    doc = message.media.document
-    is_video = False
-    filename = None
-    duration = 0
-    for attr in doc.attributes:
-        if isinstance(attr, DocumentAttributeVideo):
-            is_video = True
-            duration = attr.duration
-        if isinstance(attr, DocumentAttributeFilename):
-            filename = attr.file_name
-    if not is_video:
-        return None
-    if not filename:
-        filename = f"video_{message.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-    raw_text = message_text(message)
-    return {
-        "id": message.id,
-        "document_id": str(getattr(doc, "id", "")),
-        "filename": filename,
-        "size": doc.size,
-        "duration": duration,
-        "date": message.date.strftime("%Y-%m-%d %H:%M"),
-        "has_thumb": bool(doc.thumbs),
-        "text": raw_text,
-        "text_excerpt": make_excerpt(raw_text, 220),
-        "reply_to_msg_id": getattr(getattr(message, "reply_to", None), "reply_to_msg_id", None),
-    }
-
-
-def format_size(size_bytes):
-    for unit in ["B", "KB", "MB", "GB"]:
-        if size_bytes < 1024:
-            return f"{size_bytes:.1f}{unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.1f}TB"
+    # 同一消息会在扫描、提交下载、worker 执行时反复解析；按消息缓存，兜底文件名也随之固定
+    return lookup_video_info(message, tg_runtime.cached_video_info)
 
 
-def format_duration(seconds):
-    m, s = divmod(int(seconds), 60)
-    h, m = divmod(m, 60)
-    return f"{h}:{m:02d}:{s:02d}" if h > 0 else f"{m}:{s:02d}"
+# /api/files 扫描结果缓存：目录 mtime 签名不变且未超过 2s 时复用
+download_file_list_cache = DownloadFileListCache(DOWNLOAD_DIR, format_size)
 
 
 _dialogs_cache = tg_runtime.dialogs_cache
@@ -1081,8 +1057,6 @@ def video_info_for_message(message, current_entity_id, source="主消息", extra
     message_entity_id = _message_entity_id(message, current_entity_id)
     _cache_message(message, message_entity_id)
     info["entity_id"] = message_entity_id
-    info["size_fmt"] = format_size(info["size"])
-    info["duration_fmt"] = format_duration(info["duration"])
     info["source"] = source
     if extra:
         info.update(extra)
@@ -1093,6 +1067,12 @@ def _video_info_for_message(message, current_entity_id, source="主消息", extr
     return video_info_for_message(message, current_entity_id, source=source, extra=extra)
 
 
+# 按对话的客户端令牌桶：扫描、缩略图、直连下载发起请求前都先取令牌，避免 FLOOD_WAIT
+TG_ENTITY_RATE = 3.0
+TG_ENTITY_BURST = 5
+telegram_rate_limiter = EntityRateLimiter(rate=TG_ENTITY_RATE, burst=TG_ENTITY_BURST)
+
+
 telegram_video_service = TelegramVideoService(
     client=tg_client,
     run_async=run_async,
@@ -1109,6 +1089,10 @@ telegram_video_service = TelegramVideoService(
     max_video_cache_size=MAX_VIDEO_CACHE_SIZE,
     max_reply_cache_size=MAX_REPLY_CACHE_SIZE,
     log_warning=log_warning,
+    cached_entity=tg_runtime.cached_entity,
+    remember_entity=tg_runtime.remember_entity,
+    cache_batch=tg_runtime.deferred_eviction,
+    throttle=telegram_rate_limiter.acquire,
 )
 
 
@@ -1128,6 +1112,13 @@ def _resolve_requested_entity(source="dialog", dialog_index=None, entity_id=None
     return resolve_requested_entity(source, dialog_index, entity_id)
 
 
+def get_entity(query):
+    try:
+        return tg_runtime.get_entity(query)
+    finally:
+        _sync_tg_runtime_state()
+
+
 def _parse_task_id(task_id):
     if not task_id or ":" not in task_id:
         return (None, None)
@@ -1370,12 +1361,18 @@ def _recreate_relay_client_from_main_session():
 
 
 def _wait_for_main_tg_ready(timeout=60):
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        if tg_connected and tg_client.is_connected():
+    # 首次连接成功由 tg_runtime.ready 事件通知，不再从启动起每 0.5s 轮询；
+    # 就绪后若恰逢断线重连，才在剩余时间内短轮询等它恢复
+    deadline = time.monotonic() + timeout
+    if not tg_runtime.ready.wait(timeout):
+        return False
+    while True:
+        if tg_runtime.connected and tg_client.is_connected():
             return True
-        time.sleep(0.5)
-    return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(0.5, remaining))
 
 
 def _prepare_relay_session():
@@ -1835,6 +1832,7 @@ def get_telegram_direct_downloader():
             log_warning=log_warning,
             max_retry_attempts=TELEGRAM_MAX_RETRY_ATTEMPTS,
             chunk_timeout=TELEGRAM_CHUNK_TIMEOUT,
+            throttle=telegram_rate_limiter.acquire,
         )
     return telegram_direct_downloader
 
@@ -1895,8 +1893,9 @@ def get_download_worker():
     if download_worker is None:
         download_worker = DownloadWorker(
             download_dir_for_dialog=_download_dir_for_dialog,
+            # release_tasks 持调度锁还槽并 notify 调度线程，由它在同一把锁下取下一个任务；
+            # 不再额外 process_queue()，避免还槽后立刻二次抢锁
             release_tasks=download_scheduler.release_tasks,
-            process_queue=process_queue,
             copy_task_state=_copy_task_state,
             set_task_state=_set_task_state,
             update_task_state=_update_task_state,
@@ -1922,6 +1921,13 @@ def _do_download(task_items, dialog_name):
 # 固定 daemon worker 池：复用线程执行下载调度，替代每任务新建线程。
 download_worker_pool = DownloadWorkerPool(MAX_CONCURRENT_DOWNLOADS, _do_download)
 
+# 单个事件驱动调度线程：入队/还槽即唤醒，把能占槽的任务交给 worker 池。
+download_dispatcher = DownloadDispatcher(
+    download_scheduler,
+    lambda task: download_worker_pool.submit([task], task.get("dialog_name", "unknown")),
+    update_positions=_update_queue_positions_locked,
+)
+
 
 # Relay 并发控制
 MAX_CONCURRENT_RELAYS = 2
@@ -1930,6 +1936,13 @@ relay_lock = threading.Lock()
 
 
 def start_tg_client():
+    # 下载扇出时 tg_loop 常驻忙碌：降为批处理调度，让 /api/stream 等请求线程优先被唤醒。
+    # 调度策略会被子线程继承：to_thread 的工作线程要写盘、持 status_lock 持久化状态，
+    # 显式指定默认线程池，让工作线程启动时恢复 SCHED_OTHER，降级只留在 tg-loop 本身
+    tg_loop.set_default_executor(
+        ThreadPoolExecutor(thread_name_prefix="tg-io", initializer=restore_default_priority)
+    )
+    deprioritize_current_thread()
     run_main_telegram_client(
         client=tg_client,
         loop=tg_loop,
@@ -1999,7 +2012,7 @@ def auto_resume_incomplete_tasks():
 
 
 def start_background_clients():
-    tg_thread = threading.Thread(target=start_tg_client, daemon=True)
+    tg_thread = threading.Thread(target=start_tg_client, name="tg-loop", daemon=True)
     tg_thread.start()
     return {"tg_thread": tg_thread}
 
@@ -2023,6 +2036,11 @@ _shutdown_lock = threading.Lock()
 _shutdown_done = False
 
 
+def _close_persistent_stores():
+    task_persistence.close()
+    resume_store.close()
+
+
 def shutdown_runtime(*_args):
     """有序停止所有后台线程与资源；幂等（重复信号只执行一次）。"""
     global _shutdown_done
@@ -2031,12 +2049,12 @@ def shutdown_runtime(*_args):
             return
         _shutdown_done = True
 
-    stoppables = [obj for obj in (download_watchdog, tg_health_checker, download_worker_pool) if obj is not None]
+    stoppables = [obj for obj in (download_watchdog, tg_health_checker, download_dispatcher, download_worker_pool) if obj is not None]
     coordinator = GracefulShutdown(
         stop_event=shutdown_event,
         stoppables=stoppables,
         disconnect_clients=_disconnect_tg_clients,
-        close_persistence=task_persistence.close,
+        close_persistence=_close_persistent_stores,
         log_info=log_info,
     )
     coordinator.shutdown()
@@ -2062,6 +2080,7 @@ if __name__ == "__main__":
     app_new.validate_config()
     app_new.start_runtime()
     _install_shutdown_signal_handlers()
-    time.sleep(3)
+    # 等首次连接有结果再对外服务（已连接/需网页登录即刻继续，最长 30s）
+    tg_runtime.wait_startup(timeout=30)
     print(f"Web UI 启动: http://{WEB_BIND_HOST}:{WEB_BIND_PORT}")
-    app_new.app.run(host=WEB_BIND_HOST, port=WEB_BIND_PORT, threaded=True)
+    app_new.serve_app(app_new.app, WEB_BIND_HOST, WEB_BIND_PORT)
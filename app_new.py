@@ -5,7 +5,6 @@ This entry point keeps app.py as the legacy runtime owner for now, while
 registering the split route modules against the real runtime functions.
 """
 
-import time
 from datetime import timedelta
 
 from flask import Flask, jsonify, redirect, request, session
@@ -21,6 +20,7 @@ from config import (
     RELAY_TOKEN_SECRET,
     TDL_BINARY,
     TRUST_FORWARDED_FOR,
+    USE_X_SENDFILE,
     WEB_AUTH_PASSWORD,
     WEB_AUTH_USERNAME,
     WEB_BIND_HOST,
@@ -30,7 +30,7 @@ from config import (
 )
 from relay_tokens import verify_relay_token
 from src.security import require_web_auth
-from src.system import start_runtime_services, validate_runtime_config
+from src.system import CompactJSONProvider, serve_app, start_runtime_services, validate_runtime_config
 from src.routes import (
     auth,
     auth_bp,
@@ -71,7 +71,12 @@ app.config.update(
     # 会话 cookie Secure 标志：显式 WEB_SESSION_COOKIE_SECURE 优先，否则按对外
     # 地址是否 https 推断（config 内解析）。HTTPS 部署应显式设 true 防会话侧录。
     SESSION_COOKIE_SECURE=WEB_SESSION_COOKIE_SECURE,
+    # 文件下载/播放交给前置服务器发送（默认关闭，见 config.USE_X_SENDFILE）
+    USE_X_SENDFILE=USE_X_SENDFILE,
 )
+# JSON 响应：不排序键（省去每个 dict 的 sorted 开销，任务按插入顺序输出）；
+# 中文文件名/对话名直接输出 UTF-8，避免 \uXXXX 转义把体积放大一倍；紧凑路径复用编码器。
+app.json = CompactJSONProvider(app)
 
 
 def _runtime_attr(name):
@@ -126,6 +131,8 @@ def init_all_blueprints():
         "login_run_async_func": runtime.login_run_async,
         "finalize_login_func": runtime.finalize_tg_login,
         "get_login_state_func": runtime.get_tg_login_state,
+        "get_entity_func": runtime.get_entity,
+        "throttle_func": runtime.telegram_rate_limiter.acquire,
     })
 
     download.init_blueprint({
@@ -156,6 +163,9 @@ def init_all_blueprints():
         "get_queue_status_func": runtime.get_queue_status,
         "status_lock": runtime.status_lock,
         "download_status_ref": runtime.download_status,
+        "wait_status_change_func": runtime.status_notifier.wait,
+        "status_version_func": lambda: runtime.status_notifier.version,
+        "status_changes_func": runtime.status_notifier.changed_since,
     })
 
     misc.init_blueprint({
@@ -170,6 +180,7 @@ def init_all_blueprints():
         "abort_debug_func": runtime.abort_if_debug_disabled,
         "resolve_download_path_func": runtime.resolve_current_download_path,
         "debug_service": runtime.telegram_debug_service,
+        "file_list_cache": runtime.download_file_list_cache,
     })
 
     relay.init_blueprint({
@@ -295,6 +306,7 @@ if __name__ == "__main__":
     validate_config()
     start_runtime()
     runtime._install_shutdown_signal_handlers()
-    time.sleep(3)
+    # 等首次连接有结果再对外服务（已连接/需网页登录即刻继续，最长 30s）
+    runtime.tg_runtime.wait_startup(timeout=30)
     print(f"Web UI 启动: http://{WEB_BIND_HOST}:{WEB_BIND_PORT}")
-    app.run(host=WEB_BIND_HOST, port=WEB_BIND_PORT, threaded=True)
+    serve_app(app, WEB_BIND_HOST, WEB_BIND_PORT)
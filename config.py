@@ -68,6 +68,9 @@ OPEN_FOLDER_ENABLED = _strtobool(os.getenv("OPEN_FOLDER_ENABLED"), default=False
 # 仅当部署在可信反向代理之后时才开启：开启后 X-Forwarded-For 会参与
 # "本地请求"判定；默认关闭，防止伪造该头绕过 Basic Auth。
 TRUST_FORWARDED_FOR = _strtobool(os.getenv("TRUST_FORWARDED_FOR"), default=False)
+# 仅当前置 Apache(mod_xsendfile)/lighttpd 等会处理 X-Sendfile 头的服务器时开启：
+# 开启后 send_file 只回 X-Sendfile 头，文件由前置服务器直接发送；直连访问时必须关闭。
+USE_X_SENDFILE = _strtobool(os.getenv("USE_X_SENDFILE"), default=False)
 
 
 def _resolve_web_session_secret():
@@ -115,3 +118,12 @@ TDL_STORAGE_PATH = os.getenv("TDL_STORAGE_PATH", "/root/.tdl/data").strip() or "
 TDL_THREADS = int(os.getenv("TDL_THREADS", "8") or "8")
 TDL_LIMIT = int(os.getenv("TDL_LIMIT", "4") or "4")
 TDL_CHAT_ID_OVERRIDES = os.getenv("TDL_CHAT_ID_OVERRIDES", "").strip()
+
+# 下载并发槽位数。tdl 子进程共享单实例 Bolt DB，始终由执行器资源锁串行化；
+# 调大只会让 Telegram 直连下载并行执行（在 tg_loop 上并发 iter_download）。
+MAX_CONCURRENT_DOWNLOADS = max(1, int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "1") or "1"))
+# 同一 Telegram DC 同时下载的上限（0 为不限）；多 DC 混排时让其它 DC 的任务先占空槽
+MAX_DOWNLOADS_PER_DC = max(0, int(os.getenv("MAX_DOWNLOADS_PER_DC", "0") or "0"))
+
+# 内存缓存上限：已扫描的 Telegram Message 对象按 LRU 淘汰
+MAX_CACHED_MESSAGES = max(1, int(os.getenv("MAX_CACHED_MESSAGES", "2000") or "2000"))
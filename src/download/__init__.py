@@ -1,9 +1,10 @@
 """
 src.download 包初始化
 """
+from .dispatcher import DownloadDispatcher
 from .queue import DownloadQueue
 from .scheduler import DownloadScheduler
-from .status import build_download_status_payload
+from .status import StatusChangeNotifier, build_download_status_payload
 from .task_actions import (
     clear_tasks_by_scope,
     query_task_history_payload,
@@ -12,9 +13,11 @@ from .task_actions import (
 from .watchdog import DownloadWatchdog
 
 __all__ = [
+    'DownloadDispatcher',
     'DownloadQueue',
     'DownloadScheduler',
     'DownloadWatchdog',
+    'StatusChangeNotifier',
     'build_download_status_payload',
     'clear_tasks_by_scope',
     'query_task_history_payload',
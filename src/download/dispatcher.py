@@ -0,0 +1,50 @@
+"""Single event-driven dispatcher thread for the download queue.
+
+替代「process_queue 每次调用各自循环派发」的模型：一个常驻 daemon 线程阻塞在
+DownloadScheduler.changed 条件变量上，入队或还槽时被唤醒，取出能占槽的任务交给
+submit（通常是 DownloadWorkerPool.submit）。空闲时不轮询、不 sleep。
+"""
+
+import threading
+
+
+class DownloadDispatcher:
+    def __init__(self, scheduler, submit, *, update_positions=None, name="dl-dispatcher"):
+        self._scheduler = scheduler
+        self._submit = submit  # callable(task)
+        self._update_positions = update_positions
+        self._name = name
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name=self._name, daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        # 懒启动：首次唤醒时才拉起线程；之后仅通知条件变量
+        if self._thread is None:
+            self.start()
+        self._scheduler.notify_changed()
+
+    def _loop(self):
+        while not self._stopped:
+            task = self._scheduler.wait_next_task(
+                update_positions=self._update_positions,
+                should_stop=lambda: self._stopped,
+            )
+            if task is None:
+                continue
+            try:
+                self._submit(task)
+            except Exception:
+                # 提交失败时归还槽位，避免占槽泄漏
+                self._scheduler.release_tasks([task])
+
+    def stop(self):
+        self._stopped = True
+        self._scheduler.notify_changed()
@@ -1,38 +1,54 @@
 """Download path helpers."""
 
+import functools
 import os
+import re
 
 
+# \w 在 str 模式下即 isalnum() 或 "_"，与原逐字符判断等价（保留中文等 Unicode 字母数字），
+# 但在 C 层完成整串替换
+_UNSAFE_DIALOG_CHARS = re.compile(r"[^\w \-]")
+
+
+@functools.lru_cache(maxsize=256)
 def sanitize_dialog_name(dialog_name):
-    return "".join(
-        char if char.isalnum() or char in " _-" else "_"
-        for char in (dialog_name or "unknown")
-    ).strip() or "unknown"
+    return _UNSAFE_DIALOG_CHARS.sub("_", dialog_name or "unknown").strip() or "unknown"
 
 
 def download_dir_for_dialog(base_dir, dialog_name):
     return os.path.join(base_dir, sanitize_dialog_name(dialog_name))
 
 
+def file_size(path, default=0):
+    """单次 stat 取文件大小，不存在（或不可访问）时返回 ``default``。
+
+    替代 ``getsize(p) if exists(p) else x``：少一次 stat，也没有两次调用之间文件被删的竞态。
+    """
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return default
+
+
 def resolve_tdl_progress_path(filepath):
     tmp_path = filepath + ".tmp"
-    tmp_exists = os.path.exists(tmp_path)
-    final_exists = os.path.exists(filepath)
-    if tmp_exists and final_exists:
-        if os.path.getsize(filepath) >= os.path.getsize(tmp_path):
-            return filepath
-        return tmp_path
-    if tmp_exists:
-        return tmp_path
-    return filepath
+    tmp_size = file_size(tmp_path, None)
+    if tmp_size is None:
+        return filepath
+    final_size = file_size(filepath, None)
+    if final_size is not None and final_size >= tmp_size:
+        return filepath
+    return tmp_path
 
 
 def prepare_telegram_fallback_target(filepath):
     tmp_path = filepath + ".tmp"
-    if not os.path.exists(tmp_path):
+    tmp_size = file_size(tmp_path, None)
+    if tmp_size is None:
         return filepath
-    if os.path.exists(filepath):
-        if os.path.getsize(filepath) >= os.path.getsize(tmp_path):
+    final_size = file_size(filepath, None)
+    if final_size is not None:
+        if final_size >= tmp_size:
             try:
                 os.remove(tmp_path)
             except OSError:
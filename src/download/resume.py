@@ -2,70 +2,130 @@
 
 import json
 import os
+import sqlite3
+import threading
+
+from .paths import file_size
 
 
 class ResumeStore:
+    """断点续传元数据：单个 SQLite（WAL）库按 task_id 存 JSON。
+
+    取代每任务一个 ``.resume/<task_id>.json``（每次检查点都 open/write/close）；
+    旧 JSON 文件在首次建连时迁入库中并删除。
+    """
+
+    DB_NAME = "resume.sqlite3"
+
     def __init__(self, resume_dir, progress_path_func):
         self.resume_dir = resume_dir
         self.progress_path_func = progress_path_func
+        self.db_path = os.path.join(resume_dir, self.DB_NAME)
+        self.lock = threading.Lock()
+        self._conn = None
+        self._closed = False
         os.makedirs(self.resume_dir, exist_ok=True)
 
     def path_for(self, task_id):
+        """旧版 JSON 文件路径（仅用于迁移）。"""
         return os.path.join(self.resume_dir, f"{task_id}.json")
 
+    def _connect_locked(self):
+        if self._closed:
+            raise RuntimeError("ResumeStore is closed")
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS resume (task_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            self._conn = conn
+            self._migrate_legacy_files_locked()
+        return self._conn
+
+    def _migrate_legacy_files_locked(self):
+        try:
+            names = [name for name in os.listdir(self.resume_dir) if name.endswith(".json")]
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.resume_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as handle:
+                    data = handle.read()
+                json.loads(data)
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO resume(task_id, data) VALUES (?, ?)", (name[:-5], data)
+                )
+                os.remove(path)
+            except Exception:
+                pass
+
+    def close(self):
+        with self.lock:
+            self._closed = True
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+
     def save(self, task_id, info):
         try:
-            with open(self.path_for(task_id), "w", encoding="utf-8") as handle:
-                json.dump(info, handle)
+            data = json.dumps(info)
+            with self.lock:
+                self._connect_locked().execute(
+                    "INSERT OR REPLACE INTO resume(task_id, data) VALUES (?, ?)", (str(task_id), data)
+                )
         except Exception:
             pass
 
     def load(self, task_id):
         try:
-            path = self.path_for(task_id)
-            if os.path.exists(path):
-                with open(path, "r", encoding="utf-8") as handle:
-                    return json.load(handle)
+            with self.lock:
+                row = self._connect_locked().execute(
+                    "SELECT data FROM resume WHERE task_id = ?", (str(task_id),)
+                ).fetchone()
+            if row:
+                return json.loads(row[0])
         except Exception:
             pass
         return None
 
     def clear(self, task_id):
         try:
-            path = self.path_for(task_id)
-            if os.path.exists(path):
-                os.remove(path)
+            with self.lock:
+                self._connect_locked().execute("DELETE FROM resume WHERE task_id = ?", (str(task_id),))
         except Exception:
             pass
 
     def list_task_ids(self):
         try:
-            return [
-                name[:-5]
-                for name in os.listdir(self.resume_dir)
-                if name.endswith(".json")
-            ]
-        except FileNotFoundError:
+            with self.lock:
+                return [row[0] for row in self._connect_locked().execute("SELECT task_id FROM resume")]
+        except Exception:
             return []
 
     def count(self):
-        return len(self.list_task_ids())
+        try:
+            with self.lock:
+                return int(self._connect_locked().execute("SELECT COUNT(*) FROM resume").fetchone()[0])
+        except Exception:
+            return 0
 
     def detect_offset(self, task_id, filepath, total_bytes=0):
         progress_path = self.progress_path_func(filepath)
-        if os.path.exists(progress_path):
-            size = os.path.getsize(progress_path)
-            if size > 0 and (not total_bytes or size < total_bytes):
-                return size
+        size = file_size(progress_path)
+        if size > 0 and (not total_bytes or size < total_bytes):
+            return size
 
         resume_info = self.load(task_id) or {}
         resume_offset = int(resume_info.get("offset") or 0)
         if resume_offset > 0 and (not total_bytes or resume_offset < total_bytes):
             return resume_offset
 
-        if os.path.exists(filepath):
-            size = os.path.getsize(filepath)
-            if size > 0 and (not total_bytes or size < total_bytes):
-                return size
+        size = file_size(filepath)
+        if size > 0 and (not total_bytes or size < total_bytes):
+            return size
 
         return 0
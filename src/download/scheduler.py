@@ -15,15 +15,22 @@ GENERATION_KEY = "_generation"
 class DownloadScheduler:
     """Queue plus active-slot tracking used by the legacy downloader."""
 
-    def __init__(self, max_concurrent: int = 1):
+    def __init__(self, max_concurrent: int = 1, *, max_per_dc: int = 0):
         self.max_concurrent = max_concurrent
+        # 舱壁：同一 Telegram DC 同时占槽的上限（0 表示不限），其余 DC 的任务可越过排在前面的受限任务
+        self.max_per_dc = max(0, int(max_per_dc or 0))
         self.queue = []
         self.active_downloads = 0
+        # DC -> 占槽数；task_id -> 占槽时记下的 DC（还槽时对称递减）
+        self.active_per_dc: Dict[int, int] = {}
+        self._task_dcs: Dict[str, int] = {}
         self.scheduled_task_ids = set()
         # task_id -> 当前占槽的 generation 令牌
         self.active_generations: Dict[str, int] = {}
         self._generation_seq = 0
         self.lock = threading.RLock()
+        # 入队/还槽时通知：调度线程据此阻塞等待“有排队任务且有空槽”，无需轮询
+        self.changed = threading.Condition(self.lock)
 
     def is_queued(self, task_id):
         with self.lock:
@@ -41,22 +48,64 @@ class DownloadScheduler:
             self.queue.append(task)
             if update_positions:
                 update_positions()
+            self.changed.notify_all()
             return True
 
+    @staticmethod
+    def task_dc(task):
+        return (task.get("info") or {}).get("dc_id")
+
+    def _next_index_locked(self):
+        if not self.max_per_dc:
+            return 0
+        for index, task in enumerate(self.queue):
+            dc_id = self.task_dc(task)
+            if dc_id is None or self.active_per_dc.get(dc_id, 0) < self.max_per_dc:
+                return index
+        return None
+
     def get_next_task(self, update_positions: Optional[Callable[[], None]] = None):
         with self.lock:
-            if self.queue and self.active_downloads < self.max_concurrent:
-                self.active_downloads += 1
-                task = self.queue.pop(0)
-                task_id = task.get("task_id")
-                if task_id:
-                    self._generation_seq += 1
-                    self.active_generations[task_id] = self._generation_seq
-                    task[GENERATION_KEY] = self._generation_seq
-                if update_positions:
-                    update_positions()
-                return task
-            return None
+            if not self.queue or self.active_downloads >= self.max_concurrent:
+                return None
+            index = self._next_index_locked()
+            if index is None:
+                return None
+            self.active_downloads += 1
+            task = self.queue.pop(index)
+            task_id = task.get("task_id")
+            if task_id:
+                self._generation_seq += 1
+                self.active_generations[task_id] = self._generation_seq
+                task[GENERATION_KEY] = self._generation_seq
+                dc_id = self.task_dc(task)
+                if dc_id is not None:
+                    self._task_dcs[task_id] = dc_id
+                    self.active_per_dc[dc_id] = self.active_per_dc.get(dc_id, 0) + 1
+            if update_positions:
+                update_positions()
+            return task
+
+    def wait_next_task(
+        self,
+        update_positions: Optional[Callable[[], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        timeout: Optional[float] = None,
+    ):
+        """阻塞到能占到槽位的排队任务出现并返回它；``should_stop()`` 为真或超时返回 None。"""
+        with self.changed:
+            while True:
+                if should_stop and should_stop():
+                    return None
+                task = self.get_next_task(update_positions=update_positions)
+                if task:
+                    return task
+                if not self.changed.wait(timeout) and timeout is not None:
+                    return None
+
+    def notify_changed(self):
+        with self.changed:
+            self.changed.notify_all()
 
     def get_status(self):
         with self.lock:
@@ -106,12 +155,24 @@ class DownloadScheduler:
         self.active_downloads = max(0, self.active_downloads - 1)
         del self.active_generations[task_id]
         self.scheduled_task_ids.discard(task_id)
+        self._release_dc_locked(task_id)
         return True
 
+    def _release_dc_locked(self, task_id):
+        dc_id = self._task_dcs.pop(task_id, None)
+        if dc_id is None:
+            return
+        remaining = self.active_per_dc.get(dc_id, 0) - 1
+        if remaining > 0:
+            self.active_per_dc[dc_id] = remaining
+        else:
+            self.active_per_dc.pop(dc_id, None)
+
     def release_tasks(self, tasks: Iterable[Dict]):
         with self.lock:
             for task in tasks:
                 self._release_one(task.get("task_id"), task.get(GENERATION_KEY))
+            self.changed.notify_all()
 
     def release_scheduled_task(self, task_id):
         """watchdog/卡死修复撤销当前占槽：作废当代令牌并立即还槽。
@@ -123,6 +184,8 @@ class DownloadScheduler:
                 self.active_downloads = max(0, self.active_downloads - 1)
                 del self.active_generations[task_id]
                 self.scheduled_task_ids.discard(task_id)
+                self._release_dc_locked(task_id)
+                self.changed.notify_all()
                 return True
             # 尚未占槽（仍在排队）：从队列移除，避免重复入队
             return self.remove_task(task_id)
@@ -1,6 +1,8 @@
 """Download status payload helpers."""
 
+import threading
 import time
+from collections import OrderedDict
 
 
 def build_download_status_payload(
@@ -29,9 +31,63 @@ def build_download_status_payload(
         ]
         for task_id in stale:
             drop_task_state(task_id)
-        tasks = {
-            task_id: dict(state)
-            for task_id, state in list(download_status.items())
-        }
+        # 状态 dict 写时复制（只换不改），浅拷贝外层即为一致快照
+        tasks = dict(download_status)
 
     return {"tasks": tasks, "queue": get_queue_status()}
+
+
+class StatusChangeNotifier:
+    """download_status 变更通知器：单调版本号 + Condition。
+
+    状态写入方每次变更后调用 ``notify(task_id)``；SSE 等消费者用 ``wait()`` 阻塞到
+    版本号变化（或超时），从而取代固定间隔轮询，再用 ``changed_since()`` 只取
+    变更过的任务，无需复制并逐项比较全部状态。
+    """
+
+    def __init__(self, *, max_tracked=2048):
+        self._cond = threading.Condition()
+        self._version = 0
+        self.max_tracked = max(1, int(max_tracked))
+        # task_id -> 最后一次变更时的版本号（删除也记一次，供消费者发现移除）；
+        # 按版本号升序排列，changed_since 从尾部倒序扫到 since 为止，只触及变更过的条目
+        self._task_versions = OrderedDict()
+        # 早于该版本的变更无法做增量、需要全量重发：未指明任务的变更，
+        # 或超出 max_tracked 被压缩掉的最旧条目（含已删除任务的墓碑）
+        self._full_version = 0
+
+    @property
+    def version(self):
+        with self._cond:
+            return self._version
+
+    def notify(self, task_id=None):
+        with self._cond:
+            self._version += 1
+            if task_id is None:
+                self._full_version = self._version
+            else:
+                self._task_versions[task_id] = self._version
+                self._task_versions.move_to_end(task_id)
+                while len(self._task_versions) > self.max_tracked:
+                    _task_id, dropped = self._task_versions.popitem(last=False)
+                    self._full_version = max(self._full_version, dropped)
+            self._cond.notify_all()
+
+    def wait(self, last_version, timeout=None):
+        """阻塞到版本号不同于 ``last_version``；返回新版本号，超时返回 None。"""
+        with self._cond:
+            changed = self._cond.wait_for(lambda: self._version != last_version, timeout=timeout)
+            return self._version if changed else None
+
+    def changed_since(self, version):
+        """返回 ``version`` 之后变更过的 task_id 列表；期间有未指明任务的变更时返回 None。"""
+        with self._cond:
+            if self._full_version > version:
+                return None
+            changed = []
+            for task_id, task_version in reversed(self._task_versions.items()):
+                if task_version <= version:
+                    break
+                changed.append(task_id)
+            return changed
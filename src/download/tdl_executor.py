@@ -6,6 +6,8 @@ import subprocess
 import threading
 import time
 
+from .paths import file_size
+
 
 class TdlDownloadExecutor:
     def __init__(
@@ -45,6 +47,7 @@ class TdlDownloadExecutor:
         restart_reset_min_bytes,
         stall_timeout=600,
         resource_lock=None,
+        remove_file=None,
     ):
         self.build_message_url = build_message_url
         self.build_command = build_command
@@ -80,8 +83,28 @@ class TdlDownloadExecutor:
         self.restart_reset_min_bytes = restart_reset_min_bytes
         self.stall_timeout = stall_timeout
         # tdl 单实例 Bolt DB 约束：显式资源锁，串行化 tdl 子进程调用。
-        # None 时用 nullcontext（不加锁），保持既有行为与可测性。
+        # None 时不加锁，保持既有行为与可测性；需要排队时见 _hold_resource_lock。
         self.resource_lock = resource_lock
+        # 删除残留文件的入口（默认 os.remove，测试可注入）
+        self.remove_file = remove_file or os.remove
+
+    @contextlib.contextmanager
+    def _hold_resource_lock(self, task_id):
+        """持有 tdl 资源锁；需要排队时标记 ``waiting_resource``，等锁期间不被判为停滞。"""
+        lock = self.resource_lock
+        if lock is None:
+            yield
+            return
+        if not lock.acquire(blocking=False):
+            self.update_task_state(
+                task_id, waiting_resource=True, error="等待其它 tdl 任务结束...", speed="", speed_bps=0.0
+            )
+            lock.acquire()
+            self.update_task_state(task_id, waiting_resource=False, error="")
+        try:
+            yield
+        finally:
+            lock.release()
 
     def download(self, task_id, entity_id, msg_id, dialog_name, info, filepath, save_dir):
         message_url = self._build_message_url_or_error(task_id, entity_id, msg_id)
@@ -104,7 +127,7 @@ class TdlDownloadExecutor:
             "progress": init_pct,
             "status": "downloading",
             "downloaded": self.format_size(start_offset) if start_offset else "0B",
-            "total": self.format_size(total_bytes) if total_bytes else "",
+            "total": (info.get("size_fmt") or self.format_size(total_bytes)) if total_bytes else "",
             "error": f"续传 {self.format_size(start_offset)}" if start_offset else "",
             "speed": "",
             "msg_id": msg_id,
@@ -123,7 +146,7 @@ class TdlDownloadExecutor:
             while True:
                 try:
                     # tdl 子进程访问单实例 Bolt DB，用资源锁串行化
-                    with (self.resource_lock or contextlib.nullcontext()):
+                    with self._hold_resource_lock(task_id):
                         start_offset, last_retry_size = self._run_once(
                             task_id,
                             entity_id,
@@ -142,7 +165,7 @@ class TdlDownloadExecutor:
                 except Exception as exc:
                     err = str(exc)
                     cur_progress_path = self.resolve_progress_path(filepath)
-                    cur_file_size = os.path.getsize(cur_progress_path) if os.path.exists(cur_progress_path) else 0
+                    cur_file_size = file_size(cur_progress_path)
                     if self.did_restart_from_scratch(
                         retry_count=retry_count,
                         previous_size=last_retry_size,
@@ -237,7 +260,7 @@ class TdlDownloadExecutor:
 
         if retry_count > 0:
             progress_path = self.resolve_progress_path(filepath)
-            resumed_size = os.path.getsize(progress_path) if os.path.exists(progress_path) else start_offset
+            resumed_size = file_size(progress_path, start_offset)
             written = resumed_size
             last_bytes = resumed_size
         else:
@@ -245,11 +268,13 @@ class TdlDownloadExecutor:
             last_bytes = start_offset
 
         allow_offset_correction = start_offset > 0
-        last_time = time.time()
-        last_save_time = time.time()
+        # 间隔计时一律用单调时钟：系统校时/NTP 跳变不会误判停滞或算出负速度
+        last_time = time.monotonic()
+        last_save_time = last_time
         restart_logged = False
         last_progress_written = written
-        last_progress_time = time.time()
+        last_progress_time = last_time
+        last_published = None
 
         while True:
             if self.is_cancelled(task_id):
@@ -257,18 +282,19 @@ class TdlDownloadExecutor:
                 raise Exception("下载已取消")
 
             progress_path = self.resolve_progress_path(filepath)
-            current_size = os.path.getsize(progress_path) if os.path.exists(progress_path) else written
+            current_size = file_size(progress_path, written)
             current_size, allow_offset_correction = self.reconcile_progress_size(
                 current_size=current_size,
                 written=written,
                 allow_offset_correction=allow_offset_correction,
             )
             written = current_size
+            now = time.monotonic()
 
             if written > last_progress_written:
                 last_progress_written = written
-                last_progress_time = time.time()
-            elif time.time() - last_progress_time > self.stall_timeout:
+                last_progress_time = now
+            elif now - last_progress_time > self.stall_timeout:
                 self.log_warning(f"[{task_id}] tdl 下载停滞超过 {self.stall_timeout}s，终止进程")
                 self.stop_process(process)
                 raise RuntimeError("下载停滞，连接可能已断开")
@@ -276,7 +302,7 @@ class TdlDownloadExecutor:
             if (
                 not restart_logged
                 and start_offset > self.restart_reset_min_bytes
-                and time.time() - last_save_time > 10
+                and now - last_save_time > 10
                 and written < int(start_offset * 0.5)
             ):
                 restart_logged = True
@@ -287,20 +313,22 @@ class TdlDownloadExecutor:
                 start_offset = 0
                 last_retry_size = 0
 
-            now = time.time()
             elapsed = now - last_time
             speed_bps = 0.0
             speed_label = ""
             if elapsed >= 0.5:
                 delta = written - last_bytes
                 speed_bps = delta / elapsed if elapsed > 0 else 0.0
-                speed_label = self.format_size(speed_bps) + "/s" if speed_bps > 0 else ""
+                speed_label = self.format_size(int(speed_bps)) + "/s" if speed_bps >= 1 else ""
                 last_bytes = written
                 last_time = now
 
+            # 字节数没变且无新速度时跳过发布：停滞/等待期间不再每 0.5s 写状态、唤醒 SSE
+            publish = written != last_published or bool(speed_label)
             pct = int(written / total_bytes * 100) if total_bytes else 0
-            state = self.copy_task_state(task_id)
+            state = self.copy_task_state(task_id) if publish else None
             if state and state.get("status") not in {"done", "skipped", "error", "cancelled"}:
+                last_published = written
                 updates = {
                     "progress": min(pct, 99) if total_bytes and written < total_bytes else pct,
                     "status": "downloading",
@@ -359,24 +387,31 @@ class TdlDownloadExecutor:
             pass
 
     def _final_size_after_success(self, task_id, process, output_thread, filepath, written, total_bytes):
-        final_progress_path = self.resolve_progress_path(filepath)
-        final_size = os.path.getsize(final_progress_path) if os.path.exists(final_progress_path) else written
         output_thread.join(timeout=0.5)
         if process.returncode != 0:
             last_error = self.last_tdl_error(task_id)
             raise RuntimeError(last_error or f"tdl 退出码 {process.returncode}")
 
+        # 成品优先、其次 .tmp、都不存在才信任解析到的字节数；每个候选只 stat 一次，
+        # 不再先经 resolve_progress_path 比较两者大小（其结果总会被这里覆盖）
         tmp_path = filepath + ".tmp"
-        if os.path.exists(filepath):
-            final_size = os.path.getsize(filepath)
-            if os.path.exists(tmp_path):
-                try:
-                    os.remove(tmp_path)
-                    self.log_info(f"[{task_id}] 清理残留 .tmp 文件")
-                except Exception:
-                    pass
-        elif os.path.exists(tmp_path):
-            final_size = os.path.getsize(tmp_path)
+        try:
+            final_size = os.stat(filepath).st_size
+        except OSError:
+            try:
+                final_size = os.stat(tmp_path).st_size
+            except OSError:
+                final_size = written
+        else:
+            # 同步删除：重试会复用同一个 .tmp 路径，延后删除可能误删新写入的文件。
+            # 直接 remove 并忽略“不存在”，不做 exists 预检（检查与删除之间有竞态）
+            try:
+                self.remove_file(tmp_path)
+                self.log_info(f"[{task_id}] 清理残留 .tmp 文件")
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                self.log_warning(f"[{task_id}] 清理残留 .tmp 文件失败: {exc}")
 
         completion_error = self.validate_completion(total_bytes=total_bytes, final_size=final_size)
         if completion_error:
@@ -389,7 +424,7 @@ class TdlDownloadExecutor:
         err = str(exc)
         self.log_error(f"下载失败 [{task_id}] {info.get('filename','?')}: {err}")
         cur_progress_path = self.resolve_progress_path(filepath)
-        cur_file_size = os.path.getsize(cur_progress_path) if os.path.exists(cur_progress_path) else 0
+        cur_file_size = file_size(cur_progress_path)
 
         if self.should_fallback(err) and not self.is_cancelled(task_id):
             self.remember_fallback_channel(entity_id, err)
@@ -412,7 +447,7 @@ class TdlDownloadExecutor:
             except Exception as fallback_exc:
                 err = str(fallback_exc)
                 self.log_error(f"[{task_id}] Telegram 直连回退失败: {err}")
-                cur_file_size = os.path.getsize(filepath) if os.path.exists(filepath) else cur_file_size
+                cur_file_size = file_size(filepath, cur_file_size)
 
         if self.is_cancelled(task_id) or "取消" in err:
             self.update_task_state(task_id, status="cancelled", error="已取消", finish_time=time.time())
@@ -1,8 +1,10 @@
 """Telegram direct download executor."""
 
-import os
+import asyncio
 import time
 
+from .paths import file_size
+
 
 class TelegramDirectDownloader:
     def __init__(
@@ -27,6 +29,8 @@ class TelegramDirectDownloader:
         log_warning,
         max_retry_attempts,
         chunk_timeout,
+        progress_interval=0.5,
+        throttle=None,
     ):
         self.tg_client = tg_client
         self.ensure_connection = ensure_connection
@@ -45,8 +49,13 @@ class TelegramDirectDownloader:
         self.format_size = format_size
         self.log_info = log_info
         self.log_warning = log_warning
+        # 按对话限速（可选）：每次发起 iter_download 前 await throttle(entity_id)
+        self.throttle = throttle
         self.max_retry_attempts = max_retry_attempts
         self.chunk_timeout = chunk_timeout
+        # 进度发布最小间隔（秒）：每个 512K 分块都写一次状态会反复持久化/唤醒 SSE；
+        # 两次发布之间只累加字节数，速度也只在发布时按区间计算
+        self.progress_interval = progress_interval
 
     def download(self, task_id, entity_id, msg_id, dialog_name, info, filepath):
         self.ensure_connection(allow_reconnect=True)
@@ -65,7 +74,7 @@ class TelegramDirectDownloader:
             "progress": init_pct,
             "status": "downloading",
             "downloaded": self.format_size(start_offset) if start_offset else "0B",
-            "total": self.format_size(total_bytes) if total_bytes else "",
+            "total": (info.get("size_fmt") or self.format_size(total_bytes)) if total_bytes else "",
             "error": f"续传 {self.format_size(start_offset)}" if start_offset else "",
             "speed": "",
             "msg_id": msg_id,
@@ -90,51 +99,71 @@ class TelegramDirectDownloader:
             async def _runner():
                 written = start_offset
                 last_bytes = start_offset
-                last_time = time.time()
-                last_save_time = time.time()
+                last_time = time.monotonic()
+                last_save_time = last_time
+                last_publish = float("-inf")
+                speed_bps = 0.0
+                speed_label = ""
                 mode = "ab" if start_offset else "wb"
-                with open(filepath, mode) as output:
+                # _runner 跑在 tg_loop 上：写盘、发布状态（状态锁 + SQLite）、存续传点都可能阻塞，
+                # 一律放到线程池执行，避免拖慢同一 loop 上的其它 Telegram 请求与并发下载
+                output = await asyncio.to_thread(open, filepath, mode)
+
+                def write_chunk(data):
+                    output.write(data)
+                    output.flush()
+
+                pending = None
+                try:
+                    if self.throttle is not None:
+                        await self.throttle(entity_id)
                     iterator = self.tg_client.iter_download(
                         message.media.document,
                         offset=start_offset,
                         file_size=total_bytes or None,
                         request_size=512 * 1024,
                     )
+                    pending = asyncio.ensure_future(self.next_chunk(iterator, timeout=self.chunk_timeout))
                     while True:
+                        # 在等下一块之前检查取消：预取中的请求随即在 finally 里被收掉
+                        if self.is_cancelled(task_id):
+                            raise RuntimeError("下载已取消")
                         try:
-                            chunk = await self.next_chunk(iterator, timeout=self.chunk_timeout)
+                            chunk = await pending
                         except StopAsyncIteration:
+                            pending = None
                             break
-                        if self.is_cancelled(task_id):
-                            raise RuntimeError("下载已取消")
+                        # 先发起下一块的请求再落盘：网络往返与写盘重叠，链路不在每次写盘时空转。
+                        # 同一时刻仍只有一个 __anext__ 在途，块顺序与追加写语义不变。
+                        pending = asyncio.ensure_future(self.next_chunk(iterator, timeout=self.chunk_timeout))
                         if not chunk:
                             continue
-                        output.write(chunk)
-                        output.flush()
+                        await asyncio.to_thread(write_chunk, chunk)
                         written += len(chunk)
-                        now = time.time()
-                        speed_bps = 0.0
-                        speed_label = ""
-                        elapsed = now - last_time
-                        if elapsed >= 0.5:
-                            delta = written - last_bytes
-                            speed_bps = delta / elapsed if elapsed > 0 else 0.0
-                            speed_label = self.format_size(speed_bps) + "/s" if speed_bps > 0 else ""
-                            last_bytes = written
-                            last_time = now
-                        pct = int(written / total_bytes * 100) if total_bytes else 0
-                        self.update_task_state(
-                            task_id,
-                            progress=min(pct, 99) if total_bytes and written < total_bytes else pct,
-                            status="downloading",
-                            downloaded=self.format_size(written),
-                            downloaded_bytes=written,
-                            error="",
-                            speed=speed_label,
-                            speed_bps=speed_bps,
-                        )
+                        now = time.monotonic()
+                        if now - last_publish >= self.progress_interval:
+                            last_publish = now
+                            elapsed = now - last_time
+                            if elapsed > 0:
+                                speed_bps = (written - last_bytes) / elapsed
+                                # 取整后再格式化：format_size 带 lru_cache，浮点键几乎不会命中
+                                speed_label = self.format_size(int(speed_bps)) + "/s" if speed_bps >= 1 else ""
+                                last_bytes = written
+                                last_time = now
+                            pct = int(written / total_bytes * 100) if total_bytes else 0
+                            await asyncio.to_thread(
+                                self.update_task_state,
+                                task_id,
+                                progress=min(pct, 99) if total_bytes and written < total_bytes else pct,
+                                status="downloading",
+                                downloaded=self.format_size(written),
+                                downloaded_bytes=written,
+                                error="",
+                                speed=speed_label,
+                                speed_bps=speed_bps,
+                            )
                         if now - last_save_time >= 10:
-                            self.save_resume_info(task_id, {
+                            await asyncio.to_thread(self.save_resume_info, task_id, {
                                 "filepath": filepath,
                                 "filename": info["filename"],
                                 "offset": written,
@@ -144,6 +173,18 @@ class TelegramDirectDownloader:
                                 "dialog_name": dialog_name,
                             })
                             last_save_time = now
+                finally:
+                    # 异常/取消退出时收掉预取中的请求，已完成的取走其异常以免 “never retrieved” 告警
+                    if pending is not None:
+                        if not pending.done():
+                            pending.cancel()
+                            try:
+                                await pending
+                            except (asyncio.CancelledError, Exception):
+                                pass
+                        elif not pending.cancelled():
+                            pending.exception()
+                    await asyncio.to_thread(output.close)
                 return written
 
             timeout = self.calc_timeout(max(total_bytes - start_offset, 0) or total_bytes)
@@ -156,7 +197,7 @@ class TelegramDirectDownloader:
                 if retry_count >= self.max_retry_attempts or not self.should_retry_error(exc):
                     raise
                 retry_count += 1
-                current_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+                current_size = file_size(filepath)
                 self.save_resume_info(task_id, {
                     "filepath": filepath,
                     "filename": info["filename"],
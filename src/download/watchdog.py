@@ -98,7 +98,8 @@ class DownloadWatchdog:
 
         for task_id, task in list(items):
             status = task.get("status", "")
-            if status != "downloading":
+            # 排队等 tdl 资源锁的任务尚未开始传输：不计停滞，拿到锁后重新起算
+            if status != "downloading" or task.get("waiting_resource"):
                 self._last_check_progress.pop(task_id, None)
                 continue
 
@@ -3,6 +3,8 @@
 import os
 import time
 
+from .paths import file_size
+
 
 class DownloadWorker:
     def __init__(
@@ -10,7 +12,7 @@ class DownloadWorker:
         *,
         download_dir_for_dialog,
         release_tasks,
-        process_queue,
+        process_queue=None,
         copy_task_state,
         set_task_state,
         update_task_state,
@@ -28,6 +30,8 @@ class DownloadWorker:
     ):
         self.download_dir_for_dialog = download_dir_for_dialog
         self.release_tasks = release_tasks
+        # 可选：release_tasks 已在同一临界区内还槽并唤醒调度线程时不必再传，
+        # 省去还槽后紧接着再抢一次调度锁
         self.process_queue = process_queue
         self.copy_task_state = copy_task_state
         self.set_task_state = set_task_state
@@ -50,15 +54,18 @@ class DownloadWorker:
             os.makedirs(save_dir, exist_ok=True)
         except Exception as exc:
             self.log_error(f"_do_download: 创建目录失败: {exc}")
-            self.release_tasks(task_items)
-            self.process_queue()
+            self._finish(task_items)
             return
 
         for task in task_items:
             self._run_one(task, dialog_name, save_dir)
 
+        self._finish(task_items)
+
+    def _finish(self, task_items):
         self.release_tasks(task_items)
-        self.process_queue()
+        if self.process_queue is not None:
+            self.process_queue()
 
     def _run_one(self, task, dialog_name, save_dir):
         task_id = task.get("task_id")
@@ -135,10 +142,15 @@ class DownloadWorker:
         return self.get_video_info(message) if message else None
 
     def _skip_existing(self, task_id, entity_id, msg_id, dialog_name, info, filepath):
-        if not (os.path.exists(filepath) and os.path.getsize(filepath) == info["size"]):
+        # 单次 stat 同时判断存在与大小（原 exists + getsize 各一次 stat）
+        try:
+            existing_size = os.stat(filepath).st_size
+        except OSError:
+            return False
+        if existing_size != info["size"]:
             return False
         self.log_info(f"跳过(已存在) [{task_id}] {info['filename']}")
-        final_size = info.get("size") or os.path.getsize(filepath)
+        final_size = info.get("size") or existing_size
         self.set_task_state(task_id, {
             "filename": info["filename"],
             "progress": 100,
@@ -170,7 +182,7 @@ class DownloadWorker:
         except Exception as exc:
             err = str(exc)
             self.log_error(f"下载失败 [{task_id}] {info.get('filename','?')}: {err}")
-            cur_file_size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+            cur_file_size = file_size(filepath)
             if self.is_cancelled(task_id) or "取消" in err:
                 self.update_task_state(task_id, status="cancelled", error="已取消", finish_time=time.time())
                 if cur_file_size > 0:
@@ -1,27 +1,30 @@
 """Local downloaded file helpers."""
 
 from .service import (
+    DownloadFileListCache,
     delete_download_file,
-    iter_file_chunks,
+    download_root,
     list_download_files,
-    local_stream_range,
     prepare_open_folder,
     rename_download_file,
     resolve_download_path,
     resolve_file_path,
+    scan_download_files,
 )
-from .thumbnails import cleanup_thumbnail_cache, thumbnail_cache_path, write_thumbnail
+from .thumbnails import cleanup_thumbnail_cache, fetch_thumbnail, thumbnail_cache_path, write_thumbnail
 
 __all__ = [
+    "DownloadFileListCache",
     "cleanup_thumbnail_cache",
     "delete_download_file",
-    "iter_file_chunks",
+    "download_root",
+    "fetch_thumbnail",
     "list_download_files",
-    "local_stream_range",
     "prepare_open_folder",
     "rename_download_file",
     "resolve_download_path",
     "resolve_file_path",
+    "scan_download_files",
     "thumbnail_cache_path",
     "write_thumbnail",
 ]
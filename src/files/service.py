@@ -1,49 +1,72 @@
 """Pure helpers for serving downloaded files."""
 
+import functools
 import os
 import subprocess
 import sys
+import threading
+import time
 from datetime import datetime
 
 
-def list_download_files(download_dir, format_size, page=1, per_page=100):
-    page = max(int(page or 1), 1)
-    per_page = min(max(int(per_page or 100), 10), 500)
-    files = []
+def scan_download_files(download_dir, format_size):
+    """单次 scandir 遍历下载目录，返回按修改时间倒序的文件条目（含 modified_ts）。
 
-    if not os.path.exists(download_dir):
-        return {
-            "files": [],
-            "page": page,
-            "per_page": per_page,
-            "total": 0,
-            "pages": 0,
-        }
-
-    for folder in sorted(os.listdir(download_dir)):
-        folder_path = os.path.join(download_dir, folder)
-        if not os.path.isdir(folder_path):
+    类型判断直接用目录项自带的 d_type，不跟随符号链接：链出下载目录的文件本来也过不了
+    resolve_file_path 的包含校验，列出来只会点不开，还要为每个链接多一次 stat。
+    """
+    files = []
+    try:
+        with os.scandir(download_dir) as entries:
+            folders = sorted(
+                (entry for entry in entries if entry.is_dir(follow_symlinks=False)),
+                key=lambda entry: entry.name,
+            )
+    except OSError:
+        return files
+
+    for folder in folders:
+        try:
+            with os.scandir(folder.path) as entries:
+                children = sorted(entries, key=lambda entry: entry.name)
+        except OSError:
             continue
-        for filename in sorted(os.listdir(folder_path)):
-            file_path = os.path.join(folder_path, filename)
-            if os.path.isfile(file_path):
-                modified_ts = os.path.getmtime(file_path)
-                size_bytes = os.path.getsize(file_path)
-                files.append({
-                    "folder": folder,
-                    "filename": filename,
-                    "size": format_size(size_bytes),
-                    "size_bytes": size_bytes,
-                    "modified": datetime.fromtimestamp(modified_ts).strftime("%Y-%m-%d %H:%M"),
-                    "modified_ts": modified_ts,
-                })
+        for entry in children:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except OSError:
+                # 遍历期间被删除/改名
+                continue
+            modified_ts = stat_result.st_mtime
+            size_bytes = stat_result.st_size
+            files.append({
+                "folder": folder.name,
+                "filename": entry.name,
+                "size": format_size(size_bytes),
+                "size_bytes": size_bytes,
+                "modified": datetime.fromtimestamp(modified_ts).strftime("%Y-%m-%d %H:%M"),
+                "modified_ts": modified_ts,
+            })
 
     files.sort(key=lambda item: item["modified_ts"], reverse=True)
+    return files
+
+
+def list_download_files(download_dir, format_size, page=1, per_page=100, files=None):
+    """分页返回下载文件列表；``files`` 为预先扫描（如缓存）的结果，缺省时现场扫描。"""
+    page = max(int(page or 1), 1)
+    per_page = min(max(int(per_page or 100), 10), 500)
+    if files is None:
+        files = scan_download_files(download_dir, format_size)
+
     total = len(files)
     start = (page - 1) * per_page
-    items = files[start:start + per_page]
-    for item in items:
-        item.pop("modified_ts", None)
+    items = [
+        {key: value for key, value in item.items() if key != "modified_ts"}
+        for item in files[start:start + per_page]
+    ]
 
     return {
         "files": items,
@@ -54,9 +77,65 @@ def list_download_files(download_dir, format_size, page=1, per_page=100):
     }
 
 
+class DownloadFileListCache:
+    """下载目录扫描结果缓存。
+
+    顶层目录与各子目录的 mtime 签名不变时复用上次扫描结果；Telegram 直连下载
+    会就地追加已存在的文件（不改变目录 mtime），因此另设 ``max_age`` 兜底刷新。
+    """
+
+    def __init__(self, download_dir, format_size, *, max_age=2.0, time_func=time.monotonic):
+        self.download_dir = download_dir
+        self.format_size = format_size
+        self.max_age = max_age
+        self.time_func = time_func
+        self._lock = threading.Lock()
+        self._signature = None
+        self._files = None
+        self._scanned_at = 0.0
+
+    def _current_signature(self):
+        # 与 scan_download_files 同样不跟随符号链接：只为真正会被列出的子目录取签名
+        try:
+            top = os.stat(self.download_dir).st_mtime_ns
+            with os.scandir(self.download_dir) as entries:
+                folders = tuple(sorted(
+                    (entry.name, entry.stat(follow_symlinks=False).st_mtime_ns)
+                    for entry in entries
+                    if entry.is_dir(follow_symlinks=False)
+                ))
+        except OSError:
+            return None
+        return top, folders
+
+    def files(self):
+        now = self.time_func()
+        signature = self._current_signature()
+        with self._lock:
+            if (
+                self._files is not None
+                and signature is not None
+                and signature == self._signature
+                and now - self._scanned_at < self.max_age
+            ):
+                return self._files
+        files = scan_download_files(self.download_dir, self.format_size)
+        with self._lock:
+            self._signature = signature
+            self._files = files
+            self._scanned_at = now
+        return files
+
+
+@functools.lru_cache(maxsize=8)
+def download_root(download_dir):
+    """下载根目录的 realpath；进程内不变，缓存后每次请求只需解析用户路径。"""
+    return os.path.realpath(download_dir)
+
+
 def resolve_file_path(download_dir, filepath, *, must_be_file=True):
-    full_path = os.path.realpath(os.path.join(download_dir, filepath))
-    base_path = os.path.realpath(download_dir)
+    base_path = download_root(download_dir)
+    full_path = os.path.realpath(os.path.join(base_path, filepath))
     if os.path.commonpath([base_path, full_path]) != base_path:
         raise ValueError("非法路径")
     if must_be_file and not os.path.isfile(full_path):
@@ -65,7 +144,7 @@ def resolve_file_path(download_dir, filepath, *, must_be_file=True):
 
 
 def resolve_download_path(download_dir, *parts, must_exist=False):
-    base_dir = os.path.realpath(download_dir)
+    base_dir = download_root(download_dir)
     candidate = os.path.realpath(os.path.join(base_dir, *parts))
     if os.path.commonpath([base_dir, candidate]) != base_dir:
         raise ValueError("非法路径")
@@ -74,56 +153,6 @@ def resolve_download_path(download_dir, *parts, must_exist=False):
     return candidate
 
 
-def local_stream_range(file_size, range_header, chunk_size=4 * 1024 * 1024):
-    if not range_header:
-        return None
-    if file_size <= 0 or not range_header.startswith("bytes="):
-        raise ValueError("invalid range")
-
-    range_spec = range_header.replace("bytes=", "", 1).split(",", 1)[0].strip()
-    if "-" not in range_spec:
-        raise ValueError("invalid range")
-
-    start_raw, end_raw = range_spec.split("-", 1)
-    if start_raw:
-        byte_start = int(start_raw)
-        if byte_start < 0 or byte_start >= file_size:
-            raise ValueError("invalid range")
-        if end_raw:
-            byte_end_exclusive = min(int(end_raw) + 1, file_size)
-        else:
-            byte_end_exclusive = min(byte_start + chunk_size, file_size)
-    else:
-        suffix_length = int(end_raw) if end_raw else 0
-        if suffix_length <= 0:
-            raise ValueError("invalid range")
-        byte_start = max(file_size - suffix_length, 0)
-        byte_end_exclusive = file_size
-
-    if byte_end_exclusive <= byte_start:
-        raise ValueError("invalid range")
-
-    content_length = byte_end_exclusive - byte_start
-    return {
-        "start": byte_start,
-        "end": byte_end_exclusive,
-        "content_length": content_length,
-        "content_range": f"bytes {byte_start}-{byte_end_exclusive - 1}/{file_size}",
-    }
-
-
-def iter_file_chunks(file_path, start, length, chunk_size=65536):
-    with open(file_path, "rb") as handle:
-        handle.seek(start)
-        remaining = length
-        while remaining > 0:
-            chunk = handle.read(min(chunk_size, remaining))
-            if not chunk:
-                break
-            remaining -= len(chunk)
-            yield chunk
-
-
 def open_path_with_platform(path):
     if sys.platform == "win32":
         os.startfile(path)
@@ -27,6 +27,32 @@ def write_thumbnail(cache_dir, entity_id, msg_id, data):
     return target
 
 
+def fetch_thumbnail(cache_dir, entity_id, msg_id, download_to):
+    """让下载方直接写入缓存目录内的临时文件，完成后原子替换为缓存路径。
+
+    ``download_to(temp_path)`` 返回实际写入的路径（可能与传入不同），无缩略图时返回空值；
+    相比先下载成 bytes 再写盘，缩略图内容不在 Python 内存里过一遍。
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    target = thumbnail_cache_path(cache_dir, entity_id, msg_id)
+    fd, temp_path = tempfile.mkstemp(prefix=".thumb-", suffix=".jpg", dir=cache_dir)
+    os.close(fd)
+    written = None
+    try:
+        written = download_to(temp_path)
+        if not written or not os.path.exists(written) or os.path.getsize(written) <= 0:
+            return None
+        os.replace(written, target)
+        return target
+    finally:
+        for path in {temp_path, written}:
+            if path and path != target:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+
 def cleanup_thumbnail_cache(cache_dir, max_age_seconds, max_bytes, now=None):
     now = time.time() if now is None else now
     entries = []
@@ -36,11 +62,14 @@ def cleanup_thumbnail_cache(cache_dir, max_age_seconds, max_bytes, now=None):
     if not os.path.isdir(cache_dir):
         return {"bytes": 0, "removed": 0}
 
-    for name in os.listdir(cache_dir):
-        path = os.path.join(cache_dir, name)
-        if not os.path.isfile(path):
+    # scandir 的 is_file() 直接用 d_type，每个条目只剩一次 stat
+    with os.scandir(cache_dir) as it:
+        dir_entries = list(it)
+    for entry in dir_entries:
+        if not entry.is_file():
             continue
-        stat = os.stat(path)
+        path = entry.path
+        stat = entry.stat()
         if now - stat.st_mtime > max_age_seconds:
             os.remove(path)
             removed += 1
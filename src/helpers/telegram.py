@@ -152,14 +152,20 @@ def get_video_info(message):
     height = 0
     filename = None
 
+    # TL 属性类型都是具体类：type() 精确比较省去 isinstance 的 MRO 查找；两项都拿到即停
     for attr in doc.attributes:
-        if isinstance(attr, DocumentAttributeVideo):
+        attr_type = type(attr)
+        if attr_type is DocumentAttributeVideo:
             has_video = True
             duration = getattr(attr, 'duration', 0)
             width = getattr(attr, 'w', 0)
             height = getattr(attr, 'h', 0)
-        elif isinstance(attr, DocumentAttributeFilename):
+        elif attr_type is DocumentAttributeFilename:
             filename = attr.file_name
+        else:
+            continue
+        if has_video and filename:
+            break
 
     if not has_video:
         return None
@@ -2,8 +2,10 @@
 下载管理路由 Blueprint
 包含下载相关的 API 端点
 """
+from collections import OrderedDict
 from flask import Blueprint, jsonify, request, Response
 import json
+import threading
 import time
 
 bp = Blueprint('download', __name__)
@@ -36,6 +38,26 @@ _clear_resume_info = None
 _get_queue_status = None
 _status_lock = None
 _download_status = None
+_wait_status_change = None
+_status_version = None
+_status_changes = None
+
+# SSE 空闲心跳间隔：无状态变更时发送注释帧，防止代理/浏览器断开连接
+PROGRESS_KEEPALIVE_SECONDS = 15
+# 未注入变更通知时的回退轮询间隔
+PROGRESS_POLL_INTERVAL = 0.8
+# SSE 帧编码器：复用单例（json.dumps 带参数时每次都会新建 JSONEncoder），紧凑分隔符 + UTF-8 直出
+_sse_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+# 最近编码过的进度帧：(起始版本, 目标版本) -> (帧字节, complete, 是否空增量)，多标签页共享；
+# 直接缓存 UTF-8 字节，各连接写出时不再逐帧 encode
+PROGRESS_FRAME_CACHE_SIZE = 8
+_SSE_PING = b": ping\n\n"
+_progress_frames = OrderedDict()
+_progress_frames_lock = threading.Lock()
+
+
+def _encode_sse_frame(frame):
+    return f"data: {_sse_json_encoder.encode(frame)}\n\n".encode("utf-8")
 
 
 def init_blueprint(deps):
@@ -49,7 +71,8 @@ def init_blueprint(deps):
         get_video_info_func, terminal_states, last_download_dialog_ref
     可选 keys: resume_all_func, resume_task_func, move_queued_task_func,
         drop_task_state_func, clear_tdl_error_func, clear_resume_info_func,
-        get_queue_status_func, status_lock, download_status_ref
+        get_queue_status_func, status_lock, download_status_ref,
+        wait_status_change_func, status_version_func, status_changes_func
     """
     global _current_entity_cache, _make_task_id, _copy_task_state
     global _set_task_state, _update_task_state, _get_cached_message
@@ -60,6 +83,7 @@ def init_blueprint(deps):
     global _resume_all_incomplete_tasks, _resume_task, _move_queued_task
     global _drop_task_state, _clear_tdl_error, _clear_resume_info
     global _get_queue_status, _status_lock, _download_status
+    global _wait_status_change, _status_version, _status_changes
 
     _current_entity_cache = deps["current_entity_cache"]
     _make_task_id = deps["make_task_id_func"]
@@ -88,6 +112,11 @@ def init_blueprint(deps):
     _get_queue_status = deps.get("get_queue_status_func")
     _status_lock = deps.get("status_lock")
     _download_status = deps.get("download_status_ref")
+    _wait_status_change = deps.get("wait_status_change_func")
+    _status_version = deps.get("status_version_func")
+    _status_changes = deps.get("status_changes_func")
+    with _progress_frames_lock:
+        _progress_frames.clear()  # 帧按通知器版本号缓存，换注入源时作废
 
 
 @bp.route("/api/download", methods=["POST"])
@@ -138,7 +167,7 @@ def api_download():
             "progress": 0,
             "status": "submitting",
             "downloaded": "0B" if total_bytes else "",
-            "total": _format_size(total_bytes) if total_bytes else "",
+            "total": (info.get("size_fmt") or _format_size(total_bytes)) if total_bytes else "",
             "error": "",
             "speed": "",
             "msg_id": mid,
@@ -340,17 +369,26 @@ def api_download_status():
 
 @bp.route("/api/progress")
 def api_progress():
-    """获取进度（SSE流）"""
-    def snapshot():
+    """获取进度（SSE流）
+
+    事件驱动：阻塞等待状态变更通知再推送，首帧为全量快照，之后只推送
+    变更/删除的任务（``delta: true``）；空闲时每 15s 发送心跳注释帧。
+    注入了逐任务版本号时，同一版本区间的帧在所有连接间共享，只编码一次。
+    """
+    def snapshot(task_ids=None):
+        """task_ids 为 None 时复制全部任务，否则只复制这些任务（已删除的不在结果中）。"""
         try:
             with _status_lock:
-                tasks = {key: dict(value) for key, value in list(_download_status.items())}
+                # 状态 dict 写时复制（只换不改），引用即快照，无需逐任务复制
+                if task_ids is None:
+                    tasks = dict(_download_status)
+                else:
+                    tasks = {key: _download_status[key] for key in task_ids if key in _download_status}
+                states = list(_download_status.values())
         except Exception:
-            tasks = {}
+            tasks, states = {}, []
 
-        complete = bool(tasks) and all(
-            state.get("status") in _TERMINAL_STATES for state in tasks.values()
-        )
+        complete = bool(states) and all(state.get("status") in _TERMINAL_STATES for state in states)
         return {
             "tasks": tasks,
             "queue": _get_queue_status(),
@@ -358,19 +396,96 @@ def api_progress():
             "timestamp": time.time(),
         }
 
+    def wait_for_change(version):
+        if _wait_status_change is None:
+            time.sleep(PROGRESS_POLL_INTERVAL)
+            return version
+        return _wait_status_change(version, timeout=PROGRESS_KEEPALIVE_SECONDS)
+
+    def shared_frame(key, build):
+        """同一版本区间的帧在所有 SSE 客户端间共享：只快照、编码一次。"""
+        with _progress_frames_lock:
+            cached = _progress_frames.get(key)
+            if cached is None:
+                frame = build()
+                empty = frame.get("delta") and not frame["tasks"] and not frame["removed"]
+                cached = (_encode_sse_frame(frame), frame["complete"], empty)
+                _progress_frames[key] = cached
+                while len(_progress_frames) > PROGRESS_FRAME_CACHE_SIZE:
+                    _progress_frames.popitem(last=False)
+            return cached
+
+    def build_delta(since, version):
+        changed_ids = _status_changes(since)
+        if changed_ids is None:
+            # 期间有未指明任务的变更：发全量帧让客户端整体替换
+            return snapshot()
+        payload = snapshot(changed_ids)
+        removed = [task_id for task_id in changed_ids if task_id not in payload["tasks"]]
+        return dict(payload, removed=removed, delta=True)
+
+    def generate_shared():
+        version = _status_version()
+        sent_version = None
+        while True:
+            try:
+                if sent_version is None:
+                    text, complete, empty = shared_frame(("full", version), snapshot)
+                else:
+                    text, complete, empty = shared_frame(
+                        (sent_version, version), lambda since=sent_version, upto=version: build_delta(since, upto)
+                    )
+                sent_version = version
+                if not empty or complete:
+                    yield text
+                if complete:
+                    break
+
+                new_version = wait_for_change(version)
+                while new_version is None:
+                    yield _SSE_PING
+                    new_version = wait_for_change(version)
+                version = new_version
+            except Exception:
+                break
+
     def generate():
+        version = _status_version() if _status_version else None
+        previous = None
         while True:
             try:
                 payload = snapshot()
-                yield f"data: {json.dumps(payload)}\n\n"
+                tasks = payload["tasks"]
+                if previous is None:
+                    frame = payload
+                else:
+                    changed = {
+                        task_id: state
+                        for task_id, state in tasks.items()
+                        if previous.get(task_id) != state
+                    }
+                    removed = [task_id for task_id in previous if task_id not in tasks]
+                    frame = dict(payload, tasks=changed, removed=removed, delta=True)
+                    if not changed and not removed and not payload["complete"]:
+                        frame = None
+                previous = tasks
+                if frame is not None:
+                    yield _encode_sse_frame(frame)
                 if payload["complete"]:
                     break
+
+                new_version = wait_for_change(version)
+                while new_version is None:
+                    yield _SSE_PING
+                    new_version = wait_for_change(version)
+                version = new_version
             except Exception:
                 break
-            time.sleep(0.8)
 
+    versioned = _status_version is not None and _status_changes is not None and _wait_status_change is not None
     return Response(
-        generate(),
-        mimetype="text-event-stream",
+        generate_shared() if versioned else generate(),
+        mimetype="text/event-stream",
         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        direct_passthrough=True,
     )
@@ -2,7 +2,9 @@
 文件操作路由 Blueprint
 包含文件管理相关的 API
 """
-from flask import Blueprint, jsonify, request, render_template
+import os
+
+from flask import Blueprint, current_app, jsonify, request, send_from_directory
 
 from src.files import (
     delete_download_file,
@@ -32,8 +34,13 @@ def init_blueprint(deps):
 
 @bp.route("/")
 def index():
-    """首页"""
-    return render_template("index.html")
+    """首页
+
+    index.html 是纯静态页面（无模板变量），直接按文件发送：省去 Jinja 渲染，
+    并由 ETag/Last-Modified 支持 304；max_age=0 让浏览器每次校验，升级后立即生效。
+    """
+    template_dir = os.path.join(current_app.root_path, current_app.template_folder)
+    return send_from_directory(template_dir, "index.html", max_age=0)
 
 
 @bp.route("/api/open-folder", methods=["POST"])
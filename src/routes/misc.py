@@ -2,18 +2,21 @@
 文件服务和其他路由 Blueprint
 包含文件列表、下载、历史记录等
 """
-from flask import Blueprint, jsonify, request, send_from_directory, Response, send_file
+from flask import Blueprint, jsonify, request, send_file
+from werkzeug.exceptions import HTTPException
 import os
 
 from src.files import (
-    iter_file_chunks,
+    download_root,
     list_download_files,
-    local_stream_range,
     resolve_file_path,
 )
 
 bp = Blueprint('fileservice', __name__)
 
+# 已下载完成的视频在 max-age 内由浏览器直接复用已缓存的分段，拖动进度条时少发 Range 请求
+STREAM_MAX_AGE = 3600
+
 # 需要从主 app 注入的依赖
 _DOWNLOAD_DIR = None
 _format_size = None
@@ -26,6 +29,7 @@ _recover_candidates = None
 _abort_if_debug_disabled = None
 _resolve_download_path = None
 _debug_service = None
+_file_list_cache = None
 
 
 def init_blueprint(deps):
@@ -35,12 +39,12 @@ def init_blueprint(deps):
           get_download_status_func, clear_all_tasks_func,
           get_recovery_candidates_func, recover_candidates_func,
           abort_debug_func, resolve_download_path_func,
-          clear_task_ids_func(可选), debug_service(可选)
+          clear_task_ids_func(可选), debug_service(可选), file_list_cache(可选)
     """
     global _DOWNLOAD_DIR, _format_size, _query_task_history
     global _get_download_status, _clear_all_tasks, _clear_task_ids, _get_recovery_candidates
     global _recover_candidates, _abort_if_debug_disabled, _resolve_download_path
-    global _debug_service
+    global _debug_service, _file_list_cache
 
     _DOWNLOAD_DIR = deps["download_dir"]
     _format_size = deps["format_size_func"]
@@ -53,13 +57,22 @@ def init_blueprint(deps):
     _abort_if_debug_disabled = deps["abort_debug_func"]
     _resolve_download_path = deps["resolve_download_path_func"]
     _debug_service = deps.get("debug_service")
+    _file_list_cache = deps.get("file_list_cache")
 
 
-def _find_matching_download_task(folder, filename):
+def _download_task_index():
+    """filename -> [task, ...]（保持任务顺序）；/api/files 一次请求只复制、遍历一次任务表。"""
     tasks = (_get_download_status or (lambda: {}))()
+    index = {}
     for task in tasks.values():
-        if task.get("filename") != filename:
-            continue
+        index.setdefault(task.get("filename"), []).append(task)
+    return index
+
+
+def _find_matching_download_task(folder, filename, task_index=None):
+    if task_index is None:
+        task_index = _download_task_index()
+    for task in task_index.get(filename, ()):
         dialog_name = str(task.get("dialog_name") or "")
         if dialog_name and dialog_name != folder:
             continue
@@ -67,8 +80,8 @@ def _find_matching_download_task(folder, filename):
     return None
 
 
-def _annotate_download_file_item(item):
-    task = _find_matching_download_task(item.get("folder"), item.get("filename"))
+def _annotate_download_file_item(item, task_index=None):
+    task = _find_matching_download_task(item.get("folder"), item.get("filename"), task_index)
     actual_bytes = int(item.get("size_bytes") or 0)
     if not task:
         item["playable"] = actual_bytes > 0
@@ -99,7 +112,7 @@ def _annotate_download_file_item(item):
 
 
 def _download_file_play_block_reason(full_path, size_bytes):
-    rel_path = os.path.relpath(full_path, os.path.realpath(_DOWNLOAD_DIR))
+    rel_path = os.path.relpath(full_path, download_root(_DOWNLOAD_DIR))
     rel_parts = rel_path.split(os.sep, 1)
     if len(rel_parts) != 2:
         return "" if size_bytes > 0 else "文件大小为 0B，无法播放"
@@ -116,9 +129,15 @@ def api_files():
     """获取文件列表"""
     page = max(request.args.get("page", default=1, type=int) or 1, 1)
     per_page = min(max(request.args.get("per_page", default=100, type=int) or 100, 10), 500)
-    payload = list_download_files(_DOWNLOAD_DIR, _format_size, page, per_page)
-    payload["files"] = [_annotate_download_file_item(item) for item in payload.get("files", [])]
-    return jsonify(payload)
+    files = _file_list_cache.files() if _file_list_cache else None
+    payload = list_download_files(_DOWNLOAD_DIR, _format_size, page, per_page, files=files)
+    task_index = _download_task_index()
+    payload["files"] = [_annotate_download_file_item(item, task_index) for item in payload.get("files", [])]
+    # 列表（含任务标注）未变时回 304：文件页反复刷新不再重传整页 JSON
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @bp.route("/api/file/<path:filepath>")
@@ -131,11 +150,9 @@ def api_file_download(filepath):
     except FileNotFoundError:
         return jsonify({"error": "文件不存在"}), 404
 
-    return send_from_directory(
-        os.path.dirname(full_path),
-        os.path.basename(full_path),
-        as_attachment=True
-    )
+    # full_path 已经过 realpath + commonpath 校验，直接 send_file 省去 send_from_directory
+    # 的二次 safe_join/isfile；conditional 支持 Range/ETag，断点续传不必重发整个文件
+    return send_file(full_path, as_attachment=True, conditional=True)
 
 
 @bp.route("/api/stream/<path:filepath>")
@@ -151,23 +168,20 @@ def api_stream(filepath):
         block_reason = _download_file_play_block_reason(full_path, file_size)
         if block_reason:
             return jsonify({"error": block_reason}), 409
-        stream_range = local_stream_range(file_size, request.headers.get("Range"))
-
-        if stream_range:
-            return Response(
-                iter_file_chunks(full_path, stream_range["start"], stream_range["content_length"]),
-                206,
-                mimetype='video/mp4',
-                direct_passthrough=True,
-                headers={
-                    "Content-Range": stream_range["content_range"],
-                    "Accept-Ranges": "bytes",
-                    "Content-Length": str(stream_range["content_length"]),
-                },
-            )
-        else:
-            return send_file(full_path, mimetype='video/mp4')
 
+        # Range/206/416、Content-Range、Accept-Ranges、ETag、Last-Modified 交给 Werkzeug 处理，
+        # 文件经 wsgi.file_wrapper 输出，不再逐块 read + yield
+        response = send_file(
+            full_path, mimetype='video/mp4', conditional=True, etag=True, max_age=STREAM_MAX_AGE
+        )
+        # 文件在 Web 认证之后：只允许浏览器缓存，不让共享代理缓存
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
+
+    except HTTPException:
+        # 416 等由 send_file 的 Range 处理抛出，原样返回
+        raise
     except FileNotFoundError:
         return jsonify({"error": "文件不存在"}), 404
     except ValueError as e:
@@ -36,6 +36,12 @@ def api_status():
     return jsonify(_status_service.status_payload())
 
 
+@bp.route("/api/reconnect", methods=["POST"])
+def api_reconnect():
+    """主动重连 Telegram（/api/status 只读，不再顺带重连）"""
+    return jsonify(_status_service.reconnect_payload())
+
+
 @bp.route("/api/health")
 def api_health():
     """健康检查（完整信息，含 degraded 列表）"""
@@ -3,7 +3,10 @@ Telegram API 路由 Blueprint
 包含 Telegram 相关的 API 端点
 """
 from flask import Blueprint, jsonify, request, send_file, Response
+import asyncio
+import json
 import os
+import queue
 import re
 import threading
 from telethon.errors import (
@@ -13,7 +16,7 @@ from telethon.errors import (
     PhoneNumberInvalidError,
     SessionPasswordNeededError,
 )
-from src.files.thumbnails import thumbnail_cache_path, write_thumbnail
+from src.files.thumbnails import fetch_thumbnail, thumbnail_cache_path
 from src.telegram.video_service import TelegramVideoService
 
 bp = Blueprint('telegram', __name__)
@@ -35,6 +38,8 @@ _RELAY_TOKEN_SECRET = None
 _video_service = None
 _get_video_info = None
 _build_relay_url = None
+_get_entity = None
+_throttle = None
 
 # TG 网页登录（交互式，有状态）：send_code 与 sign_in 跨两次 HTTP，phone_code_hash
 # 必须由服务端保存。单用户 → 一个受锁保护的 slot 足够。
@@ -53,6 +58,28 @@ _dialogs_cache = []
 
 MAX_VIDEO_CACHE_SIZE = 100
 MAX_REPLY_CACHE_SIZE = 50
+# 缩略图按消息固定不变：允许浏览器缓存一天，过期后走 ETag/Last-Modified 条件请求
+THUMB_MAX_AGE = 86400
+# 缩略图只有几十 KB：DC 卡住时尽快放弃，别让请求线程陪着等满 run_async 的默认 600s
+THUMB_FETCH_TIMEOUT = 30
+
+# /api/videos/stream：扫描线程无新结果时的心跳间隔
+VIDEO_STREAM_KEEPALIVE_SECONDS = 15
+_stream_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _cache_headers(payload):
+    """扫描结果是否命中服务端缓存，便于排查“为什么没刷新”。"""
+    if "cached" not in payload:
+        return {}
+    return {"X-Cache": "HIT" if payload.get("cached") else "MISS"}
+
+
+async def _throttled(entity_id, factory):
+    """按对话限速后再发起 Telegram 请求（未注入 throttle_func 时直接发起）。"""
+    if _throttle is not None:
+        await _throttle(entity_id)
+    return await factory()
 
 
 def init_blueprint(deps):
@@ -65,7 +92,8 @@ def init_blueprint(deps):
           videos_cache_ref, replies_cache_ref, video_service(可选),
           get_video_info_func(可选), build_relay_url_func(可选),
           login_run_async_func(可选), finalize_login_func(可选),
-          get_login_state_func(可选)
+          get_login_state_func(可选), get_entity_func(可选),
+          throttle_func(可选)
     """
     global _tg_client, _run_async, _kickoff_dialogs_refresh, _dialogs_cache_snapshot
     global _resolve_requested_entity, _video_info_for_message, _make_excerpt
@@ -75,6 +103,7 @@ def init_blueprint(deps):
     global _video_service
     global _get_video_info, _build_relay_url
     global _login_run_async, _finalize_login, _get_login_state
+    global _get_entity, _throttle
 
     _tg_client = deps["tg_client"]
     _run_async = deps["run_async_func"]
@@ -94,6 +123,8 @@ def init_blueprint(deps):
     _login_run_async = deps.get("login_run_async_func")
     _finalize_login = deps.get("finalize_login_func")
     _get_login_state = deps.get("get_login_state_func")
+    _get_entity = deps.get("get_entity_func")
+    _throttle = deps.get("throttle_func")
 
     # 使用引用，避免复制
     _dialogs_cache = deps["dialogs_cache_ref"]
@@ -113,6 +144,7 @@ def init_blueprint(deps):
         replies_cache=_replies_cache,
         max_video_cache_size=MAX_VIDEO_CACHE_SIZE,
         max_reply_cache_size=MAX_REPLY_CACHE_SIZE,
+        throttle=_throttle,
     )
 
 
@@ -180,7 +212,10 @@ def api_search():
                 query = val
 
     try:
-        entity = _run_async(lambda: _tg_client.get_entity(query))
+        if _get_entity is not None:
+            entity = _get_entity(query)
+        else:
+            entity = _run_async(lambda: _tg_client.get_entity(query))
         name = getattr(entity, "title", None) or getattr(entity, "first_name", str(query))
 
         with cache_lock:
@@ -217,11 +252,72 @@ def api_videos():
             reply_post_limit=reply_post_limit,
             refresh=refresh,
         )
-        return jsonify(payload), status
+        return jsonify(payload), status, _cache_headers(payload)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@bp.route("/api/videos/stream")
+def api_videos_stream():
+    """流式获取视频列表（SSE）
+
+    每解析出一条视频推送一个 message 事件，扫描结束推送 ``done``（其余元数据，
+    不含 videos），失败推送 ``scan_error``。参数与 /api/videos 相同。
+    """
+    dialog_index = request.args.get("dialog_index", type=int)
+    entity_id = request.args.get("entity_id", type=int)
+    source = request.args.get("source", "dialog")
+    limit = request.args.get("limit", 100, type=int)
+    include_replies = request.args.get("include_replies", "false") == "true"
+    reply_post_limit = min(max(request.args.get("reply_post_limit", 50, type=int), 0), 500)
+    refresh = request.args.get("refresh", "false") == "true"
+
+    events = queue.Queue()
+
+    def scan():
+        try:
+            payload, status = _video_service.list_videos(
+                dialog_index=dialog_index,
+                entity_id=entity_id,
+                source=source,
+                limit=limit,
+                include_replies=include_replies,
+                reply_post_limit=reply_post_limit,
+                refresh=refresh,
+                on_video=lambda info: events.put(("message", info)),
+            )
+        except Exception as e:
+            payload, status = {"error": str(e)}, 500
+        if status != 200:
+            events.put(("scan_error", payload))
+            return
+        meta = {key: value for key, value in payload.items() if key != "videos"}
+        meta["count"] = len(payload.get("videos") or [])
+        events.put(("done", meta))
+
+    threading.Thread(target=scan, daemon=True).start()
+
+    def generate():
+        while True:
+            try:
+                event, data = events.get(timeout=VIDEO_STREAM_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            body = _stream_json_encoder.encode(data)
+            if event == "message":
+                yield f"data: {body}\n\n"
+                continue
+            yield f"event: {event}\ndata: {body}\n\n"
+            break
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @bp.route("/api/video_search")
 def api_video_search():
     """搜索视频"""
@@ -270,34 +366,47 @@ def api_replies():
             limit=limit,
             refresh=refresh,
         )
-        return jsonify(payload), status
+        return jsonify(payload), status, _cache_headers(payload)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @bp.route("/api/thumb/<int:msg_id>")
 def api_thumb(msg_id):
-    """获取缩略图"""
+    """获取缩略图（落盘缓存 + 条件 GET，浏览器已有时返回 304）"""
     entity_id = request.args.get("entity", type=int)
     thumb_path = thumbnail_cache_path(_THUMB_DIR, entity_id, msg_id)
 
-    if os.path.exists(thumb_path):
-        return send_file(thumb_path, mimetype="image/jpeg")
-
-    message = _get_cached_message(msg_id, entity_id)
-    if not message:
-        return Response(status=404)
-
-    try:
-        data = _run_async(lambda: _tg_client.download_media(message, file=bytes, thumb=-1), allow_reconnect=False)
-        if not data:
+    if not os.path.exists(thumb_path):
+        message = _get_cached_message(msg_id, entity_id)
+        if not message:
             return Response(status=404)
 
-        write_thumbnail(_THUMB_DIR, entity_id, msg_id, data)
+        try:
+            thumb_path = fetch_thumbnail(
+                _THUMB_DIR,
+                entity_id,
+                msg_id,
+                lambda temp_path: _run_async(
+                    lambda: asyncio.wait_for(
+                        _throttled(
+                            entity_id, lambda: _tg_client.download_media(message, file=temp_path, thumb=-1)
+                        ),
+                        timeout=THUMB_FETCH_TIMEOUT,
+                    ),
+                    timeout=THUMB_FETCH_TIMEOUT + 5,
+                    allow_reconnect=False,
+                ),
+            )
+        except Exception:
+            return Response(status=404)
+        if not thumb_path:
+            return Response(status=404)
 
-        return Response(data, mimetype="image/jpeg")
-    except Exception:
-        return Response(status=404)
+    response = send_file(thumb_path, mimetype="image/jpeg", conditional=True, max_age=THUMB_MAX_AGE)
+    # (entity, msg_id) 对应的缩略图不会变：max-age 内浏览器连条件请求都不发
+    response.cache_control.immutable = True
+    return response
 
 
 @bp.route("/api/online-play-url")
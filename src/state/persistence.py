@@ -4,6 +4,7 @@ import json
 import os
 import re
 import sqlite3
+import sys
 import threading
 import time
 from datetime import datetime
@@ -12,6 +13,17 @@ from typing import Callable, Dict, Iterable, Optional, Tuple
 
 SCHEMA_VERSION = 1
 
+# 取值集合很小、每条任务都带的字段：json.loads 逐行新建字符串，驻留后全表共享同一对象
+_INTERNED_VALUE_KEYS = frozenset({"status", "downloader", "dialog_name", "integrity"})
+
+
+def _intern_state(state: dict) -> dict:
+    """驻留恢复出的任务状态的键与低基数取值，重启后成千上万条历史任务不再各持一份副本。"""
+    return {
+        sys.intern(key): sys.intern(value) if key in _INTERNED_VALUE_KEYS and type(value) is str else value
+        for key, value in state.items()
+    }
+
 
 class TaskStatePersistence:
     """Persist live task state, completed history, and tdl fallback metadata."""
@@ -194,7 +206,7 @@ class TaskStatePersistence:
                     state["queue_position"] = None
                     state["queue_size"] = 0
                     state["finish_time"] = time.time()
-                states[task_id] = state
+                states[task_id] = _intern_state(state)
             except Exception as exc:
                 self.warning_logger(f"[{task_id}] 读取持久化任务状态失败: {exc}")
         return states, len(states)
@@ -3,10 +3,15 @@
 from .status import SystemStatusService
 from .startup import start_runtime_services, validate_runtime_config
 from .shutdown import GracefulShutdown
+from .server import build_server, serve_app
+from .json_provider import CompactJSONProvider
 
 __all__ = [
     "SystemStatusService",
     "start_runtime_services",
     "validate_runtime_config",
     "GracefulShutdown",
+    "build_server",
+    "CompactJSONProvider",
+    "serve_app",
 ]
@@ -0,0 +1,32 @@
+"""Flask JSON provider."""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+_COMPACT_SEPARATORS = (",", ":")
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """紧凑、UTF-8 直出、不排序键的 JSON 响应。
+
+    ``jsonify`` 走的紧凑路径复用单例 JSONEncoder；默认实现每次 json.dumps 都带参数，
+    会为每个响应新建一个编码器。其它调用方式仍交给默认实现。
+    """
+
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._compact_encoder = json.JSONEncoder(
+            ensure_ascii=False,
+            separators=_COMPACT_SEPARATORS,
+            default=self.default,
+        )
+
+    def dumps(self, obj, **kwargs):
+        if kwargs == {"separators": _COMPACT_SEPARATORS}:
+            return self._compact_encoder.encode(obj)
+        return super().dumps(obj, **kwargs)
@@ -0,0 +1,49 @@
+"""HTTP server bootstrap."""
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wsgi import FileWrapper
+
+
+# send_file 默认 8KiB 一块地读写；缩略图（几十 KiB）一次读完，大文件也少走几轮 Python 循环
+FILE_WRAPPER_BLOCK_SIZE = 256 * 1024
+
+
+def _file_wrapper(file, buffer_size=8192):
+    return FileWrapper(file, max(buffer_size, FILE_WRAPPER_BLOCK_SIZE))
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """HTTP/1.1 请求处理器：前端每秒轮询复用同一 TCP 连接，不再每次握手。
+
+    空闲 keep-alive 连接在 ``timeout`` 秒后关闭，避免浏览器长期占用线程；
+    SSE 每 15s 有心跳写出，不受影响。
+    """
+
+    protocol_version = "HTTP/1.1"
+    timeout = 75
+    # 小 JSON 响应与 SSE 帧立即发出，不等 Nagle 合包
+    disable_nagle_algorithm = True
+
+    def make_environ(self):
+        environ = super().make_environ()
+        environ["wsgi.file_wrapper"] = _file_wrapper
+        return environ
+
+    def log_request(self, code="-", size="-"):
+        # 开发服务器默认每个请求写一行访问日志到 stderr；前端每秒轮询下这是纯开销，
+        # 只保留出错请求
+        try:
+            status = int(getattr(code, "value", code))
+        except (TypeError, ValueError):
+            status = 0
+        if status >= 400:
+            super().log_request(code, size)
+
+
+def build_server(app, host, port):
+    """构建线程化 WSGI 服务器（每连接一个 daemon 线程，SSE 长连接不阻塞普通请求）。"""
+    return make_server(host, port, app, threaded=True, request_handler=KeepAliveRequestHandler)
+
+
+def serve_app(app, host, port):
+    build_server(app, host, port).serve_forever()
@@ -39,7 +39,7 @@ class SystemStatusService:
         self._health_cache_lock = threading.RLock()
 
     def status_payload(self):
-        self.ensure_tg_connection(allow_reconnect=True)
+        """只读状态快照：不触发重连、不等重连宽限，前端高频轮询不会被卡住。"""
         return {
             "connected": self.get_tg_connected(),
             "error": self.get_tg_error(),
@@ -48,6 +48,16 @@ class SystemStatusService:
             "tdl": self.get_tdl_status(),
         }
 
+    def reconnect_payload(self):
+        """显式发起重连（后台线程，本请求最多等短暂宽限），返回重连后的连接状态。"""
+        ok = self.ensure_tg_connection(allow_reconnect=True)
+        return {
+            "ok": bool(ok),
+            "connected": self.get_tg_connected(),
+            "error": self.get_tg_error(),
+            "user": self.get_tg_user(),
+        }
+
     def liveness_payload(self):
         """存活探针：进程是否活着（不触碰 Telegram/子进程），始终 200。"""
         return {"status": "alive"}
@@ -3,13 +3,29 @@ src.telegram 包初始化
 """
 from .health_checker import TelegramHealthChecker
 from .debug_service import TelegramDebugService
-from .startup import run_main_telegram_client, run_relay_telegram_client
-from .video_service import TelegramVideoService
+from .rate_limit import AsyncTokenBucket, EntityRateLimiter
+from .startup import (
+    ConnectBackoff,
+    deprioritize_current_thread,
+    restore_default_priority,
+    run_main_telegram_client,
+    run_relay_telegram_client,
+)
+from .video_info import extract_video_info, lookup_video_info
+from .video_service import TelegramVideoService, wire_video
 
 __all__ = [
+    'AsyncTokenBucket',
+    'ConnectBackoff',
+    'EntityRateLimiter',
     'TelegramDebugService',
     'TelegramHealthChecker',
     'TelegramVideoService',
+    'deprioritize_current_thread',
+    'restore_default_priority',
+    'extract_video_info',
+    'lookup_video_info',
     'run_main_telegram_client',
     'run_relay_telegram_client',
+    'wire_video',
 ]
@@ -28,6 +28,7 @@ class TelegramHealthChecker:
         log_warning: Optional[Callable[[str], None]] = None,
         log_error: Optional[Callable[[str], None]] = None,
         reconnect_lock=None,
+        thread_initializer: Optional[Callable[[], object]] = None,
     ):
         """
         初始化健康检查器
@@ -40,6 +41,7 @@ class TelegramHealthChecker:
             on_reconnect_callback: 重连成功后的回调函数
             reconnect_lock: 与 TelegramRuntime 共享的 client 重连锁，避免两处
                 对同一 client 并发 connect/disconnect 交错。None 时不协调。
+            thread_initializer: 检查线程启动时先调用的函数（如恢复调度策略），None 时不调用。
         """
         self.client = client
         self.loop = loop
@@ -47,6 +49,7 @@ class TelegramHealthChecker:
         self.max_retry = max_retry
         self.on_reconnect_callback = on_reconnect_callback
         self._reconnect_lock = reconnect_lock
+        self._thread_initializer = thread_initializer
         self._log_info = log_info or logger.info
         self._log_warning = log_warning or logger.warning
         self._log_error = log_error or logger.error
@@ -79,6 +82,8 @@ class TelegramHealthChecker:
 
     def _check_loop(self):
         """检查循环"""
+        if self._thread_initializer is not None:
+            self._thread_initializer()
         while self._running:
             # 可中断等待：stop() 触发后立即退出，不必等满一个 check_interval
             if self._stop_event.wait(self.check_interval):
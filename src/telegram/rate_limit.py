@@ -0,0 +1,62 @@
+"""Client-side per-entity token buckets for Telegram requests."""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class AsyncTokenBucket:
+    """令牌桶：每秒补充 ``rate`` 个令牌，最多积攒 ``burst`` 个。
+
+    按时间差惰性补充，不需要定时器；令牌不足时先预占（余额可为负）再 sleep 到补足，
+    并发等待者按到达顺序依次顺延，不会同时醒来争抢。只在同一个事件循环内使用。
+    """
+
+    def __init__(self, rate, burst=None, *, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def reserve(self):
+        """预占一个令牌，返回需要等待的秒数（0 表示立即可用）。"""
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1.0
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class EntityRateLimiter:
+    """按 entity_id 分桶限速，避免对同一对话连发请求触发 FLOOD_WAIT 拖停整个会话。"""
+
+    def __init__(self, rate=3.0, burst=5, *, max_entities=256, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_entities = max(1, int(max_entities))
+        self._clock = clock
+        # LRU：长期不用的对话的桶被淘汰（淘汰后重建即满桶，不影响正确性）
+        self._buckets = OrderedDict()
+
+    def bucket(self, entity_id):
+        key = getattr(entity_id, "id", entity_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = AsyncTokenBucket(self.rate, self.burst, clock=self._clock)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_entities:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def acquire(self, entity_id):
+        await self.bucket(entity_id).acquire()
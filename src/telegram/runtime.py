@@ -1,11 +1,19 @@
 """Telegram client runtime helpers and shared caches."""
 
 import asyncio
+import random
 import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
 import time
 from concurrent.futures import TimeoutError as FutureTimeoutError
 
 
+# dialogs_cache 只保留下游需要的 entity/name 投影，不长期持有 Dialog 对象
+# （其上还挂着最后一条消息、草稿、原始 TL dialog 等）
+DialogRef = namedtuple("DialogRef", ["entity", "name"])
+
+
 class TelegramRuntime:
     """Owns Telegram connection execution and in-memory message/dialog caches."""
 
@@ -18,6 +26,7 @@ class TelegramRuntime:
         dialog_fetch_max=2000,
         max_dialog_cache_age=300,
         max_message_cache_size=2000,
+        max_entity_cache_size=512,
     ):
         self.client = client
         self.loop = loop
@@ -25,11 +34,16 @@ class TelegramRuntime:
         self.dialog_fetch_max = dialog_fetch_max
         self.max_dialog_cache_age = max_dialog_cache_age
         self.max_message_cache_size = max_message_cache_size
+        self.max_entity_cache_size = max_entity_cache_size
 
         self.connected = False
         self.connect_error = ""
         self.user_info = ""
         self.needs_login = False   # 会话未授权：等待网页登录向导完成登录
+        # 首次连接成功后置位；此前启动线程正在连接，请求应快速失败而不是并发发起重连
+        self.ready = threading.Event()
+        # 启动结果已确定（已连接或需网页登录），供入口决定何时开始对外服务
+        self.startup_settled = threading.Event()
         self.reconnect_lock = threading.Lock()          # 保护重连状态标志（快，不长持）
         self.client_reconnect_lock = threading.Lock()   # 串行化对 client 的真实 connect/disconnect
         self.last_reconnect_attempt = 0.0
@@ -39,6 +53,9 @@ class TelegramRuntime:
         self.reconnect_backoff_max = 120     # 冷却上限秒数
         self.reconnect_timeout = 45          # 后台重连单次超时
         self.reconnect_grace_seconds = 2.0   # 快速瞬断在本次请求内的宽限（远小于旧 45s 阻塞）
+        # 失败后在 [0, 冷却窗口) 内随机取下次允许重连的时刻（full jitter），多实例/多请求不再对齐冲击代理
+        self.next_reconnect_at = 0.0
+        self._reconnect_jitter = random.random
         self._reconnect_thread_factory = threading.Thread
 
         self.cache_lock = threading.RLock()
@@ -48,10 +65,20 @@ class TelegramRuntime:
         self.dialogs_refresh_in_progress = False
         self.dialogs_refresh_started_at = 0.0
         self.dialogs_refresh_error = ""
-        self.messages_cache = {}
+        # LRU：命中时 move_to_end，超限从最久未用端淘汰
+        self.messages_cache = OrderedDict()
+        # msg_id -> {entity_id: None}：未指定 entity 时的跨频道兜底索引，随 messages_cache 增删
+        self._message_entities_by_id = {}
+        # (entity_id, msg_id) -> (edit_date, video_info | None)，随 messages_cache 同步淘汰
+        self.video_info_cache = OrderedDict()
+        # >0 时 cache_message/cached_video_info 只写不裁剪，由 deferred_eviction 退出时统一裁剪
+        self._eviction_deferred = 0
+        # get_entity 查询（对话 ID / 用户名）-> 实体，LRU；对话列表刷新时预热
+        self.entity_cache = OrderedDict()
         self.current_entity_cache = {}
-        self.videos_cache = {}
-        self.replies_cache = {}
+        # 扫描结果缓存：LRU（命中 move_to_end，超限淘汰最久未用）
+        self.videos_cache = OrderedDict()
+        self.replies_cache = OrderedDict()
         self.last_download_dialog = ""
 
     @staticmethod
@@ -67,6 +94,8 @@ class TelegramRuntime:
         self.needs_login = False
         if user_info:
             self.user_info = user_info
+        self.ready.set()
+        self.startup_settled.set()
 
     def mark_error(self, message):
         self.connected = False
@@ -77,6 +106,11 @@ class TelegramRuntime:
         self.connected = False
         self.needs_login = True
         self.connect_error = message
+        self.startup_settled.set()
+
+    def wait_startup(self, timeout=30):
+        """等待首次连接有结果；超时返回 False（Telegram 仍在重试，Web 照常启动）。"""
+        return self.startup_settled.wait(timeout)
 
     def ensure_connection(self, allow_reconnect=True):
         # 会话未授权（等待网页登录向导）：此时 client 虽已 transport 连接，但绝不能
@@ -99,6 +133,12 @@ class TelegramRuntime:
 
         self.connected = False
 
+        if not self.ready.is_set():
+            # 启动线程仍在首次连接：不抢在它之前发起后台重连
+            if not self.connect_error:
+                self.connect_error = "Telegram 未就绪，请稍后重试..."
+            return False
+
         if not self.loop.is_running():
             self.connect_error = "Telegram 客户端尚未启动，请稍后重试..."
             return False
@@ -127,7 +167,7 @@ class TelegramRuntime:
         return False
 
     def _reconnect_cooldown(self):
-        """指数退避冷却窗口：base, 2*base, 4*base ... 上限 backoff_max。"""
+        """指数退避冷却窗口：base, 2*base, 4*base ... 上限 backoff_max（实际等待在窗口内随机）。"""
         window = self.reconnect_backoff_base * (2 ** min(self.reconnect_failures, 5))
         return min(window, self.reconnect_backoff_max)
 
@@ -138,7 +178,7 @@ class TelegramRuntime:
             if self.reconnect_in_progress:
                 self.connect_error = self.connect_error or "Telegram 重连中，请稍后重试..."
                 return False
-            if now - self.last_reconnect_attempt < self._reconnect_cooldown():
+            if now < self.next_reconnect_at:
                 self.connect_error = self.connect_error or "Telegram 重连中，请稍后重试..."
                 return False
             self.last_reconnect_attempt = now
@@ -174,10 +214,13 @@ class TelegramRuntime:
             self.connected = True
             self.connect_error = ""
             self.reconnect_failures = 0
+            self.next_reconnect_at = 0.0
+            self.ready.set()
         except Exception as exc:
             self.connected = False
             self.connect_error = f"Telegram 重连失败: {exc}"
             self.reconnect_failures += 1
+            self.next_reconnect_at = time.time() + self._reconnect_cooldown() * self._reconnect_jitter()
         finally:
             with self.reconnect_lock:
                 self.reconnect_in_progress = False
@@ -204,28 +247,33 @@ class TelegramRuntime:
 
     def serialize_dialogs(self, dialogs):
         result = []
+        saved = None
         for index, dialog in enumerate(dialogs):
             dtype = "频道" if dialog.is_channel else "群组" if dialog.is_group else "私聊"
-            name = dialog.name
-            is_saved = False
-            try:
-                if getattr(dialog.entity, "is_self", False):
-                    name = "⭐ 个人收藏 (Saved Messages)"
-                    is_saved = True
-            except Exception:
-                pass
-
-            result.append({
+            # 收藏夹只会有一个且必是私聊：找到后不再检查；频道/群组直接短路，
+            # getattr 带默认值本身不抛异常，无需逐个对话包 try/except
+            is_saved = (
+                saved is None
+                and dialog.is_user
+                and getattr(dialog.entity, "is_self", False) is True
+            )
+            item = {
                 "index": index,
-                "name": name,
+                "name": "⭐ 个人收藏 (Saved Messages)" if is_saved else dialog.name,
                 "id": dialog.id,
                 "type": dtype,
                 "is_channel": dialog.is_channel,
                 "is_group": dialog.is_group,
                 "is_saved": is_saved,
-            })
-
-        result.sort(key=lambda item: not item["is_saved"])
+            }
+            if is_saved:
+                saved = item
+            else:
+                result.append(item)
+
+        # 置顶收藏夹，其余保持原顺序（等价于按 not is_saved 稳定排序）
+        if saved is not None:
+            result.insert(0, saved)
         return result
 
     def dialogs_snapshot(self):
@@ -254,8 +302,10 @@ class TelegramRuntime:
             dialogs = self.run_async(self.collect_dialogs, timeout=120)
             serialized = self.serialize_dialogs(dialogs)
             with self.cache_lock:
-                self.dialogs_cache.clear()
-                self.dialogs_cache.extend(dialogs)
+                self.dialogs_cache[:] = [DialogRef(dialog.entity, dialog.name) for dialog in dialogs]
+                # 倒序写入：超限时淘汰的是最久未活跃的对话
+                for dialog in reversed(dialogs):
+                    self.remember_entity(dialog.id, dialog.entity)
                 self.dialogs_serialized_cache[:] = serialized
                 self.dialogs_cache_updated_at = time.time()
                 self.dialogs_refresh_error = ""
@@ -314,28 +364,111 @@ class TelegramRuntime:
         if not key:
             return
         with self.cache_lock:
+            # 不按对象身份清 video_info_cache：每次扫描都会拿到新的 Message 对象，
+            # 内容是否变化由 cached_video_info 的 edit_date 比较判断
+            self._message_entities_by_id.setdefault(key[1], {})[key[0]] = None
             self.messages_cache[key] = message
-            if len(self.messages_cache) > self.max_message_cache_size:
-                for _ in range(min(100, len(self.messages_cache) - self.max_message_cache_size + 50)):
-                    self.messages_cache.pop(next(iter(self.messages_cache)), None)
+            self.messages_cache.move_to_end(key)
+            if not self._eviction_deferred:
+                self._evict_messages_locked()
+
+    def _evict_messages_locked(self):
+        while len(self.messages_cache) > self.max_message_cache_size:
+            evicted, _message = self.messages_cache.popitem(last=False)
+            self.video_info_cache.pop(evicted, None)
+            entities = self._message_entities_by_id.get(evicted[1])
+            if entities is not None:
+                entities.pop(evicted[0], None)
+                if not entities:
+                    del self._message_entities_by_id[evicted[1]]
+        while len(self.video_info_cache) > self.max_message_cache_size:
+            self.video_info_cache.popitem(last=False)
+
+    @contextmanager
+    def deferred_eviction(self):
+        """批量写入（扫描对话）期间推迟缓存淘汰，结束时统一裁剪一次。"""
+        with self.cache_lock:
+            self._eviction_deferred += 1
+        try:
+            yield
+        finally:
+            with self.cache_lock:
+                self._eviction_deferred -= 1
+                if not self._eviction_deferred:
+                    self._evict_messages_locked()
+
+    def cached_video_info(self, message, extract):
+        """按 (entity_id, msg_id) 记忆 ``extract(message)`` 的结果。
+
+        消息被编辑（edit_date 变化）或从 messages_cache 淘汰时失效。
+        返回副本：调用方会在结果上就地补充 entity_id/source 等字段。
+        """
+        key = self.make_msg_cache_key(self.message_entity_id(message), getattr(message, "id", None))
+        if not key:
+            return extract(message)
+        edit_date = getattr(message, "edit_date", None)
+        with self.cache_lock:
+            entry = self.video_info_cache.get(key)
+            if entry is not None:
+                self.video_info_cache.move_to_end(key)
+        if entry is not None and entry[0] == edit_date:
+            info = entry[1]
+        else:
+            info = extract(message)
+            with self.cache_lock:
+                self.video_info_cache[key] = (edit_date, info)
+                self.video_info_cache.move_to_end(key)
+                if not self._eviction_deferred:
+                    while len(self.video_info_cache) > self.max_message_cache_size:
+                        self.video_info_cache.popitem(last=False)
+        return dict(info) if info is not None else None
 
     def get_cached_message(self, msg_id, entity_id=None):
         with self.cache_lock:
             key = self.make_msg_cache_key(entity_id, msg_id)
             if key and key in self.messages_cache:
+                self.messages_cache.move_to_end(key)
                 return self.messages_cache[key]
             if entity_id is None:
                 last_eid = self.current_entity_cache.get("entity_id")
                 key = self.make_msg_cache_key(last_eid, msg_id)
                 if key and key in self.messages_cache:
+                    self.messages_cache.move_to_end(key)
                     return self.messages_cache[key]
                 # 仅在调用方未指定 entity 时才做跨频道兜底；指定了 entity 却未命中
                 # 必须返回 None，避免返回其他频道同 msg_id 的消息导致下错文件。
-                for (_eid, mid), message in list(self.messages_cache.items()):
-                    if mid == msg_id:
-                        return message
+                try:
+                    msg_id = int(msg_id)
+                except (TypeError, ValueError):
+                    return None
+                for eid in self._message_entities_by_id.get(msg_id, ()):
+                    return self.messages_cache.get((eid, msg_id))
         return None
 
+    def cached_entity(self, query):
+        with self.cache_lock:
+            entity = self.entity_cache.get(query)
+            if entity is not None:
+                self.entity_cache.move_to_end(query)
+            return entity
+
+    def remember_entity(self, query, entity):
+        if query is None or entity is None:
+            return
+        with self.cache_lock:
+            self.entity_cache[query] = entity
+            self.entity_cache.move_to_end(query)
+            while len(self.entity_cache) > self.max_entity_cache_size:
+                self.entity_cache.popitem(last=False)
+
+    def get_entity(self, query):
+        """解析实体：先查进程内缓存，未命中才发起一次 get_entity 往返。"""
+        entity = self.cached_entity(query)
+        if entity is None:
+            entity = self.run_async(lambda: self.client.get_entity(query))
+            self.remember_entity(query, entity)
+        return entity
+
     def resolve_requested_entity(self, source="dialog", dialog_index=None, entity_id=None):
         entity = None
         name = "unknown"
@@ -345,7 +478,7 @@ class TelegramRuntime:
                 entity = self.current_entity_cache.get("search_entity")
                 name = self.current_entity_cache.get("search_name", "unknown")
             if entity is None and entity_id:
-                entity = self.run_async(lambda: self.client.get_entity(entity_id))
+                entity = self.get_entity(entity_id)
                 name = getattr(entity, "title", None) or getattr(entity, "first_name", None) or str(entity_id)
         elif dialog_index is not None:
             with self.cache_lock:
@@ -354,7 +487,7 @@ class TelegramRuntime:
                     name = self.dialogs_cache[dialog_index].name
 
         if entity is None and entity_id:
-            entity = self.run_async(lambda: self.client.get_entity(entity_id))
+            entity = self.get_entity(entity_id)
             name = getattr(entity, "title", None) or getattr(entity, "first_name", None) or str(entity_id)
 
         return entity, name
@@ -365,7 +498,7 @@ class TelegramRuntime:
             return message
         message = self.run_async(lambda eid=entity_id, mid=msg_id: self.client.get_messages(eid, ids=mid))
         if not message and entity_id is not None:
-            entity = self.run_async(lambda eid=entity_id: self.client.get_entity(eid))
+            entity = self.get_entity(entity_id)
             if entity is not None:
                 message = self.run_async(lambda ent=entity, mid=msg_id: self.client.get_messages(ent, ids=mid))
         if message:
@@ -1,10 +1,88 @@
 """Telegram startup loops."""
 
 import asyncio
+import os
+import random
 import sys
 import time
 
 
+class ConnectBackoff:
+    """启动连接的重试节奏：带抖动、有上限的指数退避，外加连续失败计数。
+
+    第 n 次失败后等待 min(cap, base * factor**n) * [0.5, 1.5) 秒（上限 cap），抖动避免多实例
+    同步重试；连续失败达到 failure_threshold 次后每次改为固定暂停 pause_seconds，
+    直到一次成功把计数清零。只决定等多久，不拦截任何尝试。
+    """
+
+    def __init__(
+        self,
+        *,
+        base=1.0,
+        factor=2.0,
+        cap=60.0,
+        failure_threshold=5,
+        pause_seconds=30.0,
+        random_func=random.random,
+    ):
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+        self.failure_threshold = failure_threshold
+        self.pause_seconds = pause_seconds
+        self.random_func = random_func
+        self.failures = 0
+
+    @property
+    def paused(self):
+        """连续失败已达阈值：重试改用固定的长暂停。"""
+        return self.failures >= self.failure_threshold
+
+    def record_success(self):
+        self.failures = 0
+
+    def record_failure(self):
+        """记一次失败，返回下次尝试前应等待的秒数。"""
+        self.failures += 1
+        if self.paused:
+            return self.pause_seconds
+        window = self.base * (self.factor ** min(self.failures - 1, 6))
+        return min(self.cap, min(self.cap, window) * (0.5 + self.random_func()))
+
+    def describe(self, delay):
+        if self.paused:
+            return f"连续失败 {self.failures} 次，暂停 {delay:.0f}秒后重试"
+        return f"{delay:.1f}秒后重试"
+
+
+def _set_current_thread_policy(policy_name):
+    setter = getattr(os, "sched_setscheduler", None)
+    policy = getattr(os, policy_name, None)
+    if setter is None or policy is None:
+        return False
+    try:
+        # pid 0 在 Linux 上指调用线程本身，不会波及 Flask 请求线程
+        setter(0, policy, os.sched_param(0))
+    except (OSError, NotImplementedError):
+        return False
+    return True
+
+
+def deprioritize_current_thread():
+    """把当前线程切到 SCHED_BATCH（仅 Linux）：内核按批处理任务调度，唤醒时让位于交互线程。
+
+    只影响 OS 调度优先级、不影响 GIL 的分配；不支持或无权限时静默返回 False。
+    之后由该线程创建的线程会继承此策略，需要正常调度的子线程应先调用
+    :func:`restore_default_priority`。
+    """
+    return _set_current_thread_policy("SCHED_BATCH")
+
+
+def restore_default_priority():
+    """把当前线程恢复为 SCHED_OTHER；用作降级线程所派生线程的初始化函数。"""
+    return _set_current_thread_policy("SCHED_OTHER")
+
+
 def run_main_telegram_client(
     *,
     client,
@@ -19,11 +97,12 @@ def run_main_telegram_client(
     print_func=print,
     sleep_func=time.sleep,
     exit_func=sys.exit,
+    backoff=None,
 ):
     asyncio.set_event_loop(loop)
 
     retry_count = 0
-    retry_delay = 5
+    backoff = backoff or ConnectBackoff()
 
     while True:
         try:
@@ -54,6 +133,7 @@ def run_main_telegram_client(
             runtime.mark_connected(user_info)
             on_connected(user_info)
             retry_count = 0
+            backoff.record_success()
             print_func(f"Telegram 已连接: {user_info}")
             log_info(f"Telegram 已连接: {user_info}")
             init_health_checker()
@@ -62,7 +142,8 @@ def run_main_telegram_client(
 
         except asyncio.TimeoutError:
             retry_count += 1
-            error_message = f"连接超时，{retry_delay}秒后重试... (已重试 {retry_count} 次)"
+            retry_delay = backoff.record_failure()
+            error_message = f"连接超时，{backoff.describe(retry_delay)}... (已重试 {retry_count} 次)"
             runtime.mark_error(error_message)
             on_error(error_message)
             print_func(error_message)
@@ -71,11 +152,11 @@ def run_main_telegram_client(
             except Exception:
                 pass
             sleep_func(retry_delay)
-            retry_delay = min(retry_delay * 1.5, 60)
 
         except Exception as exc:
             retry_count += 1
-            error_message = f"连接失败: {exc}，{retry_delay}秒后重试..."
+            retry_delay = backoff.record_failure()
+            error_message = f"连接失败: {exc}，{backoff.describe(retry_delay)}..."
             runtime.mark_error(error_message)
             on_error(error_message)
             print_func(error_message)
@@ -84,7 +165,6 @@ def run_main_telegram_client(
             except Exception:
                 pass
             sleep_func(retry_delay)
-            retry_delay = min(retry_delay * 1.5, 60)
 
 
 def run_relay_telegram_client(
@@ -102,11 +182,12 @@ def run_relay_telegram_client(
     log_warning,
     log_error,
     sleep_func=time.sleep,
+    backoff=None,
 ):
     asyncio.set_event_loop(loop)
 
     retry_count = 0
-    retry_delay = 5
+    backoff = backoff or ConnectBackoff()
     client = None
 
     while True:
@@ -137,13 +218,15 @@ def run_relay_telegram_client(
             runtime.mark_connected()
             on_connected()
             retry_count = 0
+            backoff.record_success()
             log_info("Relay Telegram 已连接")
             loop.run_forever()
             break
 
         except asyncio.TimeoutError:
             retry_count += 1
-            error_message = f"Relay 连接超时，{retry_delay}秒后重试..."
+            retry_delay = backoff.record_failure()
+            error_message = f"Relay 连接超时，{backoff.describe(retry_delay)}..."
             runtime.mark_error(error_message)
             on_error(error_message)
             log_warning(error_message)
@@ -152,11 +235,11 @@ def run_relay_telegram_client(
             except Exception:
                 pass
             sleep_func(retry_delay)
-            retry_delay = min(retry_delay * 1.5, 60)
 
         except Exception as exc:
             retry_count += 1
-            error_message = f"Relay 连接失败: {exc}，{retry_delay}秒后重试..."
+            retry_delay = backoff.record_failure()
+            error_message = f"Relay 连接失败: {exc}，{backoff.describe(retry_delay)}..."
             runtime.mark_error(error_message)
             on_error(error_message)
             log_warning(error_message)
@@ -165,4 +248,3 @@ def run_relay_telegram_client(
             except Exception:
                 pass
             sleep_func(retry_delay)
-            retry_delay = min(retry_delay * 1.5, 60)
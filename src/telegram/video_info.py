@@ -0,0 +1,100 @@
+"""Video info extraction and display formatting for Telegram messages."""
+
+import functools
+import math
+import re
+from datetime import datetime
+
+from telethon.tl.types import (
+    DocumentAttributeFilename,
+    DocumentAttributeVideo,
+    MessageMediaDocument,
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+
+def message_text(message):
+    raw = getattr(message, "message", None) or getattr(message, "text", None) or ""
+    return _WHITESPACE.sub(" ", raw).strip()
+
+
+def make_excerpt(text, limit=180):
+    if not text:
+        return ""
+    if len(text) <= limit:
+        return text
+    return text[: max(0, limit - 1)].rstrip() + "…"
+
+
+@functools.lru_cache(maxsize=8192)
+def format_size(size_bytes):
+    if size_bytes < 1024:
+        return f"{size_bytes:.1f}B"
+    if not math.isfinite(size_bytes):
+        return f"{size_bytes:.1f}TB"
+    # bit_length 直接定位单位档位（每档 10 bit），替代逐级除 1024 的循环
+    k = min((int(size_bytes).bit_length() - 1) // 10, 4)
+    return f"{size_bytes / (1 << (10 * k)):.1f}{_SIZE_UNITS[k]}"
+
+
+@functools.lru_cache(maxsize=8192)
+def format_duration(seconds):
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h > 0 else f"{m}:{s:02d}"
+
+
+def extract_video_info(message):
+    """从消息解析视频信息；不是视频文档返回 None。不带缓存，缓存见 :func:`lookup_video_info`。"""
+    if type(message.media) is not MessageMediaDocument:
+        return None
+    doc = message.media.document
+    is_video = False
+    filename = None
+    duration = 0
+    # TL 属性类型都是具体类：按 type() 精确比较，省去 isinstance 的 MRO 查找；两项都拿到即停
+    for attr in doc.attributes:
+        attr_type = type(attr)
+        if attr_type is DocumentAttributeVideo:
+            is_video = True
+            duration = attr.duration
+        elif attr_type is DocumentAttributeFilename:
+            filename = attr.file_name
+        else:
+            continue
+        if is_video and filename:
+            break
+    if not is_video:
+        return None
+    if not filename:
+        filename = f"video_{message.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+    raw_text = message_text(message)
+    return {
+        "id": message.id,
+        "document_id": str(getattr(doc, "id", "")),
+        "dc_id": getattr(doc, "dc_id", None),
+        "filename": filename,
+        "size": doc.size,
+        "duration": duration,
+        "date": message.date.strftime("%Y-%m-%d %H:%M"),
+        "has_thumb": bool(doc.thumbs),
+        "text": raw_text,
+        "text_excerpt": make_excerpt(raw_text, 220),
+        "reply_to_msg_id": getattr(getattr(message, "reply_to", None), "reply_to_msg_id", None),
+        # 展示用字符串随缓存条目一次算好，扫描/提交下载时不再重复格式化
+        "size_fmt": format_size(doc.size),
+        "duration_fmt": format_duration(duration),
+    }
+
+
+def lookup_video_info(message, cached_video_info):
+    """经 ``cached_video_info(message, extract)``（TelegramRuntime 的消息级缓存）取视频信息。
+
+    扫描时大多数消息是文本/图片：先按媒体类型精确比较直接拒绝，不走缓存键计算与加锁，
+    也不让这些 None 结果挤占缓存。
+    """
+    if type(getattr(message, "media", None)) is not MessageMediaDocument:
+        return None
+    return cached_video_info(message, extract_video_info)
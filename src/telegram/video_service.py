@@ -1,6 +1,26 @@
 """Telegram video scanning services."""
 
+import asyncio
+import contextlib
 import time
+from collections import OrderedDict
+
+
+# 完整正文只供服务端检索匹配；前端只渲染摘要，下发的视频记录不带这些大字段
+# （评论记录的 parent_text 还会在同一帖子的每条回复里重复一遍）
+SERVER_ONLY_VIDEO_FIELDS = frozenset({"text", "parent_text"})
+
+# Telethon 单次 GetHistory 最多返回 100 条；不超过一页的扫描没有并行的必要
+SCAN_PAGE_SIZE = 100
+
+
+async def _no_throttle(entity_id):
+    return None
+
+
+def wire_video(info):
+    """视频记录的下发投影：去掉仅服务端使用的字段，缓存与响应都存这一份。"""
+    return {key: value for key, value in info.items() if key not in SERVER_ONLY_VIDEO_FIELDS}
 
 
 class TelegramVideoService:
@@ -21,6 +41,12 @@ class TelegramVideoService:
         video_cache_ttl=300,
         reply_cache_ttl=300,
         log_warning=None,
+        comment_scan_concurrency=4,
+        cached_entity=None,
+        remember_entity=None,
+        cache_batch=None,
+        throttle=None,
+        scan_window_concurrency=3,
     ):
         self.client = client
         self.run_async = run_async
@@ -37,6 +63,17 @@ class TelegramVideoService:
         self.video_cache_ttl = video_cache_ttl
         self.reply_cache_ttl = reply_cache_ttl
         self.log_warning = log_warning or (lambda message: None)
+        # 搜索时并发扫描多个帖子的评论区（各自一次 iter_messages 往返），有界以免触发 FloodWait
+        self.comment_scan_concurrency = max(1, comment_scan_concurrency)
+        # 进程内实体缓存（可选）：命中则省掉一次 get_entity 往返
+        self.cached_entity = cached_entity or (lambda query: None)
+        self.remember_entity = remember_entity or (lambda query, entity: None)
+        # 扫描期间批量写消息缓存的上下文（可选）：逐条写入不做淘汰检查，结束时统一裁剪
+        self.cache_batch = cache_batch or contextlib.nullcontext
+        # 按对话限速（可选）：每次发起 Telegram 请求前 await throttle(entity_id)
+        self.throttle = throttle or _no_throttle
+        # 大范围扫描按消息 ID 切成若干窗口并发拉取，有界以免触发 FloodWait
+        self.scan_window_concurrency = max(1, scan_window_concurrency)
 
     @staticmethod
     def _cache_fresh(entry, ttl):
@@ -48,6 +85,28 @@ class TelegramVideoService:
         return (time.time() - entry.get("time", 0)) < ttl
 
 
+    @staticmethod
+    def _touch(cache, key):
+        """LRU 命中：移到最近使用端（注入的是普通 dict 时退化为 FIFO）。"""
+        if isinstance(cache, OrderedDict) and key in cache:
+            cache.move_to_end(key)
+
+    @classmethod
+    def _store(cls, cache, key, value, max_size, ttl=0):
+        cache[key] = value
+        cls._touch(cache, key)
+        if ttl and ttl > 0:
+            # 过期条目不会再命中，写入时顺带清掉，别等 LRU 挤出才释放整批扫描结果
+            expired_before = time.time() - ttl
+            for stale_key in [k for k, entry in cache.items() if entry.get("time", 0) < expired_before]:
+                del cache[stale_key]
+        if isinstance(cache, OrderedDict):
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+        else:
+            while len(cache) > max_size:
+                cache.pop(next(iter(cache)), None)
+
     @staticmethod
     def video_cache_key(entity_id, limit, include_replies, reply_post_limit=0):
         return f"{entity_id}:{limit}:{include_replies}:{reply_post_limit}"
@@ -65,7 +124,9 @@ class TelegramVideoService:
         include_replies=False,
         reply_post_limit=50,
         refresh=False,
+        on_video=None,
     ):
+        """扫描对话视频；``on_video`` 给定时每解析出一条（含缓存命中）即回调，供流式输出。"""
         entity, name = self.resolve_requested_entity(source, dialog_index, entity_id)
         if entity is None:
             return {"error": "无效的对话"}, 400
@@ -86,6 +147,11 @@ class TelegramVideoService:
             cached_videos = self.videos_cache.get(cache_key)
 
         if cached_videos and not refresh and self._cache_fresh(cached_videos, self.video_cache_ttl):
+            with self.cache_lock:
+                self._touch(self.videos_cache, cache_key)
+            if on_video:
+                for info in cached_videos.get("videos", []):
+                    on_video(info)
             return {
                 "videos": cached_videos.get("videos", []),
                 "posts_with_replies": cached_videos.get("posts_with_replies", []),
@@ -93,36 +159,81 @@ class TelegramVideoService:
             }, 200
 
         async def scan():
-            videos = []
-            posts_with_replies = []
-            async for message in self.client.iter_messages(entity, limit=limit):
+            # (msg_id, 视频记录 | None, 带评论帖子 | None)；并发窗口结果乱序到达，最后按 ID 倒序合并
+            records = []
+
+            def collect(message, emit=on_video):
                 info = self.video_info_for_message(message, current_entity_id)
                 if info:
-                    videos.append(info)
-
-                if (
-                    include_replies
-                    and len(posts_with_replies) < reply_post_limit
-                    and getattr(message, "replies", None)
-                    and message.replies.replies > 0
-                ):
-                    posts_with_replies.append({
+                    info = wire_video(info)
+                    if emit:
+                        emit(info)
+                post = None
+                if include_replies and getattr(message, "replies", None) and message.replies.replies > 0:
+                    post = {
                         "id": message.id,
                         "count": message.replies.replies,
                         "text_excerpt": self.make_excerpt(self.message_text(message), 220),
-                    })
+                    }
+                records.append((message.id, info, post))
+
+            await self.throttle(current_entity_id)
+            windows = await self._scan_windows(entity, limit)
+            if not windows:
+                async for message in self.client.iter_messages(entity, limit=limit):
+                    collect(message)
+            else:
+                semaphore = asyncio.Semaphore(self.scan_window_concurrency)
+                # 窗口乱序完成：各窗口先缓冲，前面（更新）的窗口都完成后才按序推送，
+                # 流式输出保持 ID 倒序，与最终缓存列表一致
+                buffers = [[] for _ in windows]
+                finished = [False] * len(windows)
+                next_flush = 0
+
+                def flush_ready():
+                    nonlocal next_flush
+                    while next_flush < len(windows) and finished[next_flush]:
+                        for info in buffers[next_flush]:
+                            on_video(info)
+                        buffers[next_flush] = None
+                        next_flush += 1
+
+                async def fetch_window(index, low, high):
+                    emit = buffers[index].append if on_video else None
+                    # 窗口 (low, high]：min_id/offset_id 均为开区间
+                    async with semaphore:
+                        await self.throttle(current_entity_id)
+                        async for message in self.client.iter_messages(
+                            entity, offset_id=high + 1, min_id=low, limit=high - low
+                        ):
+                            collect(message, emit)
+                    finished[index] = True
+                    if on_video:
+                        flush_ready()
+
+                await asyncio.gather(*(fetch_window(index, low, high) for index, (low, high) in enumerate(windows)))
+                # 窗口内有已删除的 ID 时条数不足，从最旧窗口往下串行补齐，保持“最新 limit 条”的语义
+                remaining = limit - len(records)
+                lowest = windows[-1][0]
+                if remaining > 0 and lowest > 0:
+                    await self.throttle(current_entity_id)
+                    async for message in self.client.iter_messages(entity, offset_id=lowest + 1, limit=remaining):
+                        collect(message)
+                records.sort(key=lambda record: record[0], reverse=True)
+
+            videos = [info for _msg_id, info, _post in records if info]
+            posts_with_replies = [post for _msg_id, _info, post in records if post][:reply_post_limit]
             return videos, posts_with_replies
 
-        videos, posts_with_replies = self.run_async(scan)
+        with self.cache_batch():
+            videos, posts_with_replies = self.run_async(scan)
 
         with self.cache_lock:
-            self.videos_cache[cache_key] = {
+            self._store(self.videos_cache, cache_key, {
                 "videos": videos,
                 "posts_with_replies": posts_with_replies,
                 "time": time.time(),
-            }
-            while len(self.videos_cache) > self.max_video_cache_size:
-                self.videos_cache.pop(next(iter(self.videos_cache)), None)
+            }, self.max_video_cache_size, self.video_cache_ttl)
 
         return {
             "videos": videos,
@@ -142,6 +253,8 @@ class TelegramVideoService:
             cached = self.replies_cache.get(cache_key)
 
         if cached and not refresh and self._cache_fresh(cached, self.reply_cache_ttl):
+            with self.cache_lock:
+                self._touch(self.replies_cache, cache_key)
             return {"videos": cached.get("videos", []), "cached": True}, 200
 
         async def scan_one_post_replies():
@@ -149,14 +262,20 @@ class TelegramVideoService:
                 entity = self.current_entity_cache.get("entity")
 
             if not entity or getattr(entity, "id", 0) != entity_id:
-                entity = await self.client.get_entity(entity_id)
+                entity = self.cached_entity(entity_id)
+                if entity is None:
+                    await self.throttle(entity_id)
+                    entity = await self.client.get_entity(entity_id)
+                    self.remember_entity(entity_id, entity)
 
+            await self.throttle(entity_id)
             parent_message = await self.client.get_messages(entity, ids=post_id)
             parent_text = self.message_text(parent_message) if parent_message else ""
             parent_excerpt = self.make_excerpt(parent_text, 260)
 
             replies_videos = []
             try:
+                await self.throttle(entity_id)
                 async for reply in self.client.iter_messages(entity, reply_to=post_id, limit=limit):
                     info = self.video_info_for_message(
                         reply,
@@ -169,20 +288,38 @@ class TelegramVideoService:
                         },
                     )
                     if info:
-                        replies_videos.append(info)
+                        replies_videos.append(wire_video(info))
             except Exception as exc:
                 self.log_warning(f"扫描帖子 {post_id} 评论失败: {exc}")
             return replies_videos
 
-        replies_videos = self.run_async(scan_one_post_replies)
+        with self.cache_batch():
+            replies_videos = self.run_async(scan_one_post_replies)
 
         with self.cache_lock:
-            self.replies_cache[cache_key] = {"videos": replies_videos, "time": time.time()}
-            while len(self.replies_cache) > self.max_reply_cache_size:
-                self.replies_cache.pop(next(iter(self.replies_cache)), None)
+            self._store(
+                self.replies_cache,
+                cache_key,
+                {"videos": replies_videos, "time": time.time()},
+                self.max_reply_cache_size,
+                self.reply_cache_ttl,
+            )
 
         return {"videos": replies_videos, "cached": False}, 200
 
+    async def _scan_windows(self, entity, limit):
+        """把“最新 limit 条”按消息 ID 倒序切成窗口 [(low, high], ...]；不值得并发时返回 None。"""
+        if not limit or limit <= SCAN_PAGE_SIZE or self.scan_window_concurrency <= 1:
+            return None
+        latest = await self.client.get_messages(entity, limit=1)
+        top_id = getattr(latest[0], "id", 0) if latest else 0
+        if top_id <= limit:
+            return None
+        count = min(self.scan_window_concurrency, -(-limit // SCAN_PAGE_SIZE))
+        width = -(-limit // count)
+        edges = [top_id - min(limit, i * width) for i in range(count + 1)]
+        return [(edges[i + 1], edges[i]) for i in range(count)]
+
     def search_videos(
         self,
         query,
@@ -234,6 +371,7 @@ class TelegramVideoService:
             comments_scanned = 0
             comment_hits = 0
 
+            await self.throttle(current_entity_id)
             async for message in self.client.iter_messages(entity, search=query, limit=limit):
                 info = self.video_info_for_message(message, current_entity_id, "频道搜索")
                 if info:
@@ -241,6 +379,7 @@ class TelegramVideoService:
                     found[key] = info
                     telegram_hits += 1
 
+            await self.throttle(current_entity_id)
             async for message in self.client.iter_messages(entity, limit=scan_limit):
                 scanned += 1
                 parent_text = self.message_text(message)
@@ -262,9 +401,11 @@ class TelegramVideoService:
                         "matched": parent_matched,
                     })
 
-            if include_comments:
-                for post in comment_posts:
+            async def scan_post_comments(post, semaphore):
+                nonlocal comments_scanned, comment_hits
+                async with semaphore:
                     try:
+                        await self.throttle(current_entity_id)
                         async for reply in self.client.iter_messages(entity, reply_to=post["id"], limit=comment_limit):
                             comments_scanned += 1
                             reply_text = self.message_text(reply)
@@ -293,9 +434,14 @@ class TelegramVideoService:
                     except Exception as exc:
                         self.log_warning(f"搜索帖子 {post['id']} 评论失败: {exc}")
 
-            return list(found.values()), telegram_hits, scanned, comments_scanned, comment_hits
+            if include_comments and comment_posts:
+                semaphore = asyncio.Semaphore(self.comment_scan_concurrency)
+                await asyncio.gather(*(scan_post_comments(post, semaphore) for post in comment_posts))
+
+            return [wire_video(info) for info in found.values()], telegram_hits, scanned, comments_scanned, comment_hits
 
-        videos, telegram_hits, scanned, comments_scanned, comment_hits = self.run_async(search_channel)
+        with self.cache_batch():
+            videos, telegram_hits, scanned, comments_scanned, comment_hits = self.run_async(search_channel)
         videos.sort(key=lambda item: item.get("date", ""), reverse=True)
         return {
             "videos": videos,
@@ -6,6 +6,7 @@ let currentEntity = null;
     let evtSource = null;
     let statusTimer = null;
     let isConnected = false;
+    let reconnectInFlight = false;
     let selectedIds = new Set();
     const TASK_ID_SEP = ':';
     const TASK_ID_DOM_SANITIZER = /[^a-zA-Z0-9:_-]/g;
@@ -13,6 +14,7 @@ let currentEntity = null;
     let lastQueueSnapshot = null;
     let reconnectTimer = null;
     let pollGeneration = 0;
+    let progressPausedWhileHidden = false;
     let dismissedTaskIds = new Set();
     let completedTasksNotified = new Set();
     let activeMobilePanel = 'dialogs';
@@ -145,6 +147,17 @@ let currentEntity = null;
       return el.querySelector('.dl-actions');
     }
 
+    // /api/status 只读；未连接时由前端显式请求重连（同一时刻只发一个），连上后立即刷新状态
+    function requestReconnect() {
+      if (reconnectInFlight) return;
+      reconnectInFlight = true;
+      fetch('/api/reconnect', { method: 'POST' }).then(r => r.json()).then(data => {
+        if (data.connected) checkStatus();
+      }).catch(() => {}).finally(() => {
+        reconnectInFlight = false;
+      });
+    }
+
     // 连接状态检查
     function checkStatus() {
       fetch('/api/status').then(r => r.json()).then(data => {
@@ -165,6 +178,7 @@ let currentEntity = null;
           isConnected = false;
           document.getElementById('dialogList').innerHTML = '<div class="empty">' + esc(data.error || 'Telegram 未连接') + '</div>';
           maybeShowTgLogin();
+          requestReconnect();
         }
       }).catch(() => {
         const el = document.getElementById('connStatus');
@@ -392,6 +406,7 @@ let currentEntity = null;
     }
 
     let scanningReplies = false;
+    let activeScanStream = null;
     function scanVideos(forceRefresh) {
       if (!currentEntity) return;
       const limit = document.getElementById('scanLimit').value || 100;
@@ -404,38 +419,78 @@ let currentEntity = null;
       scanningReplies = false; selectedIds.clear(); updateSelectedCount();
 
       const params = new URLSearchParams({ ...currentEntity, limit, include_replies: ir, reply_post_limit: replyPostLimit, refresh: forceRefresh ? 'true' : 'false' });
+      if (activeScanStream) { activeScanStream.close(); activeScanStream = null; }
+      if (window.EventSource) {
+        streamScanVideos(params, ir, forceRefresh);
+        return;
+      }
       fetch('/api/videos?' + params).then(r => r.json()).then(data => {
-        if (data.error) {
-          document.getElementById('videoTitle').textContent = currentDialogName;
-          document.getElementById('videoList').innerHTML = '<div class="empty">' + esc(data.error) + '</div>';
-          return;
-        }
-        if (currentEntity && data.entity_id != null) {
-          currentEntity.entity_id = data.entity_id;
-        }
-        videos = data.videos;
-        const cacheTag = data.cached ? '<span class="badge badge-cache">缓存</span>' : '';
-        updateVideoTitle(cacheTag);
-
-        if (videos.length > 0) {
-          document.getElementById('filterBar').style.display = 'flex';
-          document.getElementById('videoToolbar').style.display = 'flex';
-          document.getElementById('filterText').value = '';
-          document.getElementById('sortBy').value = 'default';
-          document.getElementById('filterSizeMin').value = ''; // Clear new filter input
-          applyFilter();
-        } else if (!data.posts_with_replies || data.posts_with_replies.length === 0) {
-          document.getElementById('videoList').innerHTML = '<div class="empty">未找到视频</div>';
-        }
-
-        if (ir && data.posts_with_replies && data.posts_with_replies.length > 0) {
-          scanRepliesSequentially(data.posts_with_replies, data.entity_id || currentEntity.entity_id, cacheTag, forceRefresh);
-        }
+        renderScanResult(data, ir, forceRefresh);
       }).catch(e => {
         document.getElementById('videoList').innerHTML = '<div class="empty">扫描失败，请检查连接</div>';
       });
     }
 
+    // 流式扫描：每解析出一条视频即推送，标题实时显示进度，扫描结束后一次性渲染列表
+    function streamScanVideos(params, ir, forceRefresh) {
+      const source = new EventSource('/api/videos/stream?' + params);
+      const dialogName = currentDialogName;
+      const streamed = [];
+      activeScanStream = source;
+      const finish = () => {
+        source.close();
+        if (activeScanStream === source) activeScanStream = null;
+      };
+      source.onmessage = ev => {
+        streamed.push(JSON.parse(ev.data));
+        document.getElementById('videoTitle').textContent = `${dialogName} - 扫描中... (${streamed.length} 个视频)`;
+      };
+      source.addEventListener('done', ev => {
+        if (activeScanStream !== source) return;
+        finish();
+        renderScanResult({ ...JSON.parse(ev.data), videos: streamed }, ir, forceRefresh);
+      });
+      source.addEventListener('scan_error', ev => {
+        if (activeScanStream !== source) return;
+        finish();
+        renderScanResult(JSON.parse(ev.data), ir, forceRefresh);
+      });
+      source.onerror = () => {
+        if (activeScanStream !== source) return;
+        finish();
+        document.getElementById('videoList').innerHTML = '<div class="empty">扫描失败，请检查连接</div>';
+      };
+    }
+
+    function renderScanResult(data, ir, forceRefresh) {
+      if (data.error) {
+        document.getElementById('videoTitle').textContent = currentDialogName;
+        document.getElementById('videoList').innerHTML = '<div class="empty">' + esc(data.error) + '</div>';
+        return;
+      }
+      if (currentEntity && data.entity_id != null) {
+        currentEntity.entity_id = data.entity_id;
+      }
+      videos = data.videos;
+      const cacheTag = data.cached ? '<span class="badge badge-cache">缓存</span>' : '';
+      updateVideoTitle(cacheTag);
+
+      if (videos.length > 0) {
+        document.getElementById('filterBar').style.display = 'flex';
+        document.getElementById('videoToolbar').style.display = 'flex';
+        document.getElementById('filterText').value = '';
+        document.getElementById('sortBy').value = 'default';
+        document.getElementById('filterSizeMin').value = ''; // Clear new filter input
+        applyFilter();
+      } else if (!data.posts_with_replies || data.posts_with_replies.length === 0) {
+        document.getElementById('videoList').innerHTML = '<div class="empty">未找到视频</div>';
+      }
+
+      if (ir && data.posts_with_replies && data.posts_with_replies.length > 0) {
+        scanRepliesSequentially(data.posts_with_replies, data.entity_id || currentEntity.entity_id, cacheTag, forceRefresh);
+      }
+    }
+
     function updateVideoTitle(extra = '') {
       document.getElementById('videoTitle').innerHTML = `${esc(currentDialogName)} (${videos.length} 个视频) ${extra}`;
     }
@@ -1059,31 +1114,77 @@ let currentEntity = null;
     }
 
     function startProgressPolling() {
-      // 关闭旧 SSE（若有）
+      // 关闭旧 SSE / 轮询（若有）；pollGeneration 防止多个周期并发
       if (evtSource) { evtSource.close(); evtSource = null; }
       if (reconnectTimer) { clearTimeout(reconnectTimer); reconnectTimer = null; }
-
-      // 用轮询代替 SSE；pollGeneration 防止多个轮询周期并发
       const gen = ++pollGeneration;
-      function doPoll() {
+
+      if (!window.EventSource) {
+        pollDownloadStatus(gen);
+        return;
+      }
+
+      // 事件驱动：服务端状态变化才推送，首帧全量，之后只含变更/删除的任务（delta）
+      const tasks = {};
+      const source = new EventSource('/api/progress');
+      evtSource = source;
+      source.onmessage = (event) => {
         if (gen !== pollGeneration) return;
-        fetch('/api/download_status')
-          .then(r => r.json())
-          .then(payload => {
-            if (gen !== pollGeneration) return;
-            const tasks = payload.tasks || {};
-            Object.entries(tasks).forEach(([tid, info]) => applyDownloadStatus(tid, info));
-            updateQueueSummary(payload.queue || null, tasks);
-            const hasActive = Object.values(tasks).some(t => !isTerminalStatus(t.status));
-            if (hasActive) {
-              reconnectTimer = setTimeout(doPoll, 1000);
-            } else if (Object.keys(tasks).length > 0) {
-              loadFiles();
-            }
-          })
-          .catch(() => { if (gen === pollGeneration) reconnectTimer = setTimeout(doPoll, 2000); });
+        let payload;
+        try { payload = JSON.parse(event.data); } catch (e) { return; }
+        if (!payload.delta) Object.keys(tasks).forEach(tid => delete tasks[tid]);
+        (payload.removed || []).forEach(tid => delete tasks[tid]);
+        Object.entries(payload.tasks || {}).forEach(([tid, info]) => {
+          tasks[tid] = info;
+          applyDownloadStatus(tid, info);
+        });
+        updateQueueSummary(payload.queue || null, tasks);
+        const hasActive = Object.values(tasks).some(t => !isTerminalStatus(t.status));
+        if (!hasActive && Object.keys(tasks).length > 0) {
+          source.close();
+          if (evtSource === source) evtSource = null;
+          loadFiles();
+        }
+      };
+      source.onerror = () => {
+        // 浏览器会自动重连；连接被彻底关闭时退回轮询
+        if (gen !== pollGeneration || source.readyState !== EventSource.CLOSED) return;
+        if (evtSource === source) evtSource = null;
+        reconnectTimer = setTimeout(() => pollDownloadStatus(gen), 2000);
+      };
+    }
+
+    // 后台标签页不占服务端连接线程：隐藏时断开进度流，回到前台再重连（首帧全量，自然补齐）
+    document.addEventListener('visibilitychange', () => {
+      if (document.hidden) {
+        if (!evtSource && !reconnectTimer) return;
+        if (evtSource) { evtSource.close(); evtSource = null; }
+        if (reconnectTimer) { clearTimeout(reconnectTimer); reconnectTimer = null; }
+        pollGeneration++;
+        progressPausedWhileHidden = true;
+      } else if (progressPausedWhileHidden) {
+        progressPausedWhileHidden = false;
+        startProgressPolling();
       }
-      doPoll();
+    });
+
+    function pollDownloadStatus(gen) {
+      if (gen !== pollGeneration) return;
+      fetch('/api/download_status')
+        .then(r => r.json())
+        .then(payload => {
+          if (gen !== pollGeneration) return;
+          const tasks = payload.tasks || {};
+          Object.entries(tasks).forEach(([tid, info]) => applyDownloadStatus(tid, info));
+          updateQueueSummary(payload.queue || null, tasks);
+          const hasActive = Object.values(tasks).some(t => !isTerminalStatus(t.status));
+          if (hasActive) {
+            reconnectTimer = setTimeout(() => pollDownloadStatus(gen), 1000);
+          } else if (Object.keys(tasks).length > 0) {
+            loadFiles();
+          }
+        })
+        .catch(() => { if (gen === pollGeneration) reconnectTimer = setTimeout(() => pollDownloadStatus(gen), 2000); });
     }
 
     function updateHealthSummary(data) {
@@ -108,6 +108,21 @@ class TestTaskStatePersistence:
             assert items[0]["task_id"] == "t1"
             store.close()
 
+    def test_load_states_interns_low_cardinality_values(self):
+        from src.state.persistence import TaskStatePersistence
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            store = TaskStatePersistence(state_dir=state_dir, terminal_states={"done"})
+            for task_id in ("t1", "t2"):
+                store.persist_state(task_id, {"status": "done", "dialog_name": "chat", "filename": f"{task_id}.mp4"})
+
+            states, _ = store.load_states()
+            # 每行 json.loads 各自新建字符串；驻留后跨任务共享同一对象
+            assert states["t1"]["status"] is states["t2"]["status"]
+            assert states["t1"]["dialog_name"] is states["t2"]["dialog_name"]
+            assert list(states["t1"])[0] is list(states["t2"])[0]
+            store.close()
+
     def test_tdl_fallback_cache(self):
         from src.state.persistence import TaskStatePersistence
 
@@ -331,6 +346,48 @@ class TestDownloadScheduler:
         assert scheduler.release_scheduled_task("t2") is True  # t2 仍排队
         assert scheduler.get_status() == {"active": 1, "queued": 0, "max": 1}
 
+    def test_dispatcher_wakes_on_enqueue_and_release(self):
+        import queue
+        from src.download.dispatcher import DownloadDispatcher
+        from src.download.scheduler import DownloadScheduler
+
+        scheduler = DownloadScheduler(max_concurrent=1)
+        submitted = queue.Queue()
+        dispatcher = DownloadDispatcher(scheduler, submitted.put)
+        try:
+            scheduler.add_task({"task_id": "t1"})
+            scheduler.add_task({"task_id": "t2"})
+            dispatcher.wake()
+            first = submitted.get(timeout=2)
+            assert first["task_id"] == "t1"
+            assert submitted.empty()
+
+            scheduler.release_tasks([first])
+            assert submitted.get(timeout=2)["task_id"] == "t2"
+        finally:
+            dispatcher.stop()
+        assert scheduler.wait_next_task(timeout=0.01) is None
+
+    def test_per_dc_bulkhead_lets_other_dcs_pass(self):
+        from src.download.scheduler import DownloadScheduler
+
+        scheduler = DownloadScheduler(max_concurrent=3, max_per_dc=1)
+        for task_id, dc_id in (("a1", 2), ("a2", 2), ("b1", 4), ("c1", None)):
+            scheduler.add_task({"task_id": task_id, "info": {"dc_id": dc_id}})
+
+        first = scheduler.get_next_task()
+        # DC2 已占满：a2 留在队首，DC4 与未知 DC 的任务越过它先占槽
+        assert [first["task_id"], scheduler.get_next_task()["task_id"], scheduler.get_next_task()["task_id"]] == [
+            "a1", "b1", "c1",
+        ]
+        assert scheduler.active_per_dc == {2: 1, 4: 1}
+        assert [task["task_id"] for task in scheduler.queue] == ["a2"]
+
+        scheduler.release_tasks([first])
+        assert scheduler.active_per_dc == {4: 1}
+        assert scheduler.get_next_task()["task_id"] == "a2"
+        assert scheduler.release_scheduled_task("a2") is True
+        assert scheduler.active_per_dc == {4: 1}
 
 class TestDownloadManager:
     def test_enqueue_selects_telegram(self):
@@ -418,6 +475,16 @@ class TestDownloadWorker:
         assert calls["released"]
         assert calls["processed"] == 1
 
+    def test_release_alone_is_enough_without_process_queue(self):
+        worker, states, _resumes, calls = self.make_worker(process_queue=None)
+
+        worker.run([{"task_id": "t1", "entity_id": 1, "msg_id": 2}], "chat")
+
+        # 调度器的 release_tasks 自带唤醒：未注入 process_queue 时只还槽一次
+        assert calls["released"] == [[{"task_id": "t1", "entity_id": 1, "msg_id": 2}]]
+        assert calls["processed"] == 0
+        assert states["t1"]["status"] == "error"
+
     def test_existing_file_is_skipped(self):
         with tempfile.TemporaryDirectory() as base:
             file_path = os.path.join(base, "video.mp4")
@@ -530,6 +597,185 @@ class TestTelegramDirectDownloader:
             assert states["t1"]["final_bytes"] == 6
             assert "t1" not in resumes
 
+    def test_download_throttles_progress_updates(self):
+        import asyncio
+        import threading
+        from src.download.telegram_downloader import TelegramDirectDownloader
+
+        class FakeClient:
+            async def iter_download(self, *_args, **_kwargs):
+                for _ in range(50):
+                    yield b"x"
+
+        async def next_chunk(iterator, timeout=60):
+            return await iterator.__anext__()
+
+        message = Mock()
+        message.media.document = object()
+        updates = []
+
+        downloader = TelegramDirectDownloader(
+            tg_client=FakeClient(),
+            ensure_connection=lambda allow_reconnect=True: True,
+            run_async=lambda factory, **_kwargs: asyncio.run(factory()),
+            resolve_message=lambda *_args, **_kwargs: message,
+            next_chunk=next_chunk,
+            detect_resume_offset=lambda *_args, **_kwargs: 0,
+            save_resume_info=lambda *_args: None,
+            clear_resume_info=lambda *_args: None,
+            set_task_state=lambda *_args: None,
+            update_task_state=lambda task_id, **fields: updates.append(dict(fields, thread=threading.get_ident())),
+            is_cancelled=lambda _task_id: False,
+            should_retry_error=lambda _exc: False,
+            validate_completion=lambda **_kwargs: None,
+            calc_timeout=lambda _size: 30,
+            format_size=lambda size: f"{int(size)}B",
+            log_info=lambda _msg: None,
+            log_warning=lambda _msg: None,
+            max_retry_attempts=1,
+            chunk_timeout=60,
+            progress_interval=3600,
+        )
+
+        with tempfile.TemporaryDirectory() as base:
+            downloader.download(
+                "t1", -100123, 42, "chat",
+                {"filename": "video.mp4", "size": 50, "document_id": "doc"},
+                os.path.join(base, "video.mp4"),
+            )
+
+        progress = [fields for fields in updates if fields.get("status") == "downloading"]
+        assert len(progress) == 1
+        # 事件循环内的进度发布走线程池，不在 loop 线程上持锁/写库
+        assert progress[0]["thread"] != threading.get_ident()
+        assert updates[-1]["status"] == "done"
+        assert updates[-1]["downloaded_bytes"] == 50
+
+    def test_download_cancels_prefetched_chunk_on_abort(self):
+        import asyncio
+        from src.download.telegram_downloader import TelegramDirectDownloader
+
+        events = []
+
+        class FakeClient:
+            async def iter_download(self, *_args, **_kwargs):
+                yield b"abc"
+                try:
+                    await asyncio.sleep(60)
+                except asyncio.CancelledError:
+                    events.append("prefetch-cancelled")
+                    raise
+                yield b"def"
+
+        async def next_chunk(iterator, timeout=60):
+            return await iterator.__anext__()
+
+        message = Mock()
+        message.media.document = object()
+        cancelled = {"flag": False}
+
+        def update_state(task_id, **fields):
+            # 第一块落盘并发布进度后用户点了取消
+            if fields.get("downloaded_bytes") == 3:
+                cancelled["flag"] = True
+
+        downloader = TelegramDirectDownloader(
+            tg_client=FakeClient(),
+            ensure_connection=lambda allow_reconnect=True: True,
+            run_async=lambda factory, **_kwargs: asyncio.run(factory()),
+            resolve_message=lambda *_args, **_kwargs: message,
+            next_chunk=next_chunk,
+            detect_resume_offset=lambda *_args, **_kwargs: 0,
+            save_resume_info=lambda *_args: None,
+            clear_resume_info=lambda *_args: None,
+            set_task_state=lambda *_args: None,
+            update_task_state=update_state,
+            is_cancelled=lambda _task_id: cancelled["flag"],
+            should_retry_error=lambda _exc: False,
+            validate_completion=lambda **_kwargs: None,
+            calc_timeout=lambda _size: 30,
+            format_size=lambda size: f"{int(size)}B",
+            log_info=lambda _msg: None,
+            log_warning=lambda _msg: None,
+            max_retry_attempts=1,
+            chunk_timeout=60,
+            progress_interval=0,
+        )
+
+        with tempfile.TemporaryDirectory() as base:
+            filepath = os.path.join(base, "video.mp4")
+            with pytest.raises(RuntimeError, match="取消"):
+                downloader.download(
+                    "t1", -100123, 42, "chat",
+                    {"filename": "video.mp4", "size": 6, "document_id": "doc"},
+                    filepath,
+                )
+            with open(filepath, "rb") as handle:
+                assert handle.read() == b"abc"
+
+        # 写第一块时已预取第二块；取消退出时在途请求被收掉，不会悬挂在 loop 上
+        assert events == ["prefetch-cancelled"]
+
+    def test_download_formats_progress_labels_each_publish(self):
+        import asyncio
+        from src.download.telegram_downloader import TelegramDirectDownloader
+
+        chunk = b"x" * (256 * 1024)
+
+        class FakeClient:
+            async def iter_download(self, *_args, **_kwargs):
+                for _ in range(8):
+                    yield chunk
+
+        async def next_chunk(iterator, timeout=60):
+            return await iterator.__anext__()
+
+        message = Mock()
+        message.media.document = object()
+        updates = []
+        formatted = []
+
+        def format_size(size):
+            formatted.append(int(size))
+            return f"{int(size)}B"
+
+        downloader = TelegramDirectDownloader(
+            tg_client=FakeClient(),
+            ensure_connection=lambda allow_reconnect=True: True,
+            run_async=lambda factory, **_kwargs: asyncio.run(factory()),
+            resolve_message=lambda *_args, **_kwargs: message,
+            next_chunk=next_chunk,
+            detect_resume_offset=lambda *_args, **_kwargs: 0,
+            save_resume_info=lambda *_args: None,
+            clear_resume_info=lambda *_args: None,
+            set_task_state=lambda *_args: None,
+            update_task_state=lambda task_id, **fields: updates.append(fields),
+            is_cancelled=lambda _task_id: False,
+            should_retry_error=lambda _exc: False,
+            validate_completion=lambda **_kwargs: None,
+            calc_timeout=lambda _size: 30,
+            format_size=format_size,
+            log_info=lambda _msg: None,
+            log_warning=lambda _msg: None,
+            max_retry_attempts=1,
+            chunk_timeout=60,
+            progress_interval=0,
+        )
+
+        with tempfile.TemporaryDirectory() as base:
+            downloader.download(
+                "t1", -100123, 42, "chat",
+                {"filename": "video.mp4", "size": len(chunk) * 8, "document_id": "doc", "size_fmt": "2MB"},
+                os.path.join(base, "video.mp4"),
+            )
+
+        progress = [fields for fields in updates if fields.get("status") == "downloading"]
+        assert len(progress) == 8
+        # 每次发布都按当前字节数格式化，文案与 downloaded_bytes 一致
+        assert all(fields["downloaded"] == f"{fields['downloaded_bytes']}B" for fields in progress)
+        # 速度先取整再格式化，lru_cache 的键空间不会被浮点数撑爆
+        assert all(type(size) is int for size in formatted)
+
 
 class TestTdlRuntime:
     def test_url_support_and_command(self):
@@ -628,19 +874,21 @@ class TestTdlDownloadExecutor:
         assert updates["t1"]["status"] == "error"
         assert updates["t1"]["error"] == "bad url"
 
-    def test_download_acquires_resource_lock(self):
+    @pytest.mark.parametrize("contended", [False, True])
+    def test_download_acquires_resource_lock(self, contended):
         from src.download.tdl_executor import TdlDownloadExecutor
 
         events = []
 
         class TrackLock:
-            def __enter__(self):
-                events.append("enter")
-                return self
+            def acquire(self, blocking=True):
+                if not blocking and contended:
+                    return False
+                events.append("acquire")
+                return True
 
-            def __exit__(self, *_args):
-                events.append("exit")
-                return False
+            def release(self):
+                events.append("release")
 
         executor = TdlDownloadExecutor(
             build_message_url=lambda *_args: "https://t.me/c/1/1",
@@ -657,7 +905,7 @@ class TestTdlDownloadExecutor:
             prepare_telegram_fallback_target=lambda path: path,
             save_resume_info=lambda *_args: None,
             clear_resume_info=lambda _task_id: None,
-            update_task_state=lambda *_args, **_kwargs: None,
+            update_task_state=lambda _task_id, **kwargs: events.append(("update", kwargs.get("waiting_resource"))),
             set_task_state=lambda *_args: None,
             copy_task_state=lambda _task_id: {},
             is_cancelled=lambda _task_id: False,
@@ -678,9 +926,80 @@ class TestTdlDownloadExecutor:
             resource_lock=TrackLock(),
         )
         # 跳过真实子进程，仅验证 _run_once 被资源锁包裹
-        executor._run_once = lambda *_args, **_kwargs: (0, 0)
+        executor._run_once = lambda *_args, **_kwargs: events.append("run") or (0, 0)
         executor.download("t1", 123, 4, "chat", {"filename": "v.mp4", "size": 1}, "/tmp/v.mp4", "/tmp")
-        assert events == ["enter", "exit"]
+        held = ["acquire", "run", "release"]
+        # 锁被占用时先标记等待，拿到锁后清除，停滞检测据此跳过排队中的任务
+        waited = [("update", True), "acquire", ("update", False)] + held[1:]
+        assert [e for e in events if e != ("update", None)] == (waited if contended else held)
+
+    def test_leftover_tmp_removal_goes_through_remove_file(self):
+        from src.download.tdl_executor import TdlDownloadExecutor
+
+        removed = []
+        executor = TdlDownloadExecutor(
+            build_message_url=lambda *_args: "https://t.me/c/1/1",
+            build_command=lambda *_args: [],
+            clear_tdl_error=lambda _task_id: None,
+            register_process=lambda *_args: None,
+            drop_process=lambda _task_id: None,
+            get_process=lambda _task_id: None,
+            set_tdl_error=lambda *_args: None,
+            last_tdl_error=lambda _task_id: "",
+            stop_process=lambda _process: None,
+            detect_resume_offset=lambda *_args: 0,
+            resolve_progress_path=lambda path: path,
+            prepare_telegram_fallback_target=lambda path: path,
+            save_resume_info=lambda *_args: None,
+            clear_resume_info=lambda _task_id: None,
+            update_task_state=lambda *_args, **_kwargs: None,
+            set_task_state=lambda *_args: None,
+            copy_task_state=lambda _task_id: {},
+            is_cancelled=lambda _task_id: False,
+            should_capture_error_line=lambda _line: False,
+            choose_more_specific_error=lambda current, _candidate: current,
+            reconcile_progress_size=lambda current_size, _written, allow: (current_size, allow),
+            did_restart_from_scratch=lambda **_kwargs: False,
+            should_retry_error=lambda *_args, **_kwargs: False,
+            should_fallback=lambda _err: False,
+            remember_fallback_channel=lambda *_args: None,
+            validate_completion=lambda **_kwargs: None,
+            download_with_telegram=lambda *_args: None,
+            format_size=lambda size: f"{int(size)}B",
+            log_info=lambda _msg: None,
+            log_warning=lambda _msg: None,
+            log_error=lambda _msg: None,
+            restart_reset_min_bytes=64,
+            remove_file=removed.append,
+        )
+        process = Mock(returncode=0)
+        output_thread = Mock()
+
+        with tempfile.TemporaryDirectory() as base:
+            filepath = os.path.join(base, "v.mp4")
+            with open(filepath, "wb") as handle:
+                handle.write(b"abcd")
+            with open(filepath + ".tmp", "wb") as handle:
+                handle.write(b"ab")
+
+            final_size = executor._final_size_after_success("t1", process, output_thread, filepath, 4, 4)
+
+            assert final_size == 4
+            assert removed == [filepath + ".tmp"]
+            assert os.path.exists(filepath + ".tmp")
+
+            # 已被别处删掉的 .tmp 不算错误
+            def already_gone(path):
+                raise FileNotFoundError(path)
+
+            executor.remove_file = already_gone
+            assert executor._final_size_after_success("t1", process, output_thread, filepath, 4, 4) == 4
+
+            os.remove(filepath)
+            assert executor._final_size_after_success("t1", process, output_thread, filepath, 4, 4) == 2
+            os.remove(filepath + ".tmp")
+            # 两个文件都不在时退回 tdl 输出解析到的字节数
+            assert executor._final_size_after_success("t1", process, output_thread, filepath, 3, 0) == 3
 
 
 class TestDownloadWorkerPool:
@@ -777,6 +1096,9 @@ class TestDownloadPathHelpers:
         )
 
         assert sanitize_dialog_name("bad/name?") == "bad_name_"
+        assert sanitize_dialog_name("中文 频道-1") == "中文 频道-1"
+        assert sanitize_dialog_name("  ") == "unknown"
+        assert sanitize_dialog_name(None) == "unknown"
         assert download_dir_for_dialog("/downloads", "chat/name") == os.path.join("/downloads", "chat_name")
 
         with tempfile.TemporaryDirectory() as base:
@@ -788,6 +1110,26 @@ class TestDownloadPathHelpers:
                 handle.write(b"12")
             assert resolve_tdl_progress_path(final_path) == final_path
 
+    def test_file_size_and_progress_path_with_missing_files(self):
+        from src.download.paths import file_size, resolve_tdl_progress_path
+
+        with tempfile.TemporaryDirectory() as base:
+            final_path = os.path.join(base, "video.mp4")
+            tmp_path = final_path + ".tmp"
+            assert file_size(final_path) == 0
+            assert file_size(final_path, None) is None
+            assert resolve_tdl_progress_path(final_path) == final_path
+
+            with open(tmp_path, "wb") as handle:
+                handle.write(b"123")
+            assert file_size(tmp_path) == 3
+            assert resolve_tdl_progress_path(final_path) == tmp_path
+
+            # 最终文件比 .tmp 小：仍以 .tmp 为进度
+            with open(final_path, "wb") as handle:
+                handle.write(b"1")
+            assert resolve_tdl_progress_path(final_path) == tmp_path
+
     def test_prepare_telegram_fallback_target(self):
         from src.download.paths import prepare_telegram_fallback_target
 
@@ -822,6 +1164,26 @@ class TestResumeStore:
 
             store.clear("t1")
             assert store.load("t1") is None
+            store.close()
+
+    def test_legacy_json_files_migrate_into_sqlite(self):
+        import json
+        from src.download.resume import ResumeStore
+
+        with tempfile.TemporaryDirectory() as resume_dir:
+            with open(os.path.join(resume_dir, "t9.json"), "w", encoding="utf-8") as handle:
+                json.dump({"offset": 42}, handle)
+
+            store = ResumeStore(resume_dir, progress_path_func=lambda path: path + ".tmp")
+            assert store.load("t9") == {"offset": 42}
+            assert not os.path.exists(os.path.join(resume_dir, "t9.json"))
+            store.close()
+
+            # 重开后数据仍在（同一库文件）
+            reopened = ResumeStore(resume_dir, progress_path_func=lambda path: path + ".tmp")
+            assert reopened.list_task_ids() == ["t9"]
+            reopened.close()
+            assert reopened.load("t9") is None  # 已关闭：不再复活连接
 
 
 class TestRelayRange:
@@ -864,25 +1226,76 @@ class TestFileService:
             with pytest.raises(FileNotFoundError):
                 resolve_download_path(base, "missing.mp4", must_exist=True)
 
-    def test_local_stream_range_and_chunks(self):
-        from src.files import iter_file_chunks, local_stream_range
+    def test_scan_download_files_skips_symlinks(self):
+        from src.files.service import scan_download_files
 
-        assert local_stream_range(10, None) is None
-        assert local_stream_range(10, "bytes=2-", chunk_size=4) == {
-            "start": 2,
-            "end": 6,
-            "content_length": 4,
-            "content_range": "bytes 2-5/10",
-        }
+        with tempfile.TemporaryDirectory() as base, tempfile.TemporaryDirectory() as outside:
+            os.makedirs(os.path.join(base, "chat"))
+            with open(os.path.join(base, "chat", "video.mp4"), "wb") as handle:
+                handle.write(b"abc")
+            with open(os.path.join(outside, "secret.mp4"), "wb") as handle:
+                handle.write(b"x")
+            os.symlink(os.path.join(outside, "secret.mp4"), os.path.join(base, "chat", "link.mp4"))
+            os.symlink(outside, os.path.join(base, "linked-dir"))
+
+            files = scan_download_files(base, lambda size: f"{size}B")
+            assert [(item["folder"], item["filename"]) for item in files] == [("chat", "video.mp4")]
+
+    def test_resolve_file_path_rejects_sibling_prefix_dir(self):
+        from src.files import download_root, resolve_file_path
+
+        with tempfile.TemporaryDirectory() as parent:
+            base = os.path.join(parent, "downloads")
+            sibling = os.path.join(parent, "downloads_other")
+            os.makedirs(base)
+            os.makedirs(sibling)
+            with open(os.path.join(sibling, "v.mp4"), "wb") as handle:
+                handle.write(b"x")
+
+            assert download_root(base) == os.path.realpath(base)
+            with pytest.raises(ValueError):
+                resolve_file_path(base, "../downloads_other/v.mp4")
 
-        with pytest.raises(ValueError):
-            local_stream_range(10, "items=2-")
+    def test_download_file_list_cache_reuses_scan_until_dir_changes(self):
+        from src.files import DownloadFileListCache, list_download_files
 
         with tempfile.TemporaryDirectory() as base:
-            path = os.path.join(base, "file.bin")
-            with open(path, "wb") as handle:
-                handle.write(b"abcdef")
-            assert b"".join(iter_file_chunks(path, 2, 3, chunk_size=2)) == b"cde"
+            os.makedirs(os.path.join(base, "chat"))
+            with open(os.path.join(base, "chat", "a.mp4"), "wb") as handle:
+                handle.write(b"abc")
+
+            clock = [0.0]
+            cache = DownloadFileListCache(base, lambda size: f"{size}B", max_age=2.0, time_func=lambda: clock[0])
+            first = cache.files()
+            assert cache.files() is first
+
+            payload = list_download_files(base, None, page=1, per_page=10, files=first)
+            assert "modified_ts" not in payload["files"][0]
+            assert "modified_ts" in first[0]  # 分页不修改缓存条目
+
+            # 子目录内新增文件会改变子目录 mtime，缓存失效
+            chat_dir = os.path.join(base, "chat")
+            with open(os.path.join(chat_dir, "b.mp4"), "wb") as handle:
+                handle.write(b"x")
+            os.utime(chat_dir, ns=(0, os.stat(chat_dir).st_mtime_ns + 1_000_000_000))
+            second = cache.files()
+            assert second is not first
+            assert {item["filename"] for item in second} == {"a.mp4", "b.mp4"}
+
+            # 目录未变但超过 max_age，兜底重扫（覆盖文件就地追加）
+            clock[0] = 5.0
+            assert cache.files() is not second
+
+    def test_download_file_list_cache_signature_skips_symlinked_dirs(self):
+        from src.files import DownloadFileListCache
+
+        with tempfile.TemporaryDirectory() as base, tempfile.TemporaryDirectory() as outside:
+            os.makedirs(os.path.join(base, "chat"))
+            os.symlink(outside, os.path.join(base, "linked"))
+
+            cache = DownloadFileListCache(base, lambda size: f"{size}B")
+            # 扫描不进入符号链接目录，签名也不应随链接目标的变化失效
+            assert [name for name, _mtime in cache._current_signature()[1]] == ["chat"]
 
     def test_thumbnail_cache_helpers(self):
         from src.files import cleanup_thumbnail_cache, thumbnail_cache_path, write_thumbnail
@@ -1141,6 +1554,58 @@ class TestWebSessionAuth:
         assert b"password" in resp.data
 
 
+class TestVideoInfoExtraction:
+    def test_extracts_video_attributes_by_exact_type(self):
+        from datetime import datetime
+        from telethon.tl.types import (
+            DocumentAttributeAudio,
+            DocumentAttributeFilename,
+            DocumentAttributeVideo,
+            MessageMediaDocument,
+        )
+        from src.telegram.video_info import extract_video_info, format_duration
+
+        doc = Mock(id=9, size=2048, thumbs=[1])
+        doc.attributes = [
+            DocumentAttributeAudio(duration=1),
+            DocumentAttributeVideo(duration=75, w=1, h=1),
+            DocumentAttributeFilename(file_name="clip.mp4"),
+        ]
+        message = Mock(id=3, media=MessageMediaDocument(document=doc), date=datetime(2026, 1, 2, 3, 4), reply_to=None)
+        message.message = "caption"
+
+        info = extract_video_info(message)
+
+        assert info["filename"] == "clip.mp4"
+        assert info["duration"] == 75
+        assert info["duration_fmt"] == format_duration(75)
+
+        doc.attributes = [DocumentAttributeFilename(file_name="song.mp3"), DocumentAttributeAudio(duration=5)]
+        assert extract_video_info(message) is None
+
+    def test_lookup_rejects_non_documents_before_cache(self):
+        from telethon.tl.types import MessageMediaPhoto
+        from src.telegram.runtime import TelegramRuntime
+        from src.telegram.video_info import lookup_video_info
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock())
+        for media in (None, MessageMediaPhoto()):
+            message = Mock(id=99001, chat_id=-10042, media=media, edit_date=None)
+            assert lookup_video_info(message, runtime.cached_video_info) is None
+        assert len(runtime.video_info_cache) == 0
+
+    def test_format_helpers_pick_unit_by_bit_length(self):
+        from src.telegram.video_info import format_duration, format_size
+
+        assert format_size(1023) == "1023.0B"
+        assert format_size(1024) == "1.0KB"
+        assert format_size(1536.0) == "1.5KB"
+        assert format_size(1024 ** 3 * 3) == "3.0GB"
+        assert format_size(1024 ** 5) == "1024.0TB"
+        assert format_duration(3725) == "1:02:05"
+        assert format_duration(65) == "1:05"
+
+
 class TestEnforceAccessControl:
     """app_new.enforce_access_control 四路放行（本地/会话/Basic/未认证）。"""
 
@@ -1358,10 +1823,15 @@ class TestSystemStatusService:
         )
 
         status = service.status_payload()
-        assert calls["ensure"] == 1
+        # /api/status 只读：重连只由 /api/reconnect 显式触发
+        assert calls["ensure"] == 0
         assert status["connected"] is True
         assert status["queue"] == {"active": 0}
 
+        reconnect = service.reconnect_payload()
+        assert calls["ensure"] == 1
+        assert reconnect == {"ok": False, "connected": True, "error": "", "user": "user"}
+
         health = service.health_payload()
         assert health["ok"] is True
         assert health["proxy"] == {"enabled": False, "ok": True, "label": "未启用"}
@@ -1542,6 +2012,18 @@ class TestDownloadWatchdog:
         assert watchdog.last_progress["t1"]["bytes"] == 10
         assert "t2" not in watchdog.last_progress
 
+    def test_task_waiting_on_resource_lock_is_not_tracked(self):
+        from src.download.watchdog import DownloadWatchdog
+
+        tasks = {"t1": {"status": "downloading", "downloaded_bytes": 0, "waiting_resource": True}}
+        watchdog = DownloadWatchdog(get_tasks_callback=lambda: tasks)
+        watchdog.last_progress["t1"] = {"bytes": 0, "time": 1}
+
+        watchdog._check_all_tasks()
+
+        # 排队等锁期间不计时；拿到锁后从头起算停滞超时
+        assert "t1" not in watchdog.last_progress
+
     def test_stop_is_responsive(self):
         from src.download.watchdog import DownloadWatchdog
 
@@ -1639,15 +2121,49 @@ class TestDownloadStatusPayload:
         assert set(payload["tasks"]) == {"active", "recent"}
         assert payload["queue"] == {"queued": 1}
 
-        payload["tasks"]["active"]["progress"] = 99
-        assert states["active"]["progress"] == 5
+        # 状态 dict 写时复制：快照只复制外层，任务 dict 与源共享，但外层增删互不影响
+        assert payload["tasks"]["active"] is states["active"]
+        payload["tasks"].pop("active")
+        assert "active" in states
 
+    def test_status_change_notifier_wait_returns_new_version_or_none(self):
+        import threading
+        from src.download import StatusChangeNotifier
 
-class TestDownloadTaskActions:
-    def test_clear_tasks_by_scope(self):
-        from src.download import clear_tasks_by_scope
+        notifier = StatusChangeNotifier()
+        start = notifier.version
 
-        class Lock:
+        assert notifier.wait(start, timeout=0.01) is None
+
+        timer = threading.Timer(0.01, notifier.notify)
+        timer.start()
+        assert notifier.wait(start, timeout=2) == start + 1
+        timer.join()
+        # 已落后的版本号立即返回，不会漏掉等待前发生的变更
+        assert notifier.wait(start, timeout=0) == start + 1
+
+
+    def test_notifier_compacts_old_task_versions(self):
+        from src.download import StatusChangeNotifier
+
+        notifier = StatusChangeNotifier(max_tracked=3)
+        for task_id in ("a", "b", "c", "d"):
+            notifier.notify(task_id)
+        notifier.notify("b")
+
+        # 只保留最近 3 个任务；只返回 since 之后的变更，按新到旧
+        assert len(notifier._task_versions) == 3
+        assert notifier.changed_since(3) == ["b", "d"]
+        assert notifier.changed_since(5) == []
+        # "a" 已被压缩掉：落后于它的消费者得到 None，改发全量帧
+        assert notifier.changed_since(0) is None
+
+
+class TestDownloadTaskActions:
+    def test_clear_tasks_by_scope(self):
+        from src.download import clear_tasks_by_scope
+
+        class Lock:
             def __enter__(self):
                 return self
 
@@ -1747,6 +2263,15 @@ class TestHealthChecker:
         assert stats["running"] is False
         assert stats["status"] == "healthy"
 
+    def test_check_thread_runs_initializer_first(self):
+        from src.telegram.health_checker import TelegramHealthChecker
+
+        calls = []
+        checker = TelegramHealthChecker(client=Mock(), loop=Mock(), thread_initializer=lambda: calls.append("init"))
+        checker._running = False
+        checker._check_loop()
+        assert calls == ["init"]
+
     def test_async_check_uses_light_dialog_ping(self):
         from src.telegram.health_checker import TelegramHealthChecker
 
@@ -1839,6 +2364,33 @@ class TestGracefulShutdown:
 
 
 class TestTelegramStartup:
+    def test_deprioritize_current_thread_uses_sched_batch_when_available(self):
+        from unittest.mock import patch
+        from src.telegram import startup
+
+        calls = []
+        with patch.object(startup.os, "sched_setscheduler", lambda *args: calls.append(args), create=True), \
+                patch.object(startup.os, "SCHED_BATCH", 3, create=True):
+            assert startup.deprioritize_current_thread() is True
+        assert calls and calls[0][:2] == (0, 3)
+
+        def denied(*_args):
+            raise PermissionError("EPERM")
+
+        with patch.object(startup.os, "sched_setscheduler", denied, create=True), \
+                patch.object(startup.os, "SCHED_BATCH", 3, create=True):
+            assert startup.deprioritize_current_thread() is False
+
+    def test_restore_default_priority_uses_sched_other(self):
+        from unittest.mock import patch
+        from src.telegram import startup
+
+        calls = []
+        with patch.object(startup.os, "sched_setscheduler", lambda *args: calls.append(args), create=True), \
+                patch.object(startup.os, "SCHED_OTHER", 0, create=True):
+            assert startup.restore_default_priority() is True
+        assert calls and calls[0][:2] == (0, 0)
+
     def test_run_main_telegram_client_success(self):
         from src.telegram import run_main_telegram_client
 
@@ -1957,7 +2509,7 @@ class TestTelegramStartup:
         assert errors and "网页向导" in errors[0]
 
     def test_run_main_telegram_client_retries_on_connect_error(self):
-        from src.telegram import run_main_telegram_client
+        from src.telegram import ConnectBackoff, run_main_telegram_client
 
         class Runtime:
             def __init__(self):
@@ -1994,12 +2546,13 @@ class TestTelegramStartup:
                     log_info=lambda _message: None,
                     print_func=lambda _message: None,
                     sleep_func=lambda _seconds: (_ for _ in ()).throw(SystemExit),
+                    backoff=ConnectBackoff(random_func=lambda: 0.5),
                 )
         finally:
             loop.close()
 
-        assert runtime.connect_error == "连接失败: boom，5秒后重试..."
-        assert errors[-1] == "连接失败: boom，5秒后重试..."
+        assert runtime.connect_error == "连接失败: boom，1.0秒后重试..."
+        assert errors[-1] == "连接失败: boom，1.0秒后重试..."
 
     def test_run_relay_telegram_client_success(self):
         from src.telegram import run_relay_telegram_client
@@ -2111,7 +2664,7 @@ class TestTelegramStartup:
         assert errors == ["Relay Telegram 未登录"]
 
     def test_run_relay_telegram_client_retries_on_main_not_ready(self):
-        from src.telegram import run_relay_telegram_client
+        from src.telegram import ConnectBackoff, run_relay_telegram_client
 
         class Runtime:
             def __init__(self):
@@ -2143,12 +2696,30 @@ class TestTelegramStartup:
                     log_warning=lambda _message: None,
                     log_error=lambda _message: None,
                     sleep_func=lambda _seconds: (_ for _ in ()).throw(SystemExit),
+                    backoff=ConnectBackoff(random_func=lambda: 0.5),
                 )
         finally:
             loop.close()
 
-        assert runtime.connect_error == "Relay 连接失败: main down，5秒后重试..."
-        assert errors[-1] == "Relay 连接失败: main down，5秒后重试..."
+        assert runtime.connect_error == "Relay 连接失败: main down，1.0秒后重试..."
+        assert errors[-1] == "Relay 连接失败: main down，1.0秒后重试..."
+
+    def test_connect_backoff_jitters_and_pauses_after_threshold(self):
+        from src.telegram import ConnectBackoff
+
+        backoff = ConnectBackoff(failure_threshold=5, pause_seconds=30, random_func=lambda: 0.0)
+        assert [backoff.record_failure() for _ in range(4)] == [0.5, 1.0, 2.0, 4.0]
+        assert backoff.paused is False
+
+        assert backoff.record_failure() == 30
+        assert backoff.paused is True
+        assert backoff.describe(30) == "连续失败 5 次，暂停 30秒后重试"
+        assert backoff.record_failure() == 30  # 仍失败：继续长暂停
+        backoff.record_success()
+        assert (backoff.paused, backoff.failures) == (False, 0)
+
+        capped = ConnectBackoff(cap=60, failure_threshold=100, random_func=lambda: 0.99)
+        assert max(capped.record_failure() for _ in range(20)) == 60
 
 
 # ==================== 辅助函数 ====================
@@ -2178,6 +2749,29 @@ class TestHelpers:
         url = build_tdl_message_url(-1001234567890, 42)
         assert url == "https://t.me/c/1234567890/42"
 
+    def test_get_video_info_matches_exact_attribute_types(self):
+        from telethon.tl.types import (
+            DocumentAttributeAudio,
+            DocumentAttributeFilename,
+            DocumentAttributeVideo,
+            MessageMediaDocument,
+        )
+        from src.helpers import get_video_info
+
+        doc = Mock(size=2048, thumbs=[1], mime_type="video/mp4")
+        doc.attributes = [
+            DocumentAttributeAudio(duration=1),
+            DocumentAttributeVideo(duration=75, w=1280, h=720),
+            DocumentAttributeFilename(file_name="clip.mp4"),
+        ]
+        message = Mock(id=3, media=MessageMediaDocument(document=doc))
+
+        info = get_video_info(message)
+        assert (info["filename"], info["duration"], info["width"], info["height"]) == ("clip.mp4", 75, 1280, 720)
+
+        doc.attributes = [DocumentAttributeFilename(file_name="song.mp3"), DocumentAttributeAudio(duration=5)]
+        assert get_video_info(message) is None
+
 
 class TestTelegramRuntime:
     def test_message_cache_and_ids(self):
@@ -2211,6 +2805,167 @@ class TestTelegramRuntime:
         # entity 缺省时跨频道兜底仍生效
         assert runtime.get_cached_message(100) is msg_a
 
+    def test_message_cache_evicts_least_recently_used(self):
+        from src.telegram.runtime import TelegramRuntime
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock(), max_message_cache_size=2)
+        msg_a, msg_b, msg_c = Mock(id=1), Mock(id=2), Mock(id=3)
+        runtime.cache_message(msg_a, -100123)
+        runtime.cache_message(msg_b, -100123)
+
+        # 命中刷新最近使用位置，淘汰最久未用的 msg_b
+        assert runtime.get_cached_message(1, -100123) is msg_a
+        runtime.cache_message(msg_c, -100123)
+
+        assert runtime.get_cached_message(2, -100123) is None
+        assert runtime.get_cached_message(1, -100123) is msg_a
+        assert runtime.get_cached_message(3, -100123) is msg_c
+        assert len(runtime.messages_cache) == 2
+
+    def test_cross_entity_fallback_uses_msg_id_index(self):
+        from src.telegram.runtime import TelegramRuntime
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock(), max_message_cache_size=2)
+        msg_a, msg_b, msg_c = Mock(id=7), Mock(id=7), Mock(id=8)
+        runtime.cache_message(msg_a, -100111)
+        runtime.cache_message(msg_b, -100222)
+
+        assert runtime.get_cached_message(7) is msg_a
+        assert runtime.get_cached_message(7, -100333) is None
+
+        # 淘汰后索引同步清理，兜底落到仍在缓存中的频道
+        runtime.cache_message(msg_c, -100111)
+        assert runtime.get_cached_message(7) is msg_b
+        assert runtime.get_cached_message(9) is None
+        assert set(runtime._message_entities_by_id) == {7, 8}
+
+    def test_refresh_dialogs_cache_keeps_slim_projection(self):
+        from src.telegram.runtime import TelegramRuntime
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock())
+        entity = Mock(is_self=False)
+        dialog = Mock(entity=entity, is_channel=True, is_group=False, id=-100123)
+        dialog.name = "chat"
+        runtime.run_async = lambda factory, timeout=None: [dialog]
+
+        runtime.refresh_dialogs_cache()
+
+        assert runtime.dialogs_cache == [(entity, "chat")]
+        assert runtime.dialogs_cache[0].entity is entity
+        assert runtime.dialogs_serialized_cache[0]["name"] == "chat"
+        assert runtime.resolve_requested_entity(dialog_index=0) == (entity, "chat")
+
+    def test_cached_video_info_memoizes_and_invalidates(self):
+        from src.telegram.runtime import TelegramRuntime
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock(), max_message_cache_size=2)
+        calls = []
+
+        def extract(message):
+            calls.append(message.id)
+            return {"id": message.id, "filename": f"video_{len(calls)}.mp4"}
+
+        message = Mock(id=42, chat_id=-100123, edit_date=None)
+        first = runtime.cached_video_info(message, extract)
+        first["size_fmt"] = "1MB"  # 调用方就地修改不得污染缓存
+        second = runtime.cached_video_info(message, extract)
+
+        assert calls == [42]
+        assert second == {"id": 42, "filename": "video_1.mp4"}
+
+        # 被编辑的消息重新解析
+        message.edit_date = "edited"
+        assert runtime.cached_video_info(message, extract)["filename"] == "video_2.mp4"
+
+        # 同一条消息的新对象（重新扫描/提交时再取）不失效，内容变化只看 edit_date
+        runtime.cache_message(message, -100123)
+        runtime.cache_message(Mock(id=42, chat_id=-100123, edit_date="edited"), -100123)
+        assert (-100123, 42) in runtime.video_info_cache
+
+        # messages_cache 淘汰时同步淘汰
+        runtime.cached_video_info(message, extract)
+        for msg_id in (1, 2, 3):
+            runtime.cache_message(Mock(id=msg_id), -100123)
+        assert (-100123, 42) not in runtime.video_info_cache
+
+    def test_scan_then_submit_reuses_video_info(self, monkeypatch):
+        from datetime import datetime
+        from telethon.tl.types import DocumentAttributeVideo, MessageMediaDocument
+        from src.telegram import video_info
+        from src.telegram.runtime import TelegramRuntime
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock())
+        calls = []
+        real_extract = video_info.extract_video_info
+
+        def counting_extract(message):
+            calls.append(message.id)
+            return real_extract(message)
+
+        monkeypatch.setattr(video_info, "extract_video_info", counting_extract)
+
+        def fresh_message():
+            # 无文件名属性：走 video_<id>_<时间戳>.mp4 兜底名
+            doc = Mock(id=9, size=2048, thumbs=[], dc_id=4)
+            doc.attributes = [DocumentAttributeVideo(duration=5, w=1, h=1)]
+            message = Mock(id=42, chat_id=-100123, edit_date=None, reply_to=None,
+                           media=MessageMediaDocument(document=doc), date=datetime(2026, 1, 2))
+            message.message = message.text = ""
+            return message
+
+        def video_info_for_message(message):
+            # 与 app.video_info_for_message 相同的顺序：先解析，再登记消息
+            info = video_info.lookup_video_info(message, runtime.cached_video_info)
+            runtime.cache_message(message, message.chat_id)
+            return info
+
+        scanned = video_info_for_message(fresh_message())
+        with monkeypatch.context() as patched:
+            fake_datetime = Mock()
+            patched.setattr(video_info, "datetime", fake_datetime)
+            fake_datetime.now.return_value = datetime(2030, 1, 1)
+            submitted = video_info_for_message(fresh_message())
+
+        assert calls == [42]
+        assert submitted["filename"] == scanned["filename"]
+
+    def test_deferred_eviction_trims_once_after_batch(self):
+        from src.telegram.runtime import TelegramRuntime
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock(), max_message_cache_size=2)
+        with runtime.deferred_eviction():
+            for msg_id in range(1, 6):
+                runtime.cache_message(Mock(id=msg_id), -100)
+            assert len(runtime.messages_cache) == 5  # 批量期间不裁剪
+        assert list(runtime.messages_cache) == [(-100, 4), (-100, 5)]
+
+        runtime.cache_message(Mock(id=6), -100)
+        assert list(runtime.messages_cache) == [(-100, 5), (-100, 6)]
+
+    def test_get_entity_uses_lru_cache_and_dialog_prewarm(self):
+        from src.telegram.runtime import TelegramRuntime
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock(), max_entity_cache_size=2)
+        fetched = []
+
+        def run_async(factory, timeout=600):
+            fetched.append(factory)
+            return Mock(id=len(fetched))
+
+        runtime.run_async = run_async
+
+        first = runtime.get_entity("somechannel")
+        assert runtime.get_entity("somechannel") is first
+        assert len(fetched) == 1
+
+        # 对话列表刷新时按对话 ID 预热，最近活跃的对话最后写入、最后被淘汰
+        dialogs = [Mock(id=-1001, entity="recent", name="r"), Mock(id=-1002, entity="old", name="o")]
+        runtime.run_async = lambda factory, timeout=600: dialogs
+        runtime.refresh_dialogs_cache()
+        assert list(runtime.entity_cache) == [-1002, -1001]
+        assert runtime.get_entity(-1001) == "recent"
+        assert runtime.resolve_requested_entity(entity_id=-1002)[0] == "old"
+
     def test_ensure_connection_reconnects_in_background(self):
         from src.telegram.runtime import TelegramRuntime
 
@@ -2219,6 +2974,7 @@ class TestTelegramRuntime:
         loop = Mock()
         loop.is_running.return_value = True
         runtime = TelegramRuntime(client=client, loop=loop)
+        runtime.ready.set()  # 已完成首次连接，之后的断开走后台重连
         runtime.reconnect_grace_seconds = 0  # 关闭宽限等待，保持测试快速
 
         started = []
@@ -2250,6 +3006,7 @@ class TestTelegramRuntime:
         loop = Mock()
         loop.is_running.return_value = True
         runtime = TelegramRuntime(client=client, loop=loop)
+        runtime.ready.set()  # 已完成首次连接，之后的断开走后台重连
         runtime.reconnect_grace_seconds = 0
 
         def _boom_factory(*_args, **_kwargs):
@@ -2269,6 +3026,7 @@ class TestTelegramRuntime:
         loop = Mock()
         loop.is_running.return_value = True
         runtime = TelegramRuntime(client=client, loop=loop)
+        runtime.ready.set()
         runtime.reconnect_grace_seconds = 1.0
         runtime._reconnect_thread_factory = lambda *a, **k: type(
             "T", (), {"start": lambda self: None}
@@ -2277,6 +3035,30 @@ class TestTelegramRuntime:
         assert runtime.ensure_connection() is True
         assert runtime.connected is True
 
+    def test_ensure_connection_fails_fast_before_first_connect(self):
+        from src.telegram.runtime import TelegramRuntime
+
+        client = Mock()
+        client.is_connected.return_value = False
+        loop = Mock()
+        loop.is_running.return_value = True
+        runtime = TelegramRuntime(client=client, loop=loop)
+        runtime._reconnect_thread_factory = Mock()
+        runtime.mark_error("正在连接 Telegram...")
+
+        # 启动线程仍在首次连接：快速失败，不并发排布重连
+        assert runtime.ensure_connection() is False
+        assert runtime.connect_error == "正在连接 Telegram..."
+        runtime._reconnect_thread_factory.assert_not_called()
+        assert runtime.wait_startup(timeout=0) is False
+
+        runtime.mark_needs_login()
+        assert runtime.wait_startup(timeout=0) is True
+        assert not runtime.ready.is_set()
+
+        runtime.mark_connected("me")
+        assert runtime.ready.is_set()
+
     def test_reconnect_cooldown_exponential_backoff(self):
         from src.telegram.runtime import TelegramRuntime
 
@@ -2290,6 +3072,41 @@ class TestTelegramRuntime:
         runtime.reconnect_failures = 10  # 触顶封顶
         assert runtime._reconnect_cooldown() == 120
 
+    def test_failed_reconnect_waits_a_jittered_share_of_the_window(self):
+        import time
+        from unittest.mock import patch
+        from src.telegram import runtime as runtime_module
+        from src.telegram.runtime import TelegramRuntime
+
+        client = Mock()
+        client.is_connected.return_value = False
+        loop = Mock()
+        loop.is_running.return_value = True
+        runtime = TelegramRuntime(client=client, loop=loop)
+        runtime.ready.set()
+        runtime.reconnect_grace_seconds = 0
+        runtime._reconnect_jitter = lambda: 0.25
+        runtime._reconnect_thread_factory = Mock()
+
+        def refuse(coro, _loop):
+            coro.close()
+            raise ConnectionError("proxy down")
+
+        assert runtime.ensure_connection() is False
+        assert runtime._reconnect_thread_factory.call_count == 1
+        with patch.object(runtime_module.asyncio, "run_coroutine_threadsafe", refuse):
+            runtime._run_reconnect()
+
+        # 第 1 次失败：窗口 16s，full jitter 取其 25% → 4s 内不再发起重连
+        assert runtime.reconnect_failures == 1
+        assert 3.5 < runtime.next_reconnect_at - time.time() <= 4.0
+        assert runtime.ensure_connection() is False
+        assert runtime._reconnect_thread_factory.call_count == 1
+
+        runtime.next_reconnect_at = 0.0
+        assert runtime.ensure_connection() is False
+        assert runtime._reconnect_thread_factory.call_count == 2
+
     def test_dialog_serialization_prioritizes_saved_messages(self):
         from src.telegram.runtime import TelegramRuntime
 
@@ -2315,7 +3132,45 @@ class TestTelegramRuntime:
         assert serialized[1]["type"] == "频道"
 
 
+    def test_dialog_serialization_only_checks_user_dialogs(self):
+        from src.telegram.runtime import TelegramRuntime
+
+        runtime = TelegramRuntime(client=Mock(), loop=Mock())
+
+        def dialog(dialog_id, *, is_user, entity):
+            item = Mock(id=dialog_id, is_user=is_user, is_channel=not is_user, is_group=False, entity=entity)
+            item.name = f"d{dialog_id}"
+            return item
+
+        # 频道实体上的任意属性都不应被当成收藏夹；只置顶真正的 is_self 私聊，其余保持原序
+        dialogs = [
+            dialog(1, is_user=False, entity=Mock()),
+            dialog(2, is_user=True, entity=Mock(is_self=False)),
+            dialog(3, is_user=True, entity=Mock(is_self=True)),
+            dialog(4, is_user=False, entity=Mock()),
+        ]
+        serialized = runtime.serialize_dialogs(dialogs)
+        assert [item["id"] for item in serialized] == [3, 1, 2, 4]
+        assert [item["is_saved"] for item in serialized] == [True, False, False, False]
+        assert [item["index"] for item in serialized] == [2, 0, 1, 3]
+        assert serialized[1]["name"] == "d1"
+
+
 class TestTelegramVideoService:
+    def test_store_drops_expired_entries(self):
+        import time
+        from collections import OrderedDict
+        from src.telegram import TelegramVideoService
+
+        cache = OrderedDict(
+            old={"videos": [1], "time": time.time() - 600},
+            recent={"videos": [2], "time": time.time() - 10},
+        )
+        TelegramVideoService._store(cache, "new", {"videos": [3], "time": time.time()}, 10, 300)
+
+        # 超过 TTL 的扫描结果在下一次写入时释放，未过期的保留
+        assert list(cache) == ["recent", "new"]
+
     def test_list_videos_scans_and_caches(self):
         import threading
         from src.telegram import TelegramVideoService
@@ -2362,6 +3217,54 @@ class TestTelegramVideoService:
         assert cached_payload["cached"] is True
         assert calls["iter"] == 1
 
+    def test_list_videos_fetches_id_windows_concurrently(self):
+        import threading
+        from src.telegram import TelegramVideoService
+
+        entity = Mock(id=123)
+        # 1..400 中删掉 300..309：并发窗口条数不足时要往下补齐
+        history = [Mock(id=i, replies=None) for i in range(400, 0, -1) if not 300 <= i < 310]
+        calls = []
+
+        class Client:
+            async def get_messages(self, _entity, limit=None):
+                return history[:limit]
+
+            def iter_messages(self, _entity, limit=None, offset_id=0, min_id=0):
+                calls.append((min_id, offset_id, limit))
+
+                async def gen():
+                    picked = [m for m in history if m.id > min_id and (not offset_id or m.id < offset_id)]
+                    for m in picked[:limit]:
+                        await asyncio.sleep(0)
+                        yield m
+
+                return gen()
+
+        service = TelegramVideoService(
+            client=Client(),
+            run_async=lambda factory: asyncio.run(factory()),
+            resolve_requested_entity=lambda *_args: (entity, "chat"),
+            video_info_for_message=lambda msg, eid, source="主消息", extra=None: {"id": msg.id},
+            message_text=lambda msg: "",
+            make_excerpt=lambda text, limit: text,
+            cache_lock=threading.RLock(),
+            current_entity_cache={},
+            videos_cache={},
+            replies_cache={},
+            scan_window_concurrency=3,
+        )
+
+        streamed = []
+        payload, status = service.list_videos(entity_id=123, limit=250, on_video=lambda info: streamed.append(info["id"]))
+
+        assert status == 200
+        assert [video["id"] for video in payload["videos"]] == [m.id for m in history[:250]]
+        # 并发窗口交错到达，但流式推送仍按 ID 倒序
+        assert streamed == [m.id for m in history[:250]]
+        assert calls[:3] == [(316, 401, 84), (232, 317, 84), (150, 233, 82)]
+        assert calls[3] == (0, 151, 10)
+
     def test_list_videos_ttl_expiry_triggers_rescan(self):
         import threading
         import time as _time
@@ -2409,6 +3312,40 @@ class TestTelegramVideoService:
         assert payload.get("cached") is False
         assert calls["iter"] == 2
 
+    def test_list_videos_cache_evicts_least_recently_used(self):
+        import threading
+        from collections import OrderedDict
+        from src.telegram import TelegramVideoService
+
+        class Client:
+            def iter_messages(self, _entity, **_kwargs):
+                async def gen():
+                    yield Mock(id=1, message="", replies=None)
+
+                return gen()
+
+        videos_cache = OrderedDict()
+        service = TelegramVideoService(
+            client=Client(),
+            run_async=lambda factory: asyncio.run(factory()),
+            resolve_requested_entity=lambda *_args: (Mock(id=1), "chat"),
+            video_info_for_message=lambda msg, eid, source="主消息", extra=None: {"id": msg.id},
+            message_text=lambda msg: msg.message,
+            make_excerpt=lambda text, limit: text[:limit],
+            cache_lock=threading.RLock(),
+            current_entity_cache={},
+            videos_cache=videos_cache,
+            replies_cache=OrderedDict(),
+            max_video_cache_size=2,
+        )
+
+        service.list_videos(entity_id=1)
+        service.list_videos(entity_id=2)
+        assert service.list_videos(entity_id=1)[0]["cached"] is True  # 命中后变为最近使用
+        service.list_videos(entity_id=3)
+
+        assert [key.split(":")[0] for key in videos_cache] == ["1", "3"]
+
     def test_list_replies_scans_parent_context(self):
         import threading
         from src.telegram import TelegramVideoService
@@ -2459,7 +3396,6 @@ class TestTelegramVideoService:
             "entity_id": 123,
             "source": "评论@帖子9",
             "parent_post_id": 9,
-            "parent_text": "parent text",
             "parent_text_excerpt": "parent text",
         }]
 
@@ -2525,6 +3461,7 @@ class TestTelegramVideoService:
 
         assert status == 200
         assert [item["id"] for item in payload["videos"]] == [3, 2, 1]
+        assert all("text" not in item and "parent_text" not in item for item in payload["videos"])
         assert payload["telegram_hits"] == 1
         assert payload["scanned"] == 1
         assert payload["comments_scanned"] == 1
@@ -2533,6 +3470,84 @@ class TestTelegramVideoService:
         assert {"limit": 20} in calls
         assert {"reply_to": 2, "limit": 10} in calls
 
+    def test_search_videos_scans_comment_posts_concurrently_with_bound(self):
+        import threading
+        from src.telegram import TelegramVideoService
+
+        entity = Mock(id=123)
+        posts = [Mock(id=i, message="post", replies=Mock(replies=1)) for i in range(1, 7)]
+        running = {"now": 0, "peak": 0}
+
+        class Client:
+            def iter_messages(self, _entity, **kwargs):
+                async def gen():
+                    if "search" in kwargs:
+                        return
+                    if "reply_to" in kwargs:
+                        running["now"] += 1
+                        running["peak"] = max(running["peak"], running["now"])
+                        await asyncio.sleep(0.01)
+                        running["now"] -= 1
+                        yield Mock(id=100 + kwargs["reply_to"], message="needle", replies=None)
+                        return
+                    for post in posts:
+                        yield post
+
+                return gen()
+
+        service = TelegramVideoService(
+            client=Client(),
+            run_async=lambda factory: asyncio.run(factory()),
+            resolve_requested_entity=lambda *_args: (entity, "chat"),
+            video_info_for_message=lambda msg, eid, source="主消息", extra=None: {
+                "id": msg.id,
+                "entity_id": eid,
+                "filename": f"v{msg.id}.mp4",
+                "date": "2026-01-01",
+                **(extra or {}),
+            },
+            message_text=lambda msg: msg.message,
+            make_excerpt=lambda text, limit: text[:limit],
+            cache_lock=threading.RLock(),
+            current_entity_cache={},
+            videos_cache={},
+            replies_cache={},
+            comment_scan_concurrency=3,
+        )
+
+        payload, status = service.search_videos(query="needle", entity_id=123, scan_limit=20)
+
+        assert status == 200
+        assert payload["comments_scanned"] == 6
+        assert {item["id"] for item in payload["videos"]} == {101, 102, 103, 104, 105, 106}
+        assert running["peak"] == 3
+
+
+class TestTelegramRateLimit:
+    def test_token_bucket_spends_burst_then_spaces_requests(self):
+        from src.telegram.rate_limit import AsyncTokenBucket
+
+        now = [0.0]
+        bucket = AsyncTokenBucket(rate=2, burst=2, clock=lambda: now[0])
+
+        assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+        assert bucket.reserve() == 0.5
+        assert bucket.reserve() == 1.0
+        now[0] = 10.0
+        assert bucket.reserve() == 0.0
+
+    def test_limiter_keeps_one_bucket_per_entity(self):
+        import asyncio
+        from src.telegram.rate_limit import EntityRateLimiter
+
+        limiter = EntityRateLimiter(rate=1000, burst=1, max_entities=2)
+        assert limiter.bucket(-1001) is limiter.bucket(-1001)
+        assert limiter.bucket(-1002) is not limiter.bucket(-1001)
+        limiter.bucket(-1003)
+        assert set(limiter._buckets) == {-1001, -1003}
+
+        asyncio.run(limiter.acquire(-1001))
+
 
 class TestTelegramDebugService:
     def test_inspect_messages_reads_dialog_and_media_attrs(self):
@@ -2606,6 +3621,127 @@ class TestTelegramDebugService:
 
 
 # ==================== 路由 Blueprint ====================
+class TestJsonProvider:
+    def test_compact_provider_reuses_encoder_and_keeps_utf8_order(self):
+        from datetime import date
+        from flask import Flask, jsonify
+        from src.system import CompactJSONProvider
+
+        app = Flask(__name__)
+        app.json = CompactJSONProvider(app)
+
+        with app.app_context():
+            response = jsonify({"z": "视频", "a": date(2026, 1, 2)})
+            pretty = app.json.dumps({"b": 1, "a": 2}, indent=2)
+
+        assert response.get_data(as_text=True) == '{"z":"视频","a":"Fri, 02 Jan 2026 00:00:00 GMT"}\n'
+        assert pretty == '{\n  "b": 1,\n  "a": 2\n}'
+
+
+class TestHttpServer:
+    def test_server_keeps_connection_alive_across_requests(self):
+        import http.client
+        import threading
+        from flask import Flask, Response
+        from src.system import build_server
+
+        app = Flask(__name__)
+
+        @app.route("/ping")
+        def ping():
+            return "pong"
+
+        @app.route("/stream")
+        def stream():
+            return Response(iter(["a", "b"]), mimetype="text/event-stream")
+
+        server = build_server(app, "127.0.0.1", 0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+            conn.request("GET", "/ping")
+            first = conn.getresponse()
+            assert first.read() == b"pong"
+            assert first.version == 11
+            sock = conn.sock
+
+            conn.request("GET", "/stream")
+            second = conn.getresponse()
+            assert second.read() == b"ab"
+            assert conn.sock is sock  # 同一连接复用
+
+            conn.request("GET", "/ping")
+            assert conn.getresponse().read() == b"pong"
+            conn.close()
+        finally:
+            server.shutdown()
+
+    def test_server_streams_files_in_large_blocks(self):
+        import http.client
+        import threading
+        from flask import Flask, send_file
+        from src.system import build_server
+        from src.system.server import FILE_WRAPPER_BLOCK_SIZE
+
+        app = Flask(__name__)
+        blocks = []
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "blob.bin")
+            with open(path, "wb") as handle:
+                handle.write(b"x" * 100_000)
+
+            @app.route("/blob")
+            def blob():
+                response = send_file(path)
+                blocks.append(response.response.buffer_size)
+                return response
+
+            server = build_server(app, "127.0.0.1", 0)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+                conn.request("GET", "/blob")
+                assert len(conn.getresponse().read()) == 100_000
+                conn.close()
+            finally:
+                server.shutdown()
+
+        assert blocks == [FILE_WRAPPER_BLOCK_SIZE]
+
+    def test_server_only_logs_failed_requests(self):
+        import http.client
+        import threading
+        from unittest.mock import patch
+        from flask import Flask
+        from src.system import build_server
+
+        app = Flask(__name__)
+
+        @app.route("/ping")
+        def ping():
+            return "pong"
+
+        server = build_server(app, "127.0.0.1", 0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with patch("werkzeug.serving._log") as log:
+                conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+                conn.request("GET", "/ping")
+                assert conn.getresponse().read() == b"pong"
+                conn.request("GET", "/missing")
+                assert conn.getresponse().status == 404
+                conn.close()
+            assert log.call_count == 1
+            assert "404" in str(log.call_args)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
 class TestRoutes:
     def test_blueprints_registered(self):
         from src.routes import (
@@ -2671,6 +3807,378 @@ class TestRoutes:
         assert response.status_code == 200
         assert response.get_json() == {"ok": True, "submitted": ["t1"], "errors": {}}
 
+    def test_misc_files_reads_task_table_once_per_request(self):
+        from flask import Flask
+        from src.routes import misc
+
+        reads = []
+        tasks = {
+            "1:1": {"filename": "a.mp4", "dialog_name": "chat", "status": "downloading", "total_bytes": 10},
+            "1:2": {"filename": "b.mp4", "dialog_name": "other", "status": "done"},
+        }
+
+        def get_tasks():
+            reads.append(1)
+            return dict(tasks)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "chat"))
+            for name in ("a.mp4", "b.mp4", "c.mp4"):
+                with open(os.path.join(tmp, "chat", name), "wb") as handle:
+                    handle.write(b"12345")
+
+            app = Flask(__name__)
+            misc.init_blueprint({
+                "download_dir": tmp,
+                "format_size_func": lambda size: str(size),
+                "query_task_history_func": lambda *_args: {},
+                "get_download_status_func": get_tasks,
+                "clear_all_tasks_func": lambda _scope: 0,
+                "get_recovery_candidates_func": lambda: [],
+                "recover_candidates_func": lambda task_ids: {},
+                "abort_debug_func": lambda: None,
+                "resolve_download_path_func": lambda *_args, **_kwargs: tmp,
+            })
+            app.register_blueprint(misc.bp)
+
+            client = app.test_client()
+            first = client.get("/api/files")
+            files = {item["filename"]: item for item in first.get_json()["files"]}
+            assert len(reads) == 1
+            # 内容未变：带 If-None-Match 重新请求得到 304
+            again = client.get("/api/files", headers={"If-None-Match": first.headers["ETag"]})
+            assert again.status_code == 304
+            assert again.data == b""
+
+        assert files["a.mp4"]["play_block_reason"] == "文件仍在下载中，完成后才能播放"
+        assert "task_status" not in files["b.mp4"]  # 对话不匹配
+        assert files["c.mp4"]["playable"] is True
+
+    def test_misc_stream_serves_ranges_via_send_file(self):
+        from flask import Flask
+        from src.routes import misc
+
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "chat"))
+            with open(os.path.join(tmp, "chat", "clip.mp4"), "wb") as handle:
+                handle.write(bytes(range(256)) * 64)
+
+            app = Flask(__name__)
+            misc.init_blueprint({
+                "download_dir": tmp,
+                "format_size_func": lambda size: str(size),
+                "query_task_history_func": lambda *_args: {},
+                "get_download_status_func": lambda: {},
+                "clear_all_tasks_func": lambda _scope: 0,
+                "get_recovery_candidates_func": lambda: [],
+                "recover_candidates_func": lambda task_ids: {},
+                "abort_debug_func": lambda: None,
+                "resolve_download_path_func": lambda *_args, **_kwargs: tmp,
+            })
+            app.register_blueprint(misc.bp)
+            client = app.test_client()
+
+            ranged = client.get("/api/stream/chat/clip.mp4", headers={"Range": "bytes=256-511"})
+            assert ranged.status_code == 206
+            assert ranged.headers["Content-Range"] == "bytes 256-511/16384"
+            assert ranged.headers["Accept-Ranges"] == "bytes"
+            assert ranged.cache_control.max_age == misc.STREAM_MAX_AGE
+            assert ranged.cache_control.private and not ranged.cache_control.public
+            assert ranged.data == bytes(range(256))
+            etag = ranged.headers["ETag"]
+            ranged.close()
+
+            tail = client.get("/api/stream/chat/clip.mp4", headers={"Range": "bytes=16000-"})
+            assert tail.status_code == 206
+            assert len(tail.data) == 384
+            tail.close()
+
+            cached = client.get("/api/stream/chat/clip.mp4", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert client.get("/api/stream/chat/clip.mp4", headers={"Range": "bytes=99999-"}).status_code == 416
+
+    def _make_download_client(self, states, wait_func, changes_func=None):
+        import threading
+        from flask import Flask
+        from src.routes import download
+
+        deps = {
+            key: None
+            for key in (
+                "current_entity_cache", "make_task_id_func", "copy_task_state_func",
+                "set_task_state_func", "update_task_state_func", "get_cached_message_func",
+                "resolve_message_func", "mark_cancelled_func", "clear_cancelled_func",
+                "supports_tdl_func", "enqueue_download_func", "remove_from_queue_func",
+                "get_tdl_process_func", "get_download_status_func", "format_size_func",
+                "get_video_info_func", "last_download_dialog_ref",
+            )
+        }
+        deps.update({
+            "terminal_states": {"done", "skipped", "error", "cancelled"},
+            "get_queue_status_func": lambda: {"active": 0},
+            "status_lock": threading.RLock(),
+            "download_status_ref": states,
+            "wait_status_change_func": wait_func,
+            "status_version_func": lambda: 0,
+            "status_changes_func": changes_func,
+        })
+        download.init_blueprint(deps)
+        app = Flask(__name__)
+        app.register_blueprint(download.bp)
+        return app.test_client()
+
+    def test_progress_sse_pushes_deltas_on_change(self):
+        import json
+
+        states = {
+            "a": {"status": "downloading", "progress": 10},
+            "b": {"status": "done", "progress": 100},
+        }
+        waits = []
+
+        def wait_func(version, timeout=None):
+            waits.append((version, timeout))
+            if len(waits) == 1:
+                return None  # 首次等待超时 -> 心跳帧
+            states["a"] = {"status": "done", "progress": 100}
+            return version + 1
+
+        client = self._make_download_client(states, wait_func)
+        response = client.get("/api/progress")
+
+        assert response.mimetype == "text/event-stream"
+        frames = [chunk for chunk in response.get_data(as_text=True).split("\n\n") if chunk]
+        assert frames[1] == ": ping"
+        first = json.loads(frames[0][len("data: "):])
+        last = json.loads(frames[2][len("data: "):])
+        assert set(first["tasks"]) == {"a", "b"}
+        assert last["delta"] is True
+        assert set(last["tasks"]) == {"a"}
+        assert last["removed"] == []
+        assert last["complete"] is True
+        assert waits[0] == (0, 15)
+
+    def test_progress_sse_copies_only_changed_tasks_with_versions(self):
+        import json
+        from src.download import StatusChangeNotifier
+
+        notifier = StatusChangeNotifier()
+        states = {
+            "a": {"status": "downloading", "progress": 10},
+            "b": {"status": "downloading", "progress": 20},
+            "c": {"status": "done", "progress": 100},
+        }
+        reads = []
+
+        class CountingDict(dict):
+            def __getitem__(self, key):
+                reads.append(key)
+                return super().__getitem__(key)
+
+        states = CountingDict(states)
+
+        def wait_func(version, timeout=None):
+            if version == 0:
+                states["a"]["progress"] = 50
+                notifier.notify("a")
+                states.pop("b")
+                notifier.notify("b")
+            else:
+                states["a"]["status"] = "done"
+                notifier.notify("a")
+            return notifier.wait(version, timeout=0)
+
+        client = self._make_download_client(states, wait_func, notifier.changed_since)
+        frames = [
+            json.loads(chunk[len("data: "):])
+            for chunk in client.get("/api/progress").get_data(as_text=True).split("\n\n")
+            if chunk
+        ]
+
+        assert set(frames[0]["tasks"]) == {"a", "b", "c"}
+        assert frames[1]["tasks"] == {"a": {"status": "downloading", "progress": 50}}
+        assert frames[1]["removed"] == ["b"]
+        assert frames[2]["tasks"] == {"a": {"status": "done", "progress": 50}}
+        assert frames[2]["complete"] is True
+        # 增量帧只按 key 读取变更过的任务
+        assert "c" not in reads
+
+        # 未指明任务的变更无法增量，changed_since 返回 None 触发全量对比
+        notifier.notify()
+        assert notifier.changed_since(0) is None
+        assert notifier.changed_since(notifier.version) == []
+
+    def test_progress_sse_shares_encoded_frames_across_clients(self):
+        from src.download import StatusChangeNotifier
+        from src.routes import download
+
+        notifier = StatusChangeNotifier()
+        states = {"a": {"status": "done", "progress": 100}}
+        client = self._make_download_client(states, notifier.wait, notifier.changed_since)
+        builds = []
+        download._get_queue_status = lambda: builds.append(1) or {"active": 0}
+
+        first = client.get("/api/progress").get_data(as_text=True)
+        second = client.get("/api/progress").get_data(as_text=True)
+
+        assert first == second
+        assert len(builds) == 1  # 同一版本只快照、编码一次
+        # 缓存的是已编码的 UTF-8 字节，各连接直接写出
+        assert all(isinstance(entry[0], bytes) for entry in download._progress_frames.values())
+
+    def _make_telegram_client(self, video_service, **overrides):
+        from flask import Flask
+        from src.routes import telegram
+
+        deps = {
+            key: None
+            for key in (
+                "tg_client", "run_async_func", "kickoff_dialogs_func", "dialogs_snapshot_func",
+                "resolve_entity_func", "video_info_func", "make_excerpt_func", "message_text_func",
+                "get_cached_message_func", "resolve_message_func", "abort_debug_func", "thumb_dir",
+                "relay_token_secret",
+            )
+        }
+        deps.update({
+            "dialogs_cache_ref": [],
+            "current_entity_cache_ref": {},
+            "videos_cache_ref": {},
+            "replies_cache_ref": {},
+            "video_service": video_service,
+        })
+        deps.update(overrides)
+        telegram.init_blueprint(deps)
+        app = Flask(__name__)
+        app.register_blueprint(telegram.bp)
+        return app.test_client()
+
+    def test_thumb_downloads_to_disk_and_supports_conditional_get(self):
+        with tempfile.TemporaryDirectory() as thumb_dir:
+            downloads = []
+
+            class Client:
+                async def download_media(self, message, file=None, thumb=None):
+                    downloads.append(file)
+                    with open(file, "wb") as handle:
+                        handle.write(b"jpeg-bytes")
+                    return file
+
+            client = self._make_telegram_client(
+                Mock(),
+                tg_client=Client(),
+                thumb_dir=thumb_dir,
+                get_cached_message_func=lambda msg_id, entity_id: Mock(id=msg_id),
+                run_async_func=lambda factory, timeout=600, allow_reconnect=True: asyncio.run(factory()),
+            )
+
+            first = client.get("/api/thumb/5?entity=-100123")
+            assert first.status_code == 200
+            assert first.data == b"jpeg-bytes"
+            assert first.headers["Cache-Control"] == "public, max-age=86400, immutable"
+            assert sorted(os.listdir(thumb_dir)) == ["-100123_5.jpg"]  # 临时文件已原子替换
+
+            again = client.get("/api/thumb/5?entity=-100123", headers={"If-None-Match": first.headers["ETag"]})
+            assert again.status_code == 304
+            assert len(downloads) == 1
+
+    def test_thumb_download_gives_up_after_fetch_timeout(self):
+        from unittest.mock import patch
+        from src.routes import telegram
+
+        with tempfile.TemporaryDirectory() as thumb_dir:
+            calls = {}
+
+            class Client:
+                async def download_media(self, message, file=None, thumb=None):
+                    await asyncio.sleep(60)
+
+            def run_async(factory, timeout=600, allow_reconnect=True):
+                calls["timeout"] = timeout
+                return asyncio.run(factory())
+
+            client = self._make_telegram_client(
+                Mock(),
+                tg_client=Client(),
+                thumb_dir=thumb_dir,
+                get_cached_message_func=lambda msg_id, entity_id: Mock(id=msg_id),
+                run_async_func=run_async,
+            )
+
+            with patch.object(telegram, "THUMB_FETCH_TIMEOUT", 0.05):
+                response = client.get("/api/thumb/5?entity=-100123")
+            # DC 卡住时按缩略图自己的超时放弃，而不是占着请求线程等满 run_async 默认超时
+            assert response.status_code == 404
+            assert calls["timeout"] < 600
+            assert os.listdir(thumb_dir) == []
+
+    def test_videos_stream_emits_each_video_then_done(self):
+        import json
+
+        class Service:
+            def list_videos(self, on_video=None, **kwargs):
+                videos = [{"id": 1, "filename": "一.mp4"}, {"id": 2, "filename": "b.mp4"}]
+                for info in videos:
+                    on_video(info)
+                return {"videos": videos, "posts_with_replies": [], "entity_id": 5, "cached": False}, 200
+
+        response = self._make_telegram_client(Service()).get("/api/videos/stream?entity_id=5")
+
+        assert response.mimetype == "text/event-stream"
+        frames = [chunk for chunk in response.get_data(as_text=True).split("\n\n") if chunk]
+        assert [json.loads(frame[len("data: "):])["id"] for frame in frames[:2]] == [1, 2]
+        event, data = frames[2].split("\n", 1)
+        assert event == "event: done"
+        meta = json.loads(data[len("data: "):])
+        assert meta["count"] == 2
+        assert meta["entity_id"] == 5
+        assert "videos" not in meta
+
+    def test_videos_sets_x_cache_header(self):
+        class Service:
+            def __init__(self):
+                self.calls = 0
+
+            def list_videos(self, **kwargs):
+                self.calls += 1
+                return {"videos": [], "cached": self.calls > 1}, 200
+
+        client = self._make_telegram_client(Service())
+
+        assert client.get("/api/videos?entity_id=5").headers["X-Cache"] == "MISS"
+        assert client.get("/api/videos?entity_id=5").headers["X-Cache"] == "HIT"
+
+    def test_videos_stream_reports_scan_error(self):
+        class Service:
+            def list_videos(self, on_video=None, **kwargs):
+                return {"error": "无效的对话"}, 400
+
+        body = self._make_telegram_client(Service()).get("/api/videos/stream").get_data(as_text=True)
+
+        assert body.startswith("event: scan_error\n")
+        assert "无效的对话" in body
+
+    def test_index_served_as_static_file_with_conditional_get(self):
+        from flask import Flask
+        from src.routes import files
+
+        files.init_blueprint({
+            "resolve_path_func": lambda *_args, **_kwargs: "/tmp",
+            "is_local_func": lambda: True,
+            "open_folder_enabled": False,
+        })
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        app = Flask("app_new", root_path=repo_root)
+        app.register_blueprint(files.bp)
+        client = app.test_client()
+
+        first = client.get("/")
+        assert first.status_code == 200
+        assert first.mimetype == "text/html"
+        assert first.headers.get("ETag")
+
+        second = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+        assert second.status_code == 304
+
     def _make_system_client(self, connected):
         from flask import Flask
         from src.routes import system